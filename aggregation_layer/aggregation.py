@@ -1,12 +1,20 @@
-from aggregation_algs.algs import ALGS_DICT
+from aggregation_algs.algs import check_fedavg_params
+from aggregation_algs.async_agg import AsyncBuffer
+from aggregation_algs.ensemble import forest_in_raw_space, merge_forests
+from aggregation_algs.incremental import INCREMENTAL_ALGS_DICT
+from aggregation_algs.rounds import RoundBuffer
 from yaml import Loader, load
 from client.mqtt_layer import Communication_Layer
-import json, threading, time, uuid
+from client.metrics import METRICS, log_payload, setup_observability
+from client.blob_transfer import BlobTransfer
+from client.checkpoint import Checkpointer
+from client.forest_codec import dump_forest, load_forest
+from client.routing import Hierarchy, RoutingTable, can_target_self
+from client.update_encoding import DeltaDecoder, DeltaEncoder
+import os, threading, time, uuid
 import warnings
 warnings.filterwarnings("ignore")
 
-from aggregation_algs.aggregation_utils import resolve_targets_by_index
-
 class Aggregator:
  
     def __init__(self):
@@ -23,11 +31,112 @@ class Aggregator:
         self.mode = self.config["mode"]
         self.server_ip = self.config["central_server"]
         self.server_id = self.server_ip.replace(".", "_")
+        self.codec_config = self.config.get("codec", {})
+        self.queue_size = self.config.get("router", {}).get("queue_size", 256)
+        setup_observability(self.config.get("observability", {}), "aggregation")
 
         self.current_peer_list = []
-        self.aggregation_dest_indices = self.config["routing_topology"]["aggregation_topology"]
+        self.routes = RoutingTable(
+            self.config["routing_topology"]["aggregation_topology"], self.peer_ip, name="AGGREGATION ROUTING"
+        )
 
-        if self.mode == "federated":
+        agg_config = self.config.get("aggregation", {})
+        self.agg_method = agg_config.get("method", "avg")
+        self.blob_config = self.config.get("blob_transfer", {})
+        self.blobs = None
+        if self.agg_method == "ensemble":
+            # modelos treinados em vez de hiperparâmetros: node_id -> floresta
+            self.ensemble_config = agg_config.get("ensemble", {})
+            self.forests = {}
+            self.forest_scores = {}
+            self.agg_state = None
+            self.remote_params = self.forests
+            state_factory = None
+        elif self.agg_method in INCREMENTAL_ALGS_DICT:
+            self.agg_state = INCREMENTAL_ALGS_DICT[self.agg_method]()
+            self.remote_params = self.agg_state.contributions
+            state_factory = INCREMENTAL_ALGS_DICT[self.agg_method]
+        else:
+            raise ValueError(f"Método de agregação '{self.agg_method}' não suportado.")
+
+        # --- modo síncrono por rondas (quorum / deadline) --- #
+        self.sync_rounds = agg_config.get("sync_rounds", False) and state_factory is not None
+        if "quorum" in agg_config:
+            raise ValueError(
+                "aggregation.quorum é ambíguo (1 vs 1.0): usar quorum_fraction (fração dos peers) "
+                "ou quorum_count (nº de contribuições)."
+            )
+        self.round_buffer = RoundBuffer(
+            state_factory,
+            quorum_fraction=agg_config.get("quorum_fraction", 1.0),
+            quorum_count=agg_config.get("quorum_count"),
+            deadline=agg_config.get("round_deadline", 30),
+        )
+        self.agg_lock = threading.Lock()
+        self.last_aggregate = None  # (params, round, versão) do último publish_aggregate
+
+        # updates em delta: agregados publicados (encoder) e parâmetros recebidos (decoder)
+        update_config = self.config.get("update_encoding", {})
+        self.update_encoder = self.update_decoder = None
+        if update_config.get("enabled", False):
+            self.update_encoder = DeltaEncoder(
+                quantize=update_config.get("quantize"),
+                error_feedback=update_config.get("error_feedback", True),
+                history=update_config.get("history", 8),
+            )
+            self.update_decoder = DeltaDecoder(history=update_config.get("history", 8))
+
+        # --- agregação hierárquica (modo federated) --- #
+        hierarchy_config = self.config["routing_topology"].get("hierarchy") or {}
+        self.hierarchy = None
+        if self.mode == "federated" and hierarchy_config.get("enabled", False):
+            if state_factory is None:
+                print("[AGGREGATOR] Agregação hierárquica não suportada no modo ensemble; ignorada.")
+            else:
+                self.hierarchy = Hierarchy(hierarchy_config.get("tiers", [4]), self.server_ip, self.peer_ip)
+                self.forward_interval = hierarchy_config.get("forward_interval", 1.0)
+                self.tier_states = {}     # nível -> estado incremental dos grupos que este nó lidera
+                self.dirty_tiers = set()  # níveis com alterações ainda não enviadas para cima
+                self.forward_timer = None
+                # os parciais não trazem nº de ronda: cada nível agrega de forma incremental
+                self.sync_rounds = False
+
+        # --- modo assíncrono (FedAsync / FedBuff) --- #
+        async_config = agg_config.get("async_mode") or {}
+        self.async_buffer = None
+        if async_config.get("enabled", False):
+            if state_factory is None or self.hierarchy is not None:
+                print("[AGGREGATOR] Agregação assíncrona não suportada no modo ensemble/hierárquico; ignorada.")
+            else:
+                self.async_buffer = AsyncBuffer(
+                    self.agg_method,
+                    buffer_size=async_config.get("buffer_size", 1),
+                    alpha=async_config.get("alpha", 0.6),
+                    staleness=async_config.get("staleness"),
+                )
+                # as versões substituem as rondas: nunca se espera pelo nó mais lento
+                self.sync_rounds = False
+
+        # --- checkpoints / arranque a quente --- #
+        checkpoint_config = self.config.get("checkpoint", {})
+        self.checkpointer = None
+        restored = False
+        if checkpoint_config.get("enabled", False):
+            self.checkpointer = Checkpointer(
+                os.path.join(checkpoint_config.get("dir", "checkpoints"), "aggregation"),
+                interval=checkpoint_config.get("interval", 30),
+            )
+            if checkpoint_config.get("warm_start", True):
+                restored = self._restore_checkpoint()
+            self.checkpointer.start(self._checkpoint_snapshot)
+
+        if self.hierarchy is not None:
+            print("[AGGREGATOR] Modo Federated hierárquico: agregador de grupo.")
+            self._setup_mqtt_client(subscribe_topic=f"{self.broker_id}/agg", own=True)
+            self.mqtt_com.route(
+                f"{self.broker_id}/agg/partial", self.on_partial, maxsize=self.queue_size, own=True
+            )
+        elif self.mode == "federated":
             if self.peer_ip == self.server_ip:
                 print("[AGGREGATOR] Eu sou o SERVIDOR CENTRAL (Main).")
                 self._setup_mqtt_client(subscribe_topic="+/agg")
@@ -39,14 +148,16 @@ class Aggregator:
             self._setup_mqtt_client(subscribe_topic="+/agg")
             self._start_agg_worker()
 
+        if restored and hasattr(self, "mqtt_com"):
+            self._republish_restored()
+
         # self._setup_mqtt_client()
         # self._start_agg_worker()
 
-        self.remote_params = {}
-
-    def _setup_mqtt_client(self, subscribe_topic):
+    def _setup_mqtt_client(self, subscribe_topic, own=False):
         """
         Cria o cliente MQTT e faz o subscribe ao tópico
+        (own=True -> aceita mensagens endereçadas a este nó, <id>/agg)
         """
         self.mqtt_com = Communication_Layer(
             broker=self.peer_ip,
@@ -54,67 +165,451 @@ class Aggregator:
             client_id=f"aggregation_{self.broker_id}_{str(uuid.uuid4())[:4]}",
             base_topic="",
             qos=1,
+            codec=self.codec_config.get("format", "json"),
+            compression=self.codec_config.get("compression"),
+            compress_threshold=self.codec_config.get("compress_threshold", 1024),
         )
-        self.remote_params = self.mqtt_com.subscribe(topic=subscribe_topic)
-        self.mqtt_com.subscribe("system/peers")
+        self.mqtt_com.route("system/peers", self.on_peers, control=True)
+        self.mqtt_com.route(subscribe_topic, self.on_trained_params, maxsize=self.queue_size, own=own)
+        if not own and can_target_self(self.config["routing_topology"]["pipeline_topology"]):
+            # o pipeline deste nó pode escolher este agregador: <id>/agg não passa no +/agg
+            self.mqtt_com.route(f"{self.broker_id}/agg", self.on_trained_params, maxsize=self.queue_size, own=True)
+        if self.update_encoder is not None:
+            # worker próprio: um pedido de estado completo reenvia o último agregado
+            self.mqtt_com.route(f"{self.broker_id}/agg/ack", self.on_update_ack, maxsize=self.queue_size, own=True)
+        if self.agg_method == "ensemble":
+            self.blobs = BlobTransfer(
+                self.mqtt_com,
+                f"{self.broker_id}/agg",
+                store_dir=self.blob_config.get("store_dir", "blobs"),
+                chunk_size=self.blob_config.get("chunk_size", 65536),
+                window=self.blob_config.get("window", 16),
+                retry_after=self.blob_config.get("retry_after", 5),
+                on_blob=self.on_model_blob,
+                accept_sender=self._known_sender,
+                max_size=self.blob_config.get("max_size", 64 << 20),
+            )
 
     def _start_agg_worker(self):
-        agg_thread = threading.Thread(target=self.agg_worker)
-        agg_thread.start()
+        if self.sync_rounds:
+            threading.Thread(target=self._round_deadline_worker, daemon=True).start()
+
+    def _mark_dirty(self):
+        if self.checkpointer is not None:
+            self.checkpointer.touch()
+
+    def _checkpoint_snapshot(self):
+        """
+        Estado a guardar no checkpoint (cópias feitas sob o agg_lock).
+        As rondas ainda abertas não são guardadas: voltam a encher-se com as contribuições seguintes.
+        """
+        with self.agg_lock:
+            engines = {}
+            if self.agg_state is not None:
+                engines["global"] = self.agg_state
+            if self.hierarchy is not None:
+                engines.update({f"tier_{tier}": state for tier, state in self.tier_states.items()})
+            state = {"method": self.agg_method, "peer_list": list(self.current_peer_list)}
+            objects = {
+                "engines": {
+                    name: {"contributions": dict(engine.contributions), "partials": dict(engine.partials)}
+                    for name, engine in engines.items()
+                },
+            }
+            if self.agg_method == "ensemble":
+                objects["forests"] = dict(self.forests)
+                state["forest_scores"] = dict(self.forest_scores)
+            if self.last_aggregate is not None:
+                objects["last_aggregate"] = self.last_aggregate
+            if self.async_buffer is not None:
+                objects["async"] = {
+                    "version": self.async_buffer.version,
+                    "global_params": self.async_buffer.global_params,
+                    "buffer": list(self.async_buffer.buffer),
+                }
+        return state, objects
 
-    def aggregate(self, params_dict, method):
+    def _restore_checkpoint(self):
+        """
+        Arranque a quente: repõe as contribuições, a lista de peers, o estado assíncrono
+        e o último agregado publicado.
+        Returns:
+            True se o checkpoint foi restaurado
         """
-        Agrega os hiperparâmetros recebidos de diferentes nós usando o método especificado.
+        state, objects = self.checkpointer.load()
+        if state is None:
+            return False
+        if state.get("method") != self.agg_method:
+            print(f"[AGGREGATOR] Checkpoint do método '{state.get('method')}' ignorado.")
+            return False
+        self.current_peer_list = state["peer_list"]
+        self.routes.rebuild(self.current_peer_list)
+        if self.hierarchy is not None:
+            self.hierarchy.rebuild(self.current_peer_list)
+        for name, saved in objects.get("engines", {}).items():
+            if name == "global":
+                engine = self.agg_state
+            elif self.hierarchy is not None:
+                engine = self._tier_state(int(name.split("_")[1]))
+            else:
+                continue
+            for node_id, params in saved["contributions"].items():
+                engine.update(node_id, params)
+            for child_id, partial in saved["partials"].items():
+                engine.update_partial(child_id, partial)
+        if self.agg_method == "ensemble":
+            self.forests.update(objects.get("forests", {}))
+            self.forest_scores.update(state.get("forest_scores", {}))
+        if self.async_buffer is not None and "async" in objects:
+            self.async_buffer.version = objects["async"]["version"]
+            self.async_buffer.global_params = objects["async"]["global_params"]
+            self.async_buffer.buffer = objects["async"]["buffer"]
+        self.last_aggregate = objects.get("last_aggregate")
+        print(f"[AGGREGATOR] Arranque a quente: checkpoint {self.checkpointer.generation} restaurado "
+              f"({len(self.remote_params)} contribuições, {len(self.current_peer_list)} peers).")
+        return True
+
+    def _republish_restored(self):
+        """
+        Arranque a quente: volta a publicar o último agregado restaurado. Com o cluster
+        todo reiniciado os pipelines restaurados esperam por um agregado e este
+        agregador por contribuições; sem isto ninguém voltava a publicar.
+        """
+        if self.agg_method == "ensemble":
+            if not self.forests:
+                return
+            with self.agg_lock:
+                forest = merge_forests(
+                    self.forests,
+                    self.forest_scores,
+                    max_estimators=self.ensemble_config.get("max_estimators"),
+                    random_state=self.ensemble_config.get("random_state", 0),
+                )
+            self.publish_global_model(forest)
+        elif self.last_aggregate is not None:
+            print("[AGGREGATOR] Arranque a quente: a republicar o último agregado.")
+            self.publish_aggregate(*self.last_aggregate)
+
+    def _cluster_size(self):
+        """
+        Número de nós no cluster (peers conhecidos + o próprio nó).
+        """
+        return len(set(self.current_peer_list) | {self.peer_ip})
+
+    def _round_deadline_worker(self):
+        """
+        Fecha as rondas cujo deadline expirou, mesmo sem quorum.
+        """
+        interval = min(1.0, self.round_buffer.deadline / 4)
+        while True:
+            time.sleep(interval)
+            with self.agg_lock:
+                closed = self.round_buffer.poll(self._cluster_size())
+            for round_id, aggregated_params in closed:
+                print(f"[AGGREGATION] Ronda {round_id} fechada (deadline/quorum).")
+                self.publish_aggregate(aggregated_params, round_id=round_id)
+
+    def aggregate_incremental(self, node_id, params):
+        """
+        Atualiza a contribuição de um nó no estado incremental e devolve a agregação.
+        Custo O(params) por mensagem, em vez de reagregar todos os nós.
         Args:
-            params_dict: Dicionário contendo hiperparâmetros de diferentes nós
-            method: Método de agregação a ser usado ('avg' ou 'majority')
+            node_id: Identificador do nó que enviou os parâmetros
+            params: Dicionário com os hiperparâmetros do nó
         Returns:
             aggregated_params: Dicionário com os hiperparâmetros agregados
         """
-        if method not in ALGS_DICT:
-            raise ValueError(f"Método de agregação '{method}' não suportado.")
+        with self.agg_lock, METRICS.timer("aggregation_seconds", mode="incremental"):
+            self.agg_state.update(node_id, params)
+            return self.agg_state.result()
 
-        aggregate_function = ALGS_DICT[method]
-        aggregated_params = aggregate_function(params_dict)
+    def aggregate_round(self, round_id, node_id, params):
+        """
+        Guarda a contribuição na ronda respetiva.
+        Returns:
+            aggregated_params se a contribuição fechou a ronda, None caso contrário
+        """
+        with self.agg_lock, METRICS.timer("aggregation_seconds", mode="round"):
+            return self.round_buffer.add(round_id, node_id, params, self._cluster_size())
 
-        return aggregated_params
+    def _tier_state(self, tier):
+        """
+        Estado incremental do nível `tier` (no root é sempre o estado global).
+        """
+        if self.peer_ip == self.server_ip:
+            return self.agg_state
+        if tier not in self.tier_states:
+            self.tier_states[tier] = INCREMENTAL_ALGS_DICT[self.agg_method]()
+        return self.tier_states[tier]
 
-    def agg_worker(self):
+    def aggregate_hierarchical(self, tier, node_id, params=None, partial=None):
         """
-        Worker que processa mensagens recebidas e realiza a agregação.
+        Junta a contribuição de um worker (params) ou o parcial de um grupo filho
+        (partial) ao nível `tier`. O root publica o agregado final; os líderes de
+        grupo agendam o envio do seu parcial para o nível seguinte.
         """
-        while True:
-            topic, data = self.mqtt_com.msg_queue.get()
+        with self.agg_lock, METRICS.timer("aggregation_seconds", mode="hierarchy"):
+            state = self._tier_state(tier)
+            if partial is None:
+                state.update(node_id, params)
+            else:
+                state.update_partial(node_id, partial)
+            aggregated_params = state.result() if self.peer_ip == self.server_ip else None
+        if aggregated_params is not None:
+            self.publish_aggregate(aggregated_params)
+        else:
+            self._schedule_forward(tier)
 
-            if topic == "system/peers":
-                print(f"[{self.broker_id}] RECEIVED on {topic}: {data}")
-                self.current_peer_list = data
-                print(f"[AGGREGATION] Lista de peers atualizada: {self.current_peer_list}")
-                self.mqtt_com.msg_queue.task_done()
-                continue
-            else:    
-                print(f"[{self.broker_id}] RECEIVED on {topic}: {data}")
-                if "trained_params" not in data:
-                    self.mqtt_com.msg_queue.task_done()
-                    continue
+    def _schedule_forward(self, tier):
+        """
+        Marca o nível como alterado; as alterações dentro de forward_interval
+        seguem num único parcial.
+        """
+        with self.agg_lock:
+            self.dirty_tiers.add(tier)
+            if self.forward_timer is not None:
+                return
+            self.forward_timer = threading.Timer(self.forward_interval, self._forward_partials)
+            self.forward_timer.daemon = True
+            self.forward_timer.start()
 
-                node_id = data["id"]
-                params = data["trained_params"]
-                self.remote_params[node_id] = params
-                aggregated_params = self.aggregate(self.remote_params, method="avg")
-                payload = {
-                    "id": self.broker_id,
-                    "agg_params": aggregated_params
-                }
-                print("Aggregated Params", payload)
-                targets = resolve_targets_by_index(self.current_peer_list, self.aggregation_dest_indices)
-                if not targets:
-                    self.mqtt_com.publish(payload, topic=f"{self.broker_id}/train")
+    def _forward_partials(self):
+        """
+        Envia o parcial de cada nível alterado para o líder do nível seguinte.
+        Se o líder for este nó o parcial é aplicado localmente e o nível seguinte
+        passa a estar alterado (no mesmo envio).
+        """
+        messages = []
+        with self.agg_lock:
+            self.forward_timer = None
+            while self.dirty_tiers:
+                tier = min(self.dirty_tiers)
+                self.dirty_tiers.discard(tier)
+                if tier not in self.tier_states:
+                    # deixou de liderar este nível entretanto
+                    continue
+                partial = self.tier_states[tier].partial()
+                parent = self.hierarchy.upstream(tier + 1)
+                if parent == self.peer_ip:
+                    self._tier_state(tier + 1).update_partial(self.peer_ip, partial)
+                    self.dirty_tiers.add(tier + 1)
                 else:
-                    for ip in targets:
-                        target_id = ip.replace(".", "_")
-                        self.mqtt_com.publish(payload, topic=f"{target_id}/train")
-                self.mqtt_com.msg_queue.task_done()
+                    messages.append((parent, {"id": self.peer_ip, "tier": tier + 1, "partial": partial}))
+        for parent, payload in messages:
+            log_payload("AGGREGATION", f"parcial -> {parent}", payload, action="PUBLISHING")
+            METRICS.inc("partials_forwarded_total")
+            self.mqtt_com.publish(payload, topic=f"{parent.replace('.', '_')}/agg/partial")
+
+    def _prune_hierarchy(self):
+        """
+        Depois de uma mudança de membership: descarta contribuições/parciais de nós
+        que já não pertencem aos grupos deste nó e volta a enviar os parciais.
+        """
+        aggregated_params, dirty = None, []
+        with self.agg_lock:
+            if self.peer_ip == self.server_ip:
+                self.agg_state.retain(set(self.hierarchy.group(len(self.hierarchy.tiers))) | {self.peer_ip})
+                if self.agg_state.num_nodes():
+                    aggregated_params = self.agg_state.result()
+            else:
+                led_tiers = self.hierarchy.led_tiers()
+                for tier in list(self.tier_states):
+                    if tier not in led_tiers:
+                        del self.tier_states[tier]
+                    else:
+                        self.tier_states[tier].retain(set(self.hierarchy.group(tier)))
+                        dirty.append(tier)
+        if aggregated_params is not None:
+            self.publish_aggregate(aggregated_params)
+        for tier in dirty:
+            self._schedule_forward(tier)
+
+    def aggregate_async(self, node_id, params, base_version):
+        """
+        Modo assíncrono: junta a contribuição ao buffer, pesada pela staleness
+        (nº de agregados emitidos desde a versão em que o nó treinou).
+        Returns:
+            (aggregated_params, versão) quando o buffer fechou, None caso contrário
+        """
+        with self.agg_lock, METRICS.timer("aggregation_seconds", mode="async"):
+            METRICS.observe("async_staleness", self.async_buffer.staleness(base_version))
+            return self.async_buffer.add(node_id, params, base_version)
+
+    def publish_aggregate(self, aggregated_params, round_id=None, version=None, receiver=None):
+        """
+        Publica os parâmetros agregados para os alvos da topologia de agregação
+        (receiver: reenvio só para esse pipeline, quando os alvos são por nó).
+        """
+        self.last_aggregate = (aggregated_params, round_id, version)
+        payload = {
+            "id": self.broker_id,
+        }
+        if round_id is not None:
+            payload["round"] = round_id
+        if version is not None:
+            payload["version"] = version
+        targets = self.routes.targets()
+        if receiver is not None and targets and self.hierarchy is None:
+            targets = (receiver,)
+        if self.update_encoder is not None:
+            payload["agg_update"] = self.update_encoder.encode(aggregated_params, self._update_receivers(targets))
+        else:
+            payload["agg_params"] = aggregated_params
+        log_payload("AGGREGATION", "agregado", payload, action="PUBLISHING")
+        METRICS.inc("aggregates_published_total")
+        if not targets or self.hierarchy is not None:
+            # hierárquico: os pipelines de todos os nós subscrevem <central_server>/train
+            self.mqtt_com.publish(payload, topic=f"{self.broker_id}/train")
+        else:
+            self.mqtt_com.publish_many(
+                payload, [f"{ip.replace('.', '_')}/train" for ip in targets]
+            )
+
+    def _update_receivers(self, targets):
+        """
+        Pipelines que recebem o agregado: os alvos da topologia ou, quando se
+        publica no próprio prefixo, todos os nós (federated) ou só este nó.
+        """
+        if targets and self.hierarchy is None:
+            return targets
+        if self.mode == "federated":
+            return sorted(set(self.current_peer_list) | {self.peer_ip})
+        return (self.peer_ip,)
+
+    def aggregate_ensemble(self, node_id, model, score):
+        """
+        Junta a floresta do nó às restantes e devolve a floresta global.
+        """
+        with self.agg_lock, METRICS.timer("aggregation_seconds", mode="ensemble"):
+            self.forests[node_id] = forest_in_raw_space(model)
+            self.forest_scores[node_id] = score
+            return merge_forests(
+                self.forests,
+                self.forest_scores,
+                max_estimators=self.ensemble_config.get("max_estimators"),
+                random_state=self.ensemble_config.get("random_state", 0),
+            )
+
+    def publish_global_model(self, forest, round_id=None):
+        """
+        Envia a floresta global (blob) aos pipelines dos alvos da topologia de agregação.
+        """
+        targets = self.routes.targets()
+        target_ids = [f"{ip.replace('.', '_')}/pipe" for ip in targets] or [f"{self.broker_id}/pipe"]
+        meta = {"kind": "global_model", "id": self.broker_id, "round": round_id, "nodes": sorted(self.forests)}
+        self.blobs.send_many(target_ids, data=dump_forest(forest), meta=meta)
+        METRICS.inc("aggregates_published_total")
+        print(f"[AGGREGATION] Floresta global: {forest.n_estimators} árvores de {len(self.forests)} nós -> {target_ids}")
+
+    def _known_sender(self, sender):
+        """
+        accept_sender do BlobTransfer: só se aceitam blobs de membros conhecidos
+        (lista de peers ou este nó); sender é o sufixo do tópico, ex: 10_0_0_2/pipe.
+        """
+        members = {ip.replace(".", "_") for ip in self.current_peer_list} | {self.broker_id}
+        return sender.split("/", 1)[0] in members
+
+    def on_model_blob(self, sender, blob, path, meta):
+        """
+        Modo ensemble: recebeu o modelo treinado de um nó (via BlobTransfer).
+        O blob (já verificado pelo sha256) só tem arrays: ver client/forest_codec.py.
+        """
+        if meta.get("kind") != "model":
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            model = load_forest(data)
+        except ValueError as e:
+            METRICS.inc("contributions_rejected_total")
+            print(f"[AGGREGATION] Modelo de {sender} rejeitado: {e}")
+            return
+        forest = self.aggregate_ensemble(meta.get("id", sender), model, meta.get("score"))
+        self._mark_dirty()
+        self.publish_global_model(forest, meta.get("round"))
+
+    def on_peers(self, topic, data):
+        """
+        Rota de controlo (system/peers): atualiza a lista de peers.
+        """
+        log_payload(self.broker_id, topic, data)
+        self.current_peer_list = data
+        self.routes.rebuild(data)
+        if self.hierarchy is not None and self.hierarchy.rebuild(data):
+            self._prune_hierarchy()
+        self._mark_dirty()
+        print(f"[AGGREGATION] Lista de peers atualizada: {self.current_peer_list}")
+
+    def on_trained_params(self, topic, data):
+        """
+        Worker da rota +/agg: recebe os parâmetros treinados e realiza a agregação.
+        """
+        log_payload(self.broker_id, topic, data)
+        if "trained_update" in data and self.update_decoder is not None:
+            params, ack = self.update_decoder.decode(data["id"], data["trained_update"])
+            self.mqtt_com.publish(dict(ack, id=self.peer_ip), topic=f"{data['id'].replace('.', '_')}/pipe/ack")
+            if params is None:
+                # falta a versão base: o pipeline volta a enviar o estado completo
+                return
+            data["trained_params"] = params
+        if "trained_params" not in data or self.agg_method == "ensemble":
+            # no modo ensemble agregam-se os modelos (on_model_blob)
+            return
+
+        node_id = data["id"]
+        params = data["trained_params"]
+        if self.agg_method == "fedavg":
+            try:
+                check_fedavg_params(params)
+            except ValueError as e:
+                METRICS.inc("contributions_rejected_total")
+                print(f"[AGGREGATION] Contribuição de {node_id} rejeitada: {e}")
+                return
+        self._mark_dirty()
+        try:
+            self._aggregate_contribution(node_id, params, data)
+        except ValueError as e:
+            # ex: tensores com nomes/shapes diferentes dos já agregados (o estado não muda)
+            METRICS.inc("contributions_rejected_total")
+            print(f"[AGGREGATION] Contribuição de {node_id} rejeitada: {e}")
+
+    def _aggregate_contribution(self, node_id, params, data):
+        """
+        Encaminha uma contribuição validada para o modo de agregação ativo.
+        """
+        if self.hierarchy is not None:
+            # contribuição de um worker do grupo deste nó (nível 0; no root, o próprio nó)
+            self.aggregate_hierarchical(0, node_id, params=params)
+        elif self.async_buffer is not None:
+            emitted = self.aggregate_async(node_id, params, data.get("base_version"))
+            if emitted is not None:
+                aggregated_params, version = emitted
+                self.publish_aggregate(aggregated_params, version=version)
+        elif self.sync_rounds and "round" in data:
+            round_id = data["round"]
+            aggregated_params = self.aggregate_round(round_id, node_id, params)
+            if aggregated_params is not None:
+                self.publish_aggregate(aggregated_params, round_id=round_id)
+        else:
+            aggregated_params = self.aggregate_incremental(node_id, params)
+            self.publish_aggregate(aggregated_params)
+
+    def on_update_ack(self, topic, data):
+        """
+        Rota <id>/agg/ack: versão do agregado confirmada por um pipeline.
+        """
+        if self.update_encoder.ack(data["id"], data) and self.last_aggregate is not None:
+            # o pipeline não tem a versão base: sem reenvio ficava à espera para sempre
+            print(f"[AGGREGATION] {data['id']} pediu o estado completo: reenvio do último agregado.")
+            self.publish_aggregate(*self.last_aggregate, receiver=data["id"])
+
+    def on_partial(self, topic, data):
+        """
+        Worker da rota <id>/agg/partial: parcial de um grupo filho (agregação hierárquica).
+        """
+        log_payload(self.broker_id, topic, data)
+        self._mark_dirty()
+        self.aggregate_hierarchical(data["tier"], data["id"], partial=data["partial"])
 
 if __name__ == "__main__":
     aggregator = Aggregator()
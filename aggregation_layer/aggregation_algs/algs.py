@@ -1,4 +1,5 @@
 from collections import Counter
+import numpy as np
 
 def aggregate_avg(params_dict):
     """
@@ -41,7 +42,85 @@ def aggregate_majority(params_dict):
     return aggregated_params
 
 
+def weights_layout(weights):
+    """
+    Compute the position of each named tensor inside a flat parameter vector
+    Args:
+        weights: Dictionary of named ndarrays
+    Returns:
+        layout: List of (name, shape, start, stop)
+        total_size: Number of elements of the flat vector
+    """
+    layout = []
+    offset = 0
+    for name in sorted(weights):
+        shape = np.shape(weights[name])
+        size = int(np.prod(shape, dtype=np.int64))
+        layout.append((name, shape, offset, offset + size))
+        offset += size
+    return layout, offset
+
+
+def check_fedavg_params(params):
+    """
+    Validate the shape of a FedAvg contribution before it reaches an engine
+    Args:
+        params: Params received from a node
+    Raises:
+        ValueError: If they are not {"num_samples": int, "weights": {name: numeric array}}
+    """
+    if not isinstance(params, dict) or "num_samples" not in params or "weights" not in params:
+        raise ValueError("FedAvg expects {'num_samples', 'weights'}, got plain hyperparameters.")
+    num_samples = params["num_samples"]
+    if isinstance(num_samples, bool) or not isinstance(num_samples, (int, float, np.number)) or num_samples < 0:
+        raise ValueError(f"Invalid num_samples: {num_samples!r}")
+    if not isinstance(params["weights"], dict):
+        raise ValueError("FedAvg weights must be a dictionary of named tensors.")
+    for name, value in params["weights"].items():
+        if np.asarray(value).dtype.kind not in "biuf":
+            raise ValueError(f"Weight '{name}' is not numeric.")
+
+
+def aggregate_fedavg(params_dict):
+    """
+    Aggregate model weights with FedAvg, weighting each node by its number of samples.
+    Every node is packed into one row of a preallocated matrix and the weighted
+    mean of all tensors is a single matrix-vector product.
+    Args:
+        params_dict: Dict of {"num_samples": int, "weights": {name: ndarray}} from different nodes
+    Returns:
+        aggregated_params: Dictionary with the total num_samples and the averaged weights
+    """
+    nodes = list(params_dict.values())
+    if not nodes:
+        return {}
+
+    layout, total_size = weights_layout(nodes[0]["weights"])
+    # float64 accumulators and sample weights, like RunningFedAvg
+    stacked = np.empty((len(nodes), total_size), dtype=np.float64)
+    for row, node_params in zip(stacked, nodes):
+        node_weights = node_params["weights"]
+        if node_weights.keys() != nodes[0]["weights"].keys():
+            raise ValueError("All nodes must publish the same named weights.")
+        for name, shape, start, stop in layout:
+            if np.shape(node_weights[name]) != shape:
+                raise ValueError(f"Shape mismatch for '{name}': {np.shape(node_weights[name])} != {shape}")
+            np.copyto(row[start:stop].reshape(shape), node_weights[name], casting="same_kind")
+
+    samples = np.array([node_params["num_samples"] for node_params in nodes], dtype=np.float64)
+    total_samples = samples.sum()
+    if total_samples <= 0:
+        raise ValueError("FedAvg needs at least one sample across nodes.")
+    flat = (samples / total_samples) @ stacked
+
+    return {
+        "num_samples": int(total_samples),
+        "weights": {name: flat[start:stop].reshape(shape) for name, shape, start, stop in layout},
+    }
+
+
 ALGS_DICT = {
     "avg": aggregate_avg,
     "majority": aggregate_majority,
+    "fedavg": aggregate_fedavg,
 }
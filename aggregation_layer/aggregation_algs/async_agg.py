@@ -0,0 +1,170 @@
+from collections import Counter
+import numpy as np
+
+
+def staleness_constant(staleness, a=0.5, b=4):
+    return 1.0
+
+
+def staleness_polynomial(staleness, a=0.5, b=4):
+    return (1.0 + staleness) ** -a
+
+
+def staleness_hinge(staleness, a=0.5, b=4):
+    if staleness <= b:
+        return 1.0
+    return 1.0 / (a * (staleness - b) + 1.0)
+
+
+STALENESS_FUNCTIONS = {
+    "constant": staleness_constant,
+    "polynomial": staleness_polynomial,
+    "hinge": staleness_hinge,
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _mix_avg(global_params, contributions, alpha):
+    """
+    Weighted average of the buffered hyperparameters, mixed into the global ones.
+    Non-numeric params (str, bool, None) fall back to the weighted vote of _mix_majority
+    """
+    categorical = {
+        param for params, _ in contributions for param, value in params.items() if not _is_number(value)
+    }
+    if global_params is not None:
+        categorical |= {param for param, value in global_params.items() if not _is_number(value)}
+    sums, weights = {}, {}
+    for params, weight in contributions:
+        for param, value in params.items():
+            if param in categorical:
+                continue
+            sums[param] = sums.get(param, 0) + weight * value
+            weights[param] = weights.get(param, 0) + weight
+    merged = {param: total / weights[param] for param, total in sums.items() if weights[param] > 0}
+    if categorical:
+        voted = _mix_majority(
+            None if global_params is None else {p: v for p, v in global_params.items() if p in categorical},
+            [({p: v for p, v in params.items() if p in categorical}, weight) for params, weight in contributions],
+            alpha,
+        )
+    else:
+        voted = {}
+    if global_params is None:
+        return {**merged, **voted}
+    mixed = dict(global_params)
+    for param, value in merged.items():
+        mixed[param] = (1 - alpha) * global_params[param] + alpha * value if param in global_params else value
+    mixed.update(voted)
+    return mixed
+
+
+def _mix_majority(global_params, contributions, alpha):
+    """
+    Weighted vote: the current global value votes with (1 - alpha) and every
+    buffered value with its share of alpha
+    """
+    scores = {}
+    if global_params is not None:
+        for param, value in global_params.items():
+            scores.setdefault(param, Counter())[value] += 1 - alpha
+    total = sum(weight for _, weight in contributions)
+    for params, weight in contributions:
+        for param, value in params.items():
+            scores.setdefault(param, Counter())[value] += alpha * weight / total
+    return {param: counter.most_common(1)[0][0] for param, counter in scores.items()}
+
+
+def _mix_fedavg(global_params, contributions, alpha):
+    """
+    Sample- and staleness-weighted average of the buffered weights, mixed into the global model
+    """
+    sums, total, num_samples = {}, 0.0, 0
+    for params, weight in contributions:
+        scaled = weight * params["num_samples"]
+        for name, value in params["weights"].items():
+            value = np.asarray(value, dtype=np.float64)
+            if name in sums and sums[name].shape != value.shape:
+                raise ValueError(f"Shape mismatch for '{name}': {value.shape} != {sums[name].shape}")
+            sums[name] = sums.get(name, 0) + scaled * value
+        total += scaled
+        num_samples += params["num_samples"]
+    if total <= 0:
+        return global_params or {}
+    merged = {name: value / total for name, value in sums.items()}
+    if global_params:
+        for name, value in global_params["weights"].items():
+            if name in merged:
+                merged[name] = (1 - alpha) * np.asarray(value, dtype=np.float64) + alpha * merged[name]
+            else:
+                merged[name] = value
+    return {"num_samples": num_samples, "weights": merged}
+
+
+MIXERS = {
+    "avg": _mix_avg,
+    "majority": _mix_majority,
+    "fedavg": _mix_fedavg,
+}
+
+
+class AsyncBuffer:
+    """
+    Asynchronous aggregation (FedAsync with buffer_size 1, FedBuff with buffer_size K).
+    Every contribution carries the global version it was trained from; its
+    staleness is the number of aggregates emitted since then and its weight is
+    alpha * staleness_fn(staleness). After buffer_size contributions the buffer
+    is merged into the global params with the mean of those weights and the
+    global version advances, so no node ever waits for the slowest one.
+
+    Attributes:
+        version: Version of the current global params (0 -> none emitted yet)
+        global_params: Latest aggregate
+    """
+
+    def __init__(self, method, buffer_size=1, alpha=0.6, staleness=None):
+        if method not in MIXERS:
+            raise ValueError(f"Async aggregation does not support method '{method}'")
+        staleness = staleness or {}
+        function = staleness.get("function", "polynomial")
+        if function not in STALENESS_FUNCTIONS:
+            raise ValueError(f"Unknown staleness function '{function}'")
+        self.mix = MIXERS[method]
+        self.buffer_size = max(1, int(buffer_size))
+        self.alpha = alpha
+        self.staleness_fn = STALENESS_FUNCTIONS[function]
+        self.staleness_args = {"a": staleness.get("a", 0.5), "b": staleness.get("b", 4)}
+        self.version = 0
+        self.global_params = None
+        self.buffer = []
+
+    def staleness(self, base_version):
+        """
+        Aggregates emitted since base_version (None -> trained from scratch)
+        """
+        return max(0, self.version - (base_version or 0))
+
+    def add(self, node_id, params, base_version):
+        """
+        Buffer a contribution
+        Args:
+            node_id: Identifier of the node that sent the params
+            params: Dictionary with the node hyperparameters
+            base_version: Global version the node trained from
+        Returns:
+            (global_params, version) when the buffer was flushed, None otherwise
+        """
+        staleness = self.staleness(base_version)
+        weight = self.alpha * self.staleness_fn(staleness, **self.staleness_args)
+        self.buffer.append((params, weight))
+        if len(self.buffer) < self.buffer_size:
+            return None
+
+        contributions, self.buffer = self.buffer, []
+        alpha = sum(weight for _, weight in contributions) / len(contributions)
+        self.global_params = self.mix(self.global_params, contributions, alpha)
+        self.version += 1
+        return self.global_params, self.version
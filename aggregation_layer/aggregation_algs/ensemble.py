@@ -0,0 +1,80 @@
+import copy
+import numpy as np
+
+
+def forest_in_raw_space(model):
+    """
+    Extract the RandomForest from a fitted model and express its split thresholds
+    in raw feature space, so forests trained behind different scalers can be merged
+    Args:
+        model: Fitted Pipeline([("scaler", StandardScaler | "passthrough"), ("classifier", RandomForest)]),
+            a fitted search object (best_estimator_ is used) or a bare fitted forest
+    Returns:
+        forest: The forest, modified in place (thresholds now apply to unscaled features)
+    """
+    model = getattr(model, "best_estimator_", model)
+    if not hasattr(model, "named_steps"):
+        return model
+    forest = model.named_steps["classifier"]
+    scaler = model.named_steps.get("scaler")
+    if scaler is None or scaler == "passthrough":
+        return forest
+
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    for tree in forest.estimators_:
+        nodes = tree.tree_
+        split = nodes.children_left != -1
+        features = nodes.feature[split]
+        threshold = nodes.threshold
+        if scale is not None:
+            threshold[split] *= scale[features]
+        if mean is not None:
+            threshold[split] += mean[features]
+    return forest
+
+
+def merge_forests(forests, weights=None, max_estimators=None, random_state=0):
+    """
+    Merge fitted forests into a single forest by pooling their estimators_
+    Args:
+        forests: Dict {node_id: fitted RandomForestClassifier}, all in the same feature space
+        weights: Optional dict {node_id: validation score}; with max_estimators each node
+            contributes trees in proportion to its weight
+        max_estimators: Size of the merged forest (None -> every tree from every node)
+        random_state: Seed for the per-node subsampling
+    Returns:
+        merged: RandomForestClassifier whose estimators_ are the selected trees
+    """
+    node_ids = sorted(forests)
+    reference = forests[node_ids[0]]
+    compatible = [
+        node for node in node_ids
+        if np.array_equal(forests[node].classes_, reference.classes_)
+        and forests[node].n_features_in_ == reference.n_features_in_
+    ]
+
+    total = sum(len(forests[node].estimators_) for node in compatible)
+    if max_estimators is None or max_estimators >= total:
+        quotas = {node: len(forests[node].estimators_) for node in compatible}
+    else:
+        raw = np.array([max(float((weights or {}).get(node, 1.0)), 0.0) for node in compatible])
+        if raw.sum() == 0:
+            raw = np.ones(len(compatible))
+        shares = raw / raw.sum() * max_estimators
+        quotas = {
+            node: min(len(forests[node].estimators_), int(round(share)))
+            for node, share in zip(compatible, shares)
+        }
+
+    rng = np.random.default_rng(random_state)
+    estimators = []
+    for node in compatible:
+        trees = forests[node].estimators_
+        picked = rng.choice(len(trees), size=quotas[node], replace=False)
+        estimators.extend(trees[i] for i in sorted(picked))
+
+    merged = copy.copy(reference)
+    merged.estimators_ = estimators
+    merged.n_estimators = len(estimators)
+    return merged
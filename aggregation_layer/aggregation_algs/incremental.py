@@ -0,0 +1,320 @@
+from collections import Counter
+import numpy as np
+
+
+class RunningAggregation:
+    """
+    Base class for incremental aggregation engines.
+    Keeps the latest contribution of every node so that a new or replaced
+    contribution only costs O(params) instead of re-aggregating every node.
+
+    For hierarchical aggregation an engine can also absorb the partial state of
+    a child aggregator (update_partial); partial() exports the state built from
+    everything this engine has seen, so a parent holding the partials of all
+    groups produces the same result as a flat engine holding every node.
+    """
+
+    def __init__(self):
+        self.contributions = {}
+        self.partials = {}
+
+    def update(self, node_id, params):
+        """
+        Add or replace the contribution of a node
+        Args:
+            node_id: Identifier of the node that sent the params
+            params: Dictionary with the node hyperparameters
+        Raises:
+            ValueError: If params are incompatible with the state (nothing is changed)
+        """
+        self._check(params, replacing=set(self.contributions) <= {node_id} and not self.partials)
+        old_params = self.contributions.get(node_id)
+        if old_params is not None:
+            self._apply(old_params, -1)
+        self.contributions[node_id] = params
+        self._apply(params, 1)
+
+    def remove(self, node_id):
+        """
+        Remove the contribution of a node, if present
+        """
+        old_params = self.contributions.pop(node_id, None)
+        if old_params is not None:
+            self._apply(old_params, -1)
+
+    def update_partial(self, child_id, partial):
+        """
+        Add or replace the partial aggregate of a child aggregator
+        Args:
+            child_id: Identifier of the child aggregator
+            partial: State exported by the child's partial()
+        Raises:
+            ValueError: If the partial is incompatible with the state (nothing is changed)
+        """
+        self._check_partial(partial, replacing=set(self.partials) <= {child_id} and not self.contributions)
+        old_partial = self.partials.get(child_id)
+        if old_partial is not None:
+            self._apply_partial(old_partial, -1)
+        self.partials[child_id] = partial
+        self._apply_partial(partial, 1)
+
+    def remove_partial(self, child_id):
+        """
+        Remove the partial aggregate of a child aggregator, if present
+        """
+        old_partial = self.partials.pop(child_id, None)
+        if old_partial is not None:
+            self._apply_partial(old_partial, -1)
+
+    def retain(self, node_ids):
+        """
+        Drop every contribution and partial whose sender is not in node_ids
+        (e.g. nodes that moved to another group after a membership change)
+        """
+        for node_id in [node for node in self.contributions if node not in node_ids]:
+            self.remove(node_id)
+        for child_id in [child for child in self.partials if child not in node_ids]:
+            self.remove_partial(child_id)
+
+    def num_nodes(self):
+        """
+        Number of leaf nodes aggregated here, directly or through partials
+        """
+        return len(self.contributions) + sum(partial["nodes"] for partial in self.partials.values())
+
+    def __len__(self):
+        return len(self.contributions)
+
+    def _check(self, params, replacing):
+        """
+        Validate params before any state is touched; replacing is True when the
+        contribution would be the only one left (so it may redefine the layout)
+        """
+
+    def _check_partial(self, partial, replacing):
+        """
+        Same as _check for the partial of a child aggregator
+        """
+
+    def _apply(self, params, sign):
+        raise NotImplementedError
+
+    def _apply_partial(self, partial, sign):
+        raise NotImplementedError
+
+    def partial(self):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class RunningAverage(RunningAggregation):
+    """
+    Incremental counterpart of aggregate_avg.
+    Keeps a running sum per parameter; the result divides each sum by the
+    number of nodes, exactly like aggregate_avg.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sums = {}
+        self.counts = {}
+
+    def _apply(self, params, sign):
+        for param, value in params.items():
+            count = self.counts.get(param, 0) + sign
+            if count == 0:
+                del self.counts[param]
+                del self.sums[param]
+                continue
+            self.counts[param] = count
+            self.sums[param] = self.sums.get(param, 0) + sign * value
+
+    def _apply_partial(self, partial, sign):
+        for param, total in partial["sums"].items():
+            count = self.counts.get(param, 0) + sign * partial["counts"][param]
+            if count == 0:
+                del self.counts[param]
+                del self.sums[param]
+                continue
+            self.counts[param] = count
+            self.sums[param] = self.sums.get(param, 0) + sign * total
+
+    def partial(self):
+        """
+        Returns:
+            partial: Running sums and counts plus the number of nodes behind them
+        """
+        return {"nodes": self.num_nodes(), "sums": dict(self.sums), "counts": dict(self.counts)}
+
+    def result(self):
+        """
+        Returns:
+            aggregated_params: Dictionary with averaged hyperparameters
+        """
+        num_nodes = self.num_nodes()
+        return {param: total / num_nodes for param, total in self.sums.items()}
+
+
+class RunningMajority(RunningAggregation):
+    """
+    Incremental counterpart of aggregate_majority.
+    Keeps a running Counter of values per parameter. Ties are broken like
+    aggregate_majority does: the value whose first holder comes first in
+    node order (contributions keeps each node at its first arrival).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.value_counts = {}
+
+    def _apply(self, params, sign):
+        for param, value in params.items():
+            counter = self.value_counts.setdefault(param, Counter())
+            counter[value] += sign
+            if counter[value] <= 0:
+                del counter[value]
+            if not counter:
+                del self.value_counts[param]
+
+    def _apply_partial(self, partial, sign):
+        for param, pairs in partial["value_counts"].items():
+            counter = self.value_counts.setdefault(param, Counter())
+            for value, count in pairs:
+                if isinstance(value, list):
+                    value = tuple(value)
+                counter[value] += sign * count
+                if counter[value] <= 0:
+                    del counter[value]
+            if not counter:
+                del self.value_counts[param]
+
+    def partial(self):
+        """
+        Returns:
+            partial: Value counts per parameter as [value, count] pairs (serializable
+                regardless of the value type) plus the number of nodes behind them
+        """
+        return {
+            "nodes": self.num_nodes(),
+            "value_counts": {
+                param: [[value, count] for value, count in counter.items()]
+                for param, counter in self.value_counts.items()
+            },
+        }
+
+    def result(self):
+        """
+        Returns:
+            aggregated_params: Dictionary with majority hyperparameters
+        """
+        aggregated_params = {}
+        for param, counter in self.value_counts.items():
+            ranked = counter.most_common(2)
+            if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+                aggregated_params[param] = self._break_tie(param, counter, ranked[0][1])
+            else:
+                aggregated_params[param] = ranked[0][0]
+        return aggregated_params
+
+    def _break_tie(self, param, counter, top_count):
+        tied = {value for value, count in counter.items() if count == top_count}
+        for params in self.contributions.values():
+            if param in params and params[param] in tied:
+                return params[param]
+        # only partials hold the tied values: no node order to follow
+        return counter.most_common(1)[0][0]
+
+
+class RunningFedAvg(RunningAggregation):
+    """
+    Incremental counterpart of aggregate_fedavg.
+    Keeps the running sample-weighted sum of every tensor and the total number
+    of samples; all updates are done in place.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.weighted_sums = {}
+        self.scratch = {}
+        self.total_samples = 0
+
+    def _check_layout(self, tensors, replacing):
+        # same rule as aggregate_fedavg: every node publishes the same named tensors and shapes
+        if replacing or not self.weighted_sums:
+            return
+        if tensors.keys() != self.weighted_sums.keys():
+            raise ValueError("All nodes must publish the same named weights.")
+        for name, value in tensors.items():
+            if np.shape(value) != self.weighted_sums[name].shape:
+                raise ValueError(f"Shape mismatch for '{name}': {np.shape(value)} != {self.weighted_sums[name].shape}")
+
+    def _check(self, params, replacing):
+        self._check_layout(params["weights"], replacing)
+
+    def _check_partial(self, partial, replacing):
+        if partial["weighted_sums"]:
+            self._check_layout(partial["weighted_sums"], replacing)
+
+    def _apply(self, params, sign):
+        num_samples = params["num_samples"]
+        for name, value in params["weights"].items():
+            value = np.asarray(value)
+            if name not in self.weighted_sums:
+                self.weighted_sums[name] = np.zeros(value.shape, dtype=np.float64)
+                self.scratch[name] = np.empty(value.shape, dtype=np.float64)
+            scratch = self.scratch[name]
+            np.multiply(value, sign * num_samples, out=scratch)
+            self.weighted_sums[name] += scratch
+        self.total_samples += sign * num_samples
+        self._reset_if_empty()
+
+    def _apply_partial(self, partial, sign):
+        for name, total in partial["weighted_sums"].items():
+            total = np.asarray(total, dtype=np.float64)
+            if name not in self.weighted_sums:
+                self.weighted_sums[name] = np.zeros(total.shape, dtype=np.float64)
+                self.scratch[name] = np.empty(total.shape, dtype=np.float64)
+            if sign > 0:
+                self.weighted_sums[name] += total
+            else:
+                self.weighted_sums[name] -= total
+        self.total_samples += sign * partial["num_samples"]
+        self._reset_if_empty()
+
+    def _reset_if_empty(self):
+        if (not self.contributions and not self.partials) or self.total_samples <= 0:
+            self.weighted_sums.clear()
+            self.scratch.clear()
+            self.total_samples = 0
+
+    def partial(self):
+        """
+        Returns:
+            partial: Sample-weighted sums (not yet divided) and the total number of samples
+        """
+        return {
+            "nodes": self.num_nodes(),
+            "num_samples": int(self.total_samples),
+            "weighted_sums": {name: total.copy() for name, total in self.weighted_sums.items()},
+        }
+
+    def result(self):
+        """
+        Returns:
+            aggregated_params: Dictionary with the total num_samples and the averaged weights
+        """
+        if self.total_samples <= 0:
+            return {}
+        return {
+            "num_samples": int(self.total_samples),
+            "weights": {name: total / self.total_samples for name, total in self.weighted_sums.items()},
+        }
+
+
+INCREMENTAL_ALGS_DICT = {
+    "avg": RunningAverage,
+    "majority": RunningMajority,
+    "fedavg": RunningFedAvg,
+}
@@ -0,0 +1,88 @@
+import math, time
+from collections import OrderedDict
+
+
+class RoundBuffer:
+    """
+    Buffers contributions per round id until a quorum or a deadline is reached.
+    Each round is emitted exactly once; contributions for a round that was
+    already emitted are dropped.
+
+    Attributes:
+        state_factory: Class of the incremental engine used for each round
+        quorum_fraction: Fraction of the cluster needed to close a round, in (0, 1]
+        quorum_count: Fixed number of contributions needed to close a round (overrides quorum_fraction)
+        deadline: Seconds after the first contribution before the round is forced closed
+    """
+
+    def __init__(
+        self, state_factory, quorum_fraction=1.0, quorum_count=None, deadline=30.0, clock=time.monotonic, max_closed=64
+    ):
+        if isinstance(quorum_fraction, bool) or not 0 < quorum_fraction <= 1:
+            raise ValueError(f"quorum_fraction must be in (0, 1], got {quorum_fraction!r}")
+        if quorum_count is not None and (
+            isinstance(quorum_count, bool) or not isinstance(quorum_count, int) or quorum_count < 1
+        ):
+            raise ValueError(f"quorum_count must be a positive integer, got {quorum_count!r}")
+        self.state_factory = state_factory
+        self.quorum_fraction = quorum_fraction
+        self.quorum_count = quorum_count
+        self.deadline = deadline
+        self.clock = clock
+        self.max_closed = max_closed
+        self.open_rounds = {}
+        self.closed_rounds = OrderedDict()
+
+    def required(self, cluster_size):
+        """
+        Number of contributions needed to close a round for the given cluster size
+        """
+        if self.quorum_count is not None:
+            return self.quorum_count
+        return max(1, math.ceil(self.quorum_fraction * cluster_size))
+
+    def add(self, round_id, node_id, params, cluster_size):
+        """
+        Adds a contribution to a round
+        Args:
+            round_id: Round the params were trained for
+            node_id: Identifier of the node that sent the params
+            params: Dictionary with the node hyperparameters
+            cluster_size: Current number of nodes in the cluster
+        Returns:
+            aggregated_params if this contribution closes the round, None otherwise
+        """
+        if round_id in self.closed_rounds:
+            return None
+
+        entry = self.open_rounds.get(round_id)
+        if entry is None:
+            entry = self.open_rounds[round_id] = (self.state_factory(), self.clock())
+        state, _ = entry
+        state.update(node_id, params)
+
+        if len(state) >= self.required(cluster_size):
+            return self._close(round_id)
+        return None
+
+    def poll(self, cluster_size):
+        """
+        Closes rounds that reached the deadline or whose quorum shrank with the cluster
+        Returns:
+            List of (round_id, aggregated_params)
+        """
+        now = self.clock()
+        needed = self.required(cluster_size)
+        ready = [
+            round_id
+            for round_id, (state, opened_at) in self.open_rounds.items()
+            if len(state) >= needed or now - opened_at >= self.deadline
+        ]
+        return [(round_id, self._close(round_id)) for round_id in ready]
+
+    def _close(self, round_id):
+        state, _ = self.open_rounds.pop(round_id)
+        self.closed_rounds[round_id] = True
+        while len(self.closed_rounds) > self.max_closed:
+            self.closed_rounds.popitem(last=False)
+        return state.result()
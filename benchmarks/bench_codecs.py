@@ -0,0 +1,116 @@
+"""
+Micro-benchmark dos codecs de payload do Communication_Layer.
+
+Compara tempo de encode/decode e bytes no fio para payloads típicos de
+`trained_params` e `agg_params`, e para um payload de pesos (se houver numpy).
+
+Uso:
+    python benchmarks/bench_codecs.py [--repeat 20000] [--json resultados.json]
+"""
+import argparse, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from client.payload_codecs import CODECS, PayloadCodec, decode_payload, lz4_frame, msgpack, cbor2, np
+
+
+def sample_payloads():
+    payloads = {
+        "trained_params": {
+            "id": "172.31.1.143",
+            "round": 12,
+            "trained_params": {
+                "classifier__max_depth": 20,
+                "classifier__min_samples_leaf": 2,
+                "classifier__n_estimators": 200,
+            },
+        },
+        "agg_params": {
+            "id": "172_31_1_143",
+            "round": 12,
+            "agg_params": {
+                "classifier__max_depth": 26.666666666666668,
+                "classifier__min_samples_leaf": 2.3333333333333335,
+                "classifier__n_estimators": 183.33333333333334,
+            },
+        },
+    }
+    if np is not None:
+        rng = np.random.default_rng(0)
+        payloads["weights_64k"] = {
+            "id": "172.31.1.143",
+            "round": 12,
+            "trained_params": {
+                "num_samples": 142,
+                "weights": {
+                    "dense_1": rng.standard_normal((128, 256)).astype(np.float32),
+                    "dense_2": rng.standard_normal((256, 64)).astype(np.float32),
+                },
+            },
+        }
+    return payloads
+
+
+def available_configs():
+    available = {"json": True, "msgpack": msgpack is not None, "cbor": cbor2 is not None}
+    configs = []
+    for codec in CODECS:
+        if not available[codec]:
+            continue
+        configs.append((codec, None))
+        configs.append((codec, "zlib"))
+        if lz4_frame is not None:
+            configs.append((codec, "lz4"))
+    return configs
+
+
+def bench(codec, payload, repeat):
+    try:
+        raw = codec.encode(payload)
+    except TypeError:
+        return None  # o codec não suporta este payload (ex: arrays em JSON puro)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.encode(payload)
+    encode_us = (time.perf_counter() - start) / repeat * 1e6
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode_payload(raw)
+    decode_us = (time.perf_counter() - start) / repeat * 1e6
+
+    return {"bytes": len(raw), "encode_us": round(encode_us, 2), "decode_us": round(decode_us, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    parser.add_argument("--threshold", type=int, default=0, help="compress_threshold usado (bytes)")
+    parser.add_argument("--json", help="guarda os resultados neste ficheiro")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'payload':<16}{'codec':<10}{'compressão':<12}{'bytes':>9}{'encode µs':>12}{'decode µs':>12}")
+    for name, payload in sample_payloads().items():
+        # payloads grandes repetem menos vezes para o benchmark não demorar minutos
+        repeat = args.repeat if name != "weights_64k" else max(1, args.repeat // 200)
+        for codec_name, compression in available_configs():
+            codec = PayloadCodec(codec_name, compression, compress_threshold=args.threshold)
+            row = bench(codec, payload, repeat)
+            if row is None:
+                continue
+            row.update({"payload": name, "codec": codec_name, "compression": compression or "none"})
+            results.append(row)
+            print(
+                f"{name:<16}{codec_name:<10}{row['compression']:<12}"
+                f"{row['bytes']:>9}{row['encode_us']:>12}{row['decode_us']:>12}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
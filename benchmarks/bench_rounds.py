@@ -0,0 +1,398 @@
+"""
+Benchmark end-to-end da latência por ronda com N peers simulados em loopback.
+
+O agregador é o Aggregator real (aggregation_layer/aggregation.py) em modo de
+rondas síncronas: as contribuições passam por on_trained_params, RoundBuffer,
+TopicRouter, codecs e filtro do próprio prefixo do Communication_Layer, por
+isso regressões no caminho de agregação aparecem aqui. Os N treinadores são
+equivalentes ao Model_Manager (treino simulado com `--train-time`) e a lista
+de peers do agregador vem da membership (hello/hi da Membership).
+Por defeito usa um broker em processo; com `--transport mqtt` o
+Communication_Layer liga-se a um mosquitto local.
+
+Mede, para cada N:
+    - percentis da latência por ronda
+    - mensagens e bytes publicados por ronda
+    - tempo de CPU do agregador (on_trained_params)
+    - tempo até convergência dos parâmetros agregados
+
+Uso:
+    python benchmarks/bench_rounds.py --sizes 2 4 8 16 32 --rounds 15
+    python benchmarks/bench_rounds.py --transport mqtt --host 127.0.0.1 --port 1884
+"""
+import argparse, contextlib, io, json, os, random, shutil, subprocess, sys, tempfile, threading, time
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "aggregation_layer"))
+
+import yaml
+
+import aggregation
+from client.membership import Membership
+from client.mqtt_layer import Communication_Layer
+
+# IP do nó agregador (não treina); os treinadores são 10.0.x.y
+AGGREGATOR_IP = "10.255.0.1"
+
+
+def topic_matches(topic_filter, topic):
+    """
+    Verifica se um tópico MQTT corresponde a um filtro com '+' e '#'.
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class Stats:
+    """
+    Contadores de mensagens e bytes publicados (thread-safe).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+
+    def add(self, num_bytes):
+        with self.lock:
+            self.messages += 1
+            self.bytes += num_bytes
+
+    def snapshot(self):
+        with self.lock:
+            return self.messages, self.bytes
+
+
+class InProcessBroker:
+    """
+    Broker MQTT mínimo em processo: entrega os bytes por correspondência de filtros.
+    """
+    def __init__(self):
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, client, topic_filter):
+        with self.lock:
+            self.subscriptions.append((topic_filter, client))
+
+    def unsubscribe_all(self, client):
+        with self.lock:
+            self.subscriptions = [(f, c) for f, c in self.subscriptions if c is not client]
+
+    def publish(self, topic, raw):
+        with self.lock:
+            subscribers = [client for topic_filter, client in self.subscriptions if topic_matches(topic_filter, topic)]
+        for client in subscribers:
+            client.on_message(None, None, SimpleNamespace(topic=topic, payload=raw))
+
+
+def make_layer_factory(args, stats, in_process=None):
+    """
+    Fábrica com a assinatura do Communication_Layer usada pelo Aggregator e pelos
+    treinadores. O prefixo próprio (filtro das mensagens do próprio nó) é o IP
+    do nó, como num Raspberry; só o transporte muda:
+        broker em processo -> publish entregue diretamente ao on_message real
+        mqtt -> Communication_Layer real ligado a --host/--port
+    """
+    class CountingLayer(Communication_Layer):
+        def _publish_raw(self, raw, full_topic):
+            stats.add(len(raw))
+            if in_process is None:
+                super()._publish_raw(raw, full_topic)
+            else:
+                in_process.publish(full_topic, raw)
+
+        def _connect_mqtt(self, host, port, user, pwd):
+            if in_process is None:
+                return super()._connect_mqtt(host, port, user, pwd)
+            return SimpleNamespace(loop_start=lambda: None, loop_stop=lambda: None, disconnect=lambda: None)
+
+        def subscribe(self, topic):
+            if in_process is None:
+                super().subscribe(topic)
+            else:
+                in_process.subscribe(self, topic)
+
+        def disconnect(self):
+            if in_process is not None:
+                in_process.unsubscribe_all(self)
+            super().disconnect()
+
+    def factory(broker="", port=None, client_id="", **kwargs):
+        node_ip = broker
+        host = node_ip
+        if in_process is None:
+            host, port = args.host, args.port
+        kwargs.setdefault("codec", args.codec)
+        layer = CountingLayer(broker=host, port=port, client_id=client_id, **kwargs)
+        layer.topic_broker_id = node_ip.replace(".", "_")
+        return layer
+    return factory
+
+
+def make_aggregator(args, n, peer_list, layer_factory):
+    """
+    Cria o Aggregator real num diretório com o layout do container
+    (client/config.yaml relativo ao cwd) e o Communication_Layer do benchmark.
+    A ronda fecha com as contribuições dos n treinadores (quorum n).
+    """
+    class TimedAggregator(aggregation.Aggregator):
+        cpu_time = 0.0
+
+        def on_trained_params(self, topic, data):
+            start = time.thread_time()
+            try:
+                super().on_trained_params(topic, data)
+            finally:
+                self.cpu_time += time.thread_time() - start
+
+    with open(os.path.join(ROOT, "client", "config.yaml"), "r") as f:
+        config = yaml.safe_load(f)
+    config.update(peer_ip=AGGREGATOR_IP, central_server=AGGREGATOR_IP, mode="gossip")
+    # destinos vazios: o agregado é publicado em <agregador>/train
+    config["routing_topology"] = {"aggregation_topology": [], "pipeline_topology": [], "hierarchy": {"enabled": False}}
+    config["aggregation"] = {"method": args.method, "sync_rounds": True, "quorum": n, "round_deadline": args.timeout}
+    config["codec"] = {"format": args.codec}
+    config["observability"] = {"log_payloads": "off"}
+    config["update_encoding"] = {"enabled": False}
+    config["checkpoint"] = {"enabled": False}
+
+    workdir = tempfile.mkdtemp(prefix="bench_rounds_")
+    cwd = os.getcwd()
+    aggregation.Communication_Layer = layer_factory
+    try:
+        os.makedirs(os.path.join(workdir, "client"))
+        with open(os.path.join(workdir, "client", "config.yaml"), "w") as f:
+            yaml.safe_dump(config, f)
+        os.chdir(workdir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            aggregator = TimedAggregator()
+            aggregator.on_peers("system/peers", peer_list)
+    finally:
+        os.chdir(cwd)
+        aggregation.Communication_Layer = Communication_Layer
+        shutil.rmtree(workdir, ignore_errors=True)
+    return aggregator
+
+
+# ponto de partida comum (equivalente à grid inicial do param_config.yaml)
+INITIAL_PARAMS = {
+    "classifier__n_estimators": 100.0,
+    "classifier__max_depth": 20.0,
+    "classifier__min_samples_leaf": 2.0,
+}
+
+
+class SimTrainer:
+    """
+    Treinador equivalente ao Model_Manager: recebe agregados, "treina" e publica.
+    Cada treino move os parâmetros a meio caminho entre o agregado recebido e um
+    ótimo local do peer, por isso o agregado converge geometricamente.
+    Publica no próprio prefixo (<id>/agg, como o pipeline sem destinos) e
+    subscreve +/train, como o pipeline em modo gossip.
+    """
+    def __init__(self, ip, comm, train_time, rounds, on_received, rng):
+        self.ip = ip
+        self.node_id = ip.replace(".", "_")
+        self.comm = comm
+        self.train_time = train_time
+        self.rounds = rounds
+        self.on_received = on_received
+        self.rng = rng
+        self.local_optimum = {
+            "classifier__n_estimators": rng.uniform(50, 500),
+            "classifier__max_depth": rng.uniform(10, 50),
+            "classifier__min_samples_leaf": rng.uniform(1, 5),
+        }
+        comm.route("+/train", self.on_aggregate)
+        threading.Thread(target=self.train, args=(0, INITIAL_PARAMS), daemon=True).start()
+
+    def train(self, round_id, center):
+        time.sleep(self.train_time * self.rng.uniform(0.5, 1.5))
+        params = {
+            param: 0.5 * (center[param] + local) * self.rng.uniform(0.999, 1.001)
+            for param, local in self.local_optimum.items()
+        }
+        payload = {"id": self.ip, "round": round_id, "trained_params": params}
+        self.comm.publish(payload, topic=f"{self.node_id}/agg")
+
+    def on_aggregate(self, topic, data):
+        round_id = data["round"]
+        self.on_received(round_id, self.node_id, data["agg_params"])
+        if round_id + 1 < self.rounds:
+            self.train(round_id + 1, data["agg_params"])
+
+
+def build_membership(node_ips):
+    """
+    Forma a tabela de membership de todos os peers com hello/hi em memória.
+    Returns:
+        peers: {ip: [peers conhecidos]}, datagrams: nº de datagramas trocados
+    """
+    nodes = {}
+    datagrams = [0]
+
+    def make_send(ip):
+        def send(msg, addr):
+            for other_ip, node in nodes.items():
+                if other_ip != ip and (addr is None or addr[0] == other_ip):
+                    datagrams[0] += 1
+                    node.handle(msg, (ip, 50001))
+        return send
+
+    for ip in node_ips:
+        nodes[ip] = Membership(ip, 1884, make_send(ip))
+    with contextlib.redirect_stdout(io.StringIO()):  # logs de "Novo peer" não interessam aqui
+        for node in nodes.values():
+            node.hello()
+    return {ip: sorted(node.peers()) for ip, node in nodes.items()}, datagrams[0]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_size(n, args, layer_factory, stats):
+    rng = random.Random(args.seed + n)
+    ips = [f"10.0.{i // 250}.{i % 250 + 1}" for i in range(n)]
+    peer_lists, membership_datagrams = build_membership(ips + [AGGREGATOR_IP])
+
+    round_done = {}
+    received = {}
+    aggregates = {}
+    round_end = {}
+    lock = threading.Lock()
+
+    def on_received(round_id, node_id, aggregated):
+        with lock:
+            aggregates.setdefault(round_id, aggregated)
+            received.setdefault(round_id, set()).add(node_id)
+            if len(received[round_id]) == n:
+                round_end[round_id] = time.perf_counter()
+                round_done.setdefault(round_id, threading.Event()).set()
+
+    for r in range(args.rounds):
+        round_done.setdefault(r, threading.Event())
+
+    # peers que aparecem na membership do agregador
+    assert len(peer_lists[AGGREGATOR_IP]) == n, "membership incompleta"
+    aggregator = make_aggregator(args, n, peer_lists[AGGREGATOR_IP], layer_factory)
+    clients = [aggregator.mqtt_com]
+    if args.transport == "mqtt":
+        time.sleep(0.2)  # subscrições do agregador confirmadas pelo broker
+
+    messages_before, bytes_before = stats.snapshot()
+    start = time.perf_counter()
+    for ip in ips:
+        comm = layer_factory(broker=ip, client_id=f"bench_{ip.replace('.', '_')}_{n}", qos=1)
+        clients.append(comm)
+        SimTrainer(ip, comm, args.train_time, args.rounds, on_received, random.Random(rng.random()))
+
+    for r in range(args.rounds):
+        if not round_done[r].wait(timeout=args.timeout):
+            print(f"[BENCH] N={n}: ronda {r} não terminou em {args.timeout}s")
+            break
+    messages, num_bytes = stats.snapshot()
+
+    for comm in clients:
+        comm.disconnect()
+
+    completed = sorted(round_end)
+    latencies = []
+    previous_end = start
+    for r in completed:
+        latencies.append(round_end[r] - previous_end)
+        previous_end = round_end[r]
+
+    converged_at = None
+    for r in completed[1:]:
+        previous, current = aggregates.get(r - 1), aggregates.get(r)
+        if previous and current and all(
+            abs(current[p] - previous[p]) <= args.tolerance * abs(previous[p]) for p in current
+        ):
+            converged_at = round_end[r] - start
+            break
+
+    num_rounds = max(1, len(completed))
+    return {
+        "n": n,
+        "rounds_completed": len(completed),
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p90_s": percentile(latencies, 90),
+        "latency_p99_s": percentile(latencies, 99),
+        "messages_per_round": (messages - messages_before) / num_rounds,
+        "bytes_per_round": (num_bytes - bytes_before) / num_rounds,
+        "membership_datagrams": membership_datagrams,
+        "aggregator_cpu_s": aggregator.cpu_time,
+        "time_to_convergence_s": converged_at,
+    }
+
+
+def fmt(value, spec, unit=""):
+    # tamanhos que não completaram nenhuma ronda não têm latência
+    return "n/a" if value is None else format(value, spec) + unit
+
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 8, 16, 32])
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--train-time", type=float, default=0.05, help="segundos de treino simulado por ronda")
+    parser.add_argument("--method", choices=["avg", "majority"], default="avg")
+    parser.add_argument("--codec", default="json")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="variação relativa para convergência")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--transport", choices=["inproc", "mqtt"], default="inproc")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1884)
+    parser.add_argument("--out", help="ficheiro JSON de resultados (default: benchmarks/results/rounds_<timestamp>.json)")
+    args = parser.parse_args()
+
+    stats = Stats()
+    results = []
+    for n in args.sizes:
+        # broker novo por tamanho: os clientes de N anteriores não recebem nada
+        in_process = InProcessBroker() if args.transport == "inproc" else None
+        row = run_size(n, args, make_layer_factory(args, stats, in_process), stats)
+        results.append(row)
+        print(
+            f"N={n:<3} rondas={row['rounds_completed']:<3} p50={fmt(row['latency_p50_s'], '.4f', 's')} "
+            f"p99={fmt(row['latency_p99_s'], '.4f', 's')} msgs/ronda={row['messages_per_round']:.1f} "
+            f"bytes/ronda={row['bytes_per_round']:.0f} cpu_agg={row['aggregator_cpu_s']:.4f}s "
+            f"convergência={row['time_to_convergence_s']}"
+        )
+
+    report = {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "results": results,
+    }
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", f"rounds_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados em {out}")
+
+
+if __name__ == "__main__":
+    main()
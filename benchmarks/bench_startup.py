@@ -0,0 +1,205 @@
+"""
+Benchmark do arranque a frio do serviço de pipeline (Model_Manager).
+
+Corre o pipeline.py real num diretório temporário com o layout do container
+(/app = pipeline_layer, /app/client = client), restrito a `--cores` cores
+(orçamento de CPU de um Raspberry Pi) e com uma grelha pequena, e mede:
+    - import_s: tempo de `import pipeline` num interpretador novo
+    - deferred_import_s: imports do sklearn adiados para o primeiro treino
+    - mesh_s: até ao anúncio <id>/status "starting" (ligado ao broker, rotas subscritas)
+    - ready_s: até ao anúncio "ready" (dados e pool prontos, antes do 1º treino)
+    - first_result_s: até aos primeiros trained_params publicados em <id>/agg
+
+As fases do serviço precisam de um broker MQTT em --host/--port; se não houver
+nenhum à escuta e o `mosquitto` estiver no PATH é lançado um local. Sem broker
+só é medido o tempo de import.
+
+Uso:
+    python benchmarks/bench_startup.py [--cores 1] [--repeat 3] [--cold-data]
+    python benchmarks/bench_startup.py --host 127.0.0.1 --port 1884 --out startup.json
+"""
+import argparse, json, os, queue, shutil, socket, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import yaml
+
+BENCH_GRID = {"min_samples_leaf": [1, 2], "n_estimators": [20], "max_depth": [10]}
+
+IMPORT_PROBE = """
+import time
+start = time.perf_counter()
+import pipeline
+imported = time.perf_counter()
+import sklearn.ensemble, sklearn.pipeline, sklearn.preprocessing, search_strategies
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def pin_cores(n_cores):
+    '''
+    preexec_fn: limita o processo filho (e os seus filhos) aos primeiros n_cores
+    '''
+    def pin():
+        if hasattr(os, "sched_setaffinity"):
+            cores = sorted(os.sched_getaffinity(0))[:n_cores]
+            os.sched_setaffinity(0, cores)
+    return pin
+
+
+def make_workdir(args, cache_dir):
+    '''
+    Cria o layout do container: <tmp>/*.py do pipeline_layer, <tmp>/client/*.py
+    e configs ajustados ao broker do benchmark
+    '''
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    for name in os.listdir(os.path.join(ROOT, "pipeline_layer")):
+        if name.endswith(".py"):
+            os.symlink(os.path.join(ROOT, "pipeline_layer", name), os.path.join(workdir, name))
+    client_dir = os.path.join(workdir, "client")
+    os.makedirs(client_dir)
+    for name in os.listdir(os.path.join(ROOT, "client")):
+        if name.endswith(".py"):
+            os.symlink(os.path.join(ROOT, "client", name), os.path.join(client_dir, name))
+
+    with open(os.path.join(ROOT, "client", "config.yaml"), "r") as f:
+        config = yaml.safe_load(f)
+    config.update(peer_ip=args.host, central_server=args.host, mosquitto_port=args.port, mode="gossip")
+    config["observability"] = {"log_payloads": "off"}
+    config["checkpoint"] = {"enabled": False}
+    config["data"] = dict(config.get("data", {}), cache_dir=cache_dir)
+    with open(os.path.join(client_dir, "config.yaml"), "w") as f:
+        yaml.safe_dump(config, f)
+
+    with open(os.path.join(ROOT, "pipeline_layer", "param_config.yaml"), "r") as f:
+        param_config = yaml.safe_load(f)
+    param_config["param_grid"] = BENCH_GRID
+    param_config.setdefault("search", {})["cache"] = {"enabled": False}
+    param_config.setdefault("training_pool", {})["enabled"] = args.training_pool
+    with open(os.path.join(workdir, "param_config.yaml"), "w") as f:
+        yaml.safe_dump(param_config, f)
+    return workdir
+
+
+def measure_imports(workdir, args):
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=workdir, preexec_fn=pin_cores(args.cores), text=True
+    )
+    import_s, deferred_s = (float(value) for value in output.split()[-2:])
+    return {"import_s": import_s, "deferred_import_s": deferred_s}
+
+
+def broker_available(host, port):
+    try:
+        socket.create_connection((host, port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def measure_service(workdir, args):
+    '''
+    Lança o pipeline.py e observa no broker os anúncios de estado e o primeiro resultado
+    '''
+    from client.mqtt_layer import Communication_Layer
+
+    broker_id = args.host.replace(".", "_")
+    events = queue.Queue()
+    observer = Communication_Layer(broker=args.host, port=args.port, client_id=f"bench_startup_{os.getpid()}", qos=1)
+    observer.route(f"{broker_id}/status", lambda topic, data: events.put((time.perf_counter(), data["state"])), own=True)
+    observer.route(f"{broker_id}/agg", lambda topic, data: events.put((time.perf_counter(), "first_result")), own=True)
+    time.sleep(0.5)
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "pipeline.py"], cwd=workdir, preexec_fn=pin_cores(args.cores),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    phases = {}
+    try:
+        deadline = start + args.timeout
+        while "first_result" not in phases and time.perf_counter() < deadline:
+            try:
+                at, phase = events.get(timeout=0.5)
+            except queue.Empty:
+                if process.poll() is not None:
+                    raise RuntimeError(f"pipeline.py terminou com código {process.returncode}")
+                continue
+            phases.setdefault({"starting": "mesh"}.get(phase, phase) + "_s", at - start)
+    finally:
+        process.kill()
+        process.wait()
+        observer.disconnect()
+    return phases
+
+
+def summarize(runs):
+    keys = sorted({key for run in runs for key in run})
+    return {key: statistics.median(run[key] for run in runs if key in run) for key in keys}
+
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cores", type=int, default=1, help="cores disponíveis para o serviço (Pi: 1-4)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1884)
+    parser.add_argument("--timeout", type=float, default=300, help="segundos até desistir do primeiro resultado")
+    parser.add_argument("--cold-data", action="store_true", help="apaga a cache de dados antes de cada execução")
+    parser.add_argument("--training-pool", action="store_true", help="treino no processo separado (training_pool)")
+    parser.add_argument("--out", help="ficheiro JSON de resultados (default: benchmarks/results/startup_<timestamp>.json)")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_startup_data_")
+    broker = None
+    if not broker_available(args.host, args.port) and shutil.which("mosquitto"):
+        broker = subprocess.Popen(["mosquitto", "-p", str(args.port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(1)
+    with_service = broker_available(args.host, args.port)
+    if not with_service:
+        print(f"[BENCH] Sem broker em {args.host}:{args.port}: só o tempo de import é medido.")
+
+    runs = []
+    try:
+        for i in range(args.repeat):
+            if args.cold_data:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            workdir = make_workdir(args, cache_dir)
+            try:
+                run = measure_imports(workdir, args)
+                if with_service:
+                    run.update(measure_service(workdir, args))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            runs.append(run)
+            print(f"[BENCH] execução {i + 1}: " + " ".join(f"{key}={value:.3f}" for key, value in sorted(run.items())))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if broker is not None:
+            broker.terminate()
+
+    report = {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "median": summarize(runs),
+        "runs": runs,
+    }
+    print("[BENCH] mediana: " + " ".join(f"{key}={value:.3f}" for key, value in report["median"].items()))
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", f"startup_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados em {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import asyncio, threading, time
+from collections import OrderedDict
+from paho.mqtt import client as mqtt_client
+
+try:
+    from client.payload_codecs import PayloadCodec, decode_payload
+    from client.metrics import METRICS
+except ImportError:
+    from payload_codecs import PayloadCodec, decode_payload
+    from metrics import METRICS
+
+
+class AsyncCommunication_Layer:
+    """
+        Variante asyncio do Communication_Layer (mesma superfície publish/subscribe).
+
+        O paho continua a correr na sua thread de rede; os callbacks são passados
+        para o event loop com call_soon_threadsafe. Diferenças para a versão síncrona:
+            - `await publish(...)` só termina quando o broker confirma (PUBACK em QoS1);
+            - `publish_many(...)` serializa uma vez e espera por todas as confirmações;
+            - no máximo `max_inflight` publicações por confirmar: as seguintes
+              esperam por uma vaga (backpressure);
+            - as mensagens recebidas lêem-se com `async for topic, data in layer.messages()`.
+
+        Uso:
+            layer = AsyncCommunication_Layer(broker="10.0.0.1", client_id="x", qos=1)
+            await layer.connect()
+            layer.subscribe("+/agg")
+            await layer.publish_many(payload, ["a/train", "b/train"])
+
+        Attributes:
+            client_id (str): Identificador único do cliente MQTT.
+            base_topic (str): Prefixo base para tópicos MQTT.
+            qos (int): Qualidade do serviço MQTT (0, 1 ou 2).
+            codec (PayloadCodec): Serialização dos payloads publicados.
+            client (paho.mqtt.client.Client): Instância do cliente MQTT.
+    """
+    def __init__(
+        self,
+        broker="",
+        port=1884,
+        client_id="",
+        user="admin",
+        pwd="public",
+        base_topic="",
+        qos=1,
+        codec="json",
+        compression=None,
+        compress_threshold=1024,
+        max_inflight=20,
+        queue_size=1000,
+        abandon_ttl=60.0,
+    ):
+        """
+        broker: host do broker
+        port: porta do broker
+        client_id: identificador MQTT
+        base_topic: prefixo base para publicação
+        qos: qualidade do serviço MQTT
+        codec: formato dos payloads publicados ('json', 'msgpack' ou 'cbor')
+        compression: compressão acima de compress_threshold bytes ('zlib', 'lz4' ou None)
+        max_inflight: nº máximo de publicações à espera de confirmação
+        queue_size: tamanho da fila de mensagens recebidas (cheia -> descarta a mais antiga)
+        abandon_ttl: segundos durante os quais uma confirmação tardia de um publish abandonado é ignorada
+        """
+        self.broker = broker
+        self.port = port
+        self.client_id = client_id
+        self.topic_broker_id = broker.replace(".", "_")
+        self.base_topic = base_topic
+        self.qos = qos
+        self.codec = PayloadCodec(codec, compression, compress_threshold)
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self.abandon_ttl = abandon_ttl
+
+        self.loop = None
+        self.inflight = None
+        self.incoming = None
+        self.connected = None
+        # mid -> future; early_acks cobre o callback que chega antes do registo e
+        # abandoned (mid -> instante) os mids cujo publish desistiu (timeout ou
+        # queda da ligação), esquecidos ao fim de abandon_ttl segundos
+        self.pending = {}
+        self.early_acks = set()
+        self.abandoned = OrderedDict()
+        self.ack_lock = threading.RLock()
+
+        self.client = mqtt_client.Client(client_id=self.client_id)
+        if user and pwd:
+            self.client.username_pw_set(user, pwd)
+        # a janela do paho acompanha a do semáforo (0 = ilimitada no paho)
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.on_message = self._on_message
+
+    # --- ligação --- #
+
+    async def connect(self):
+        '''
+        Liga ao broker e espera pelo CONNACK.
+        '''
+        self.loop = asyncio.get_running_loop()
+        self.inflight = asyncio.Semaphore(self.max_inflight)
+        self.incoming = asyncio.Queue(maxsize=self.queue_size)
+        self.connected = self.loop.create_future()
+        self.client.connect_async(self.broker, self.port)
+        self.client.loop_start()
+        await self.connected
+
+    async def disconnect(self):
+        self.client.disconnect()
+        await self.loop.run_in_executor(None, self.client.loop_stop)
+        self._fail_pending(ConnectionError("Disconnected"))
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print(f"[{self.client_id}] Connected to {self.broker}:{self.port}")
+            self.loop.call_soon_threadsafe(self._settle, self.connected, None)
+        else:
+            print(f"[{self.client_id}] Connection failed with code {rc}")
+            self.loop.call_soon_threadsafe(self._settle, self.connected, ConnectionError(f"rc={rc}"))
+
+    def _on_disconnect(self, client, userdata, rc):
+        print(f"[{self.client_id}] Disconnected, rc={rc}")
+        # sem isto um publish(timeout=None) ficava à espera para sempre; o paho
+        # pode reenviar estas mensagens ao reconectar, mas os acks chegam a mids abandonados
+        self._fail_pending(ConnectionError(f"[{self.client_id}] Disconnected (rc={rc})"))
+
+    def _fail_pending(self, error):
+        '''
+        Termina com erro todas as publicações à espera de confirmação (e o connect pendente).
+        '''
+        with self.ack_lock:
+            pending, self.pending = self.pending, {}
+            for mid in pending:
+                self._abandon(mid)
+        for future in list(pending.values()) + [self.connected]:
+            if future is not None:
+                self.loop.call_soon_threadsafe(self._settle, future, error)
+
+    @staticmethod
+    def _settle(future, error):
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+    # --- publicação --- #
+
+    async def publish(self, payload, topic, timeout=None):
+        '''
+        Publica e espera pela confirmação do broker (QoS0: pela escrita no socket).
+        Raises:
+            ConnectionError: se o paho recusar a publicação ou a ligação for fechada
+            asyncio.TimeoutError: sem confirmação dentro de timeout segundos
+        '''
+        await self._publish_raw(self.codec.encode(payload), f"{self.base_topic}{topic}", timeout)
+
+    async def publish_many(self, payload, topics, timeout=None):
+        '''
+        Fan-out do mesmo payload para vários tópicos: serializa uma única vez e
+        espera por todas as confirmações. A janela max_inflight limita quantas
+        ficam pendentes ao mesmo tempo.
+        '''
+        raw = self.codec.encode(payload)
+        await asyncio.gather(*(
+            self._publish_raw(raw, f"{self.base_topic}{topic}", timeout) for topic in topics
+        ))
+
+    async def _publish_raw(self, raw, full_topic, timeout):
+        async with self.inflight:
+            future = self.loop.create_future()
+            start = time.perf_counter()
+            with self.ack_lock:
+                result = self.client.publish(full_topic, raw, qos=self.qos)
+                if result.rc == mqtt_client.MQTT_ERR_SUCCESS:
+                    # mid reutilizado: a confirmação antiga já não vai chegar
+                    self.abandoned.pop(result.mid, None)
+                    if result.mid in self.early_acks:
+                        self.early_acks.discard(result.mid)
+                        future.set_result(None)
+                    else:
+                        self.pending[result.mid] = future
+            if result.rc != mqtt_client.MQTT_ERR_SUCCESS:
+                METRICS.inc("publish_failures_total", topic=full_topic)
+                raise ConnectionError(f"[{self.client_id}] Failed to publish to {full_topic} (rc={result.rc})")
+            METRICS.inc("messages_out_total", topic=full_topic)
+            METRICS.inc("bytes_out_total", len(raw), topic=full_topic)
+            try:
+                await asyncio.wait_for(future, timeout)
+            finally:
+                with self.ack_lock:
+                    if self.pending.pop(result.mid, None) is not None:
+                        self._abandon(result.mid)
+            METRICS.observe("publish_ack_seconds", time.perf_counter() - start)
+
+    def _abandon(self, mid):
+        '''
+        Regista um mid sem future (a confirmação, se vier, é ignorada) e esquece os expirados.
+        Chamar com ack_lock.
+        '''
+        now = time.monotonic()
+        while self.abandoned:
+            oldest_mid, since = next(iter(self.abandoned.items()))
+            if now - since < self.abandon_ttl:
+                break
+            del self.abandoned[oldest_mid]
+        self.abandoned.pop(mid, None)
+        self.abandoned[mid] = now
+
+    def _on_publish(self, client, userdata, mid):
+        with self.ack_lock:
+            future = self.pending.pop(mid, None)
+            if future is None and self.abandoned.pop(mid, None) is not None:
+                return
+            if future is None:
+                # QoS0: o paho pode chamar on_publish dentro do próprio publish()
+                self.early_acks.add(mid)
+                return
+        self.loop.call_soon_threadsafe(self._settle, future, None)
+
+    # --- receção --- #
+
+    def subscribe(self, topic):
+        '''
+        Subscreve um tópico MQTT.
+        '''
+        self.client.subscribe(topic, qos=self.qos)
+
+    def _on_message(self, client, userdata, msg):
+        if msg.topic.startswith(f"{self.topic_broker_id}/"): # impede que ouça as suas
+            return
+        METRICS.inc("messages_in_total", topic=msg.topic)
+        METRICS.inc("bytes_in_total", len(msg.payload), topic=msg.topic)
+        try:
+            data = decode_payload(msg.payload)
+        except ValueError as e:
+            print(f"[{self.client_id}] Payload inválido em {msg.topic}: {e}")
+            return
+        self.loop.call_soon_threadsafe(self._deliver, msg.topic, data)
+
+    def _deliver(self, topic, data):
+        if self.incoming.full():
+            self.incoming.get_nowait()
+            METRICS.inc("router_dropped_total", route=self.client_id)
+        self.incoming.put_nowait((topic, data))
+
+    async def messages(self):
+        '''
+        Iterador assíncrono das mensagens recebidas: (topic, data).
+        '''
+        while True:
+            yield await self.incoming.get()
@@ -0,0 +1,392 @@
+import hashlib, os, re, struct, threading, time
+
+try:
+    from client.file_utils import atomic_write
+    from client.metrics import METRICS
+except ImportError:
+    from file_utils import atomic_write
+    from metrics import METRICS
+
+# cabeçalho de cada chunk: sha256 do blob (32 bytes) + índice do chunk
+_CHUNK_HEADER = struct.Struct(">32sI")
+# nomes dos blobs (e hashes dos chunks): sha256 em hex minúsculas, nunca um caminho
+_SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BlobTransfer:
+    """
+        Transferência de artefactos (ex: modelos treinados) em chunks sobre MQTT.
+
+        Os blobs são endereçados pelo sha256 do conteúdo e guardados em store_dir/<sha256>.
+        O recetor é que puxa os chunks, numa janela de `window` de cada vez:
+            1. emissor -> <destino>/blob/msg/manifest/<emissor>  {blob, size, chunk_size, chunks, meta}
+            2. recetor -> <emissor>/blob/msg/have/<destino>      se já tem o blob (nada é reenviado)
+                          <emissor>/blob/msg/need/<destino>      {blob, missing} caso contrário
+            3. emissor -> <destino>/blob/chunk                   bytes: cabeçalho + dados do chunk
+            4. recetor -> <emissor>/blob/msg/have/<destino>      quando o sha256 do blob completo confere
+
+        O emissor de cada mensagem é o sufixo do tópico. Um manifesto só é aceite
+        se accept_sender(emissor) o permitir e se for coerente: nome do blob e
+        hashes dos chunks em sha256 hex, tamanho até max_size e
+        len(chunks) == ceil(size / chunk_size).
+
+        Cada chunk é verificado com o sha256 do manifesto e escrito diretamente em
+        <sha256>.part; os índices recebidos ficam em <sha256>.state. Depois de uma
+        quebra de ligação (ou de um reinício) só os chunks em falta são pedidos:
+        sem progresso durante retry_after segundos o recetor volta a pedir a janela,
+        e o emissor volta a anunciar o manifesto a quem ainda não confirmou.
+
+        Attributes:
+            node_id (str): Id deste nó (prefixo dos tópicos que recebe).
+            store_dir (str): Diretório dos blobs.
+            on_blob (callable): on_blob(sender, blob, path, meta) por cada blob recebido.
+            accept_sender (callable): accept_sender(sender) -> False rejeita os manifestos desse emissor.
+            max_size (int): Tamanho máximo (bytes) de um blob recebido.
+    """
+    def __init__(
+        self,
+        mqtt_com,
+        node_id,
+        store_dir="blobs",
+        chunk_size=65536,
+        window=16,
+        retry_after=5.0,
+        max_retries=10,
+        on_blob=None,
+        accept_sender=None,
+        max_size=64 << 20,
+    ):
+        self.mqtt_com = mqtt_com
+        self.node_id = node_id
+        self.store_dir = store_dir
+        self.chunk_size = chunk_size
+        self.window = window
+        self.retry_after = retry_after
+        self.max_retries = max_retries
+        self.on_blob = on_blob
+        self.accept_sender = accept_sender
+        self.max_size = max_size
+        os.makedirs(store_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.manifests = {}      # blob -> manifesto (emissor)
+        self.outgoing = {}       # blob -> caminho do ficheiro a servir
+        self.pending_sends = {}  # (destino, blob) -> [última atividade, tentativas, manifesto]
+        self.incoming = {}       # blob -> estado da receção
+
+        mqtt_com.route(f"{node_id}/blob/msg/+/#", self._on_message, own=True)
+        # fila sem limite: o recetor só pede `window` chunks de cada vez por transferência,
+        # por isso a fila não passa das janelas em curso; um chunk descartado só voltava
+        # a ser pedido depois de retry_after
+        mqtt_com.route(f"{node_id}/blob/chunk", self._on_chunk, maxsize=0, raw=True, own=True)
+        threading.Thread(target=self._retry_loop, daemon=True).start()
+
+    def _path(self, blob):
+        return os.path.join(self.store_dir, blob)
+
+    def _publish(self, target_id, kind, payload):
+        self.mqtt_com.publish(payload, topic=f"{target_id}/blob/msg/{kind}/{self.node_id}")
+
+    # --- emissor --- #
+
+    def put(self, data):
+        '''
+        Guarda bytes na store (se ainda não existirem) e devolve o sha256.
+        '''
+        blob = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self._path(blob)):
+            atomic_write(self._path(blob), data)
+        return blob
+
+    def send(self, target_id, data=None, path=None, meta=None):
+        '''
+        Envia um blob (bytes ou ficheiro) para target_id.
+        Returns:
+            sha256 do blob
+        '''
+        return self.send_many([target_id], data=data, path=path, meta=meta)
+
+    def send_many(self, target_ids, data=None, path=None, meta=None):
+        '''
+        Envia o mesmo blob para vários destinos (hash e manifesto calculados uma vez).
+        Returns:
+            sha256 do blob
+        '''
+        if data is not None:
+            blob = self.put(data)
+            path = self._path(blob)
+        else:
+            blob = file_sha256(path)
+        manifest = dict(self._manifest(blob, path), meta=meta or {})
+        with self.lock:
+            self.outgoing[blob] = path
+            for target_id in target_ids:
+                self.pending_sends[(target_id, blob)] = [time.monotonic(), 0, manifest]
+        for target_id in target_ids:
+            self._publish(target_id, "manifest", manifest)
+            METRICS.inc("blob_sends_total")
+        return blob
+
+    def _manifest(self, blob, path):
+        with self.lock:
+            manifest = self.manifests.get(blob)
+        if manifest is None:
+            chunks = []
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    chunks.append(hashlib.sha256(chunk).hexdigest())
+            manifest = {
+                "blob": blob,
+                "size": os.path.getsize(path),
+                "chunk_size": self.chunk_size,
+                "chunks": chunks,
+            }
+            with self.lock:
+                self.manifests[blob] = manifest
+        return manifest
+
+    def _on_need(self, target_id, request):
+        blob = request["blob"]
+        with self.lock:
+            path = self.outgoing.get(blob)
+            manifest = self.manifests.get(blob)
+            pending = self.pending_sends.get((target_id, blob))
+            if pending is not None:
+                pending[0] = time.monotonic()
+        if path is None or manifest is None:
+            print(f"[BLOB] Pedido de {target_id} para um blob desconhecido: {str(blob)[:12]}")
+            return
+        n_chunks = len(manifest["chunks"])
+        if not all(isinstance(index, int) and 0 <= index < n_chunks for index in request["missing"]):
+            print(f"[BLOB] Pedido de {target_id} com índices inválidos para {blob[:12]}")
+            return
+        digest = bytes.fromhex(blob)
+        with open(path, "rb") as f:
+            for index in request["missing"]:
+                f.seek(index * self.chunk_size)
+                chunk = f.read(self.chunk_size)
+                self.mqtt_com.publish_bytes(_CHUNK_HEADER.pack(digest, index) + chunk, f"{target_id}/blob/chunk")
+        METRICS.inc("blob_chunks_sent_total", len(request["missing"]))
+
+    def _on_have(self, sender, ack):
+        with self.lock:
+            self.pending_sends.pop((sender, ack["blob"]), None)
+
+    # --- recetor --- #
+
+    def _on_message(self, topic, data):
+        # <este nó>/blob/msg/<tipo>/<emissor> (o id do emissor também tem '/')
+        kind, sender = topic[len(self.node_id) + len("/blob/msg/"):].split("/", 1)
+        if kind == "manifest":
+            self._on_manifest(sender, data)
+        elif kind == "need":
+            self._on_need(sender, data)
+        elif kind == "have":
+            self._on_have(sender, data)
+
+    def _check_manifest(self, manifest):
+        '''
+        Raises:
+            ValueError: Manifesto incoerente (o nome do blob passa a caminho no disco
+                e o tamanho é reservado com truncate, por isso nada é aceite sem verificação)
+        '''
+        blob, size, chunk_size, chunks = (manifest.get(key) for key in ("blob", "size", "chunk_size", "chunks"))
+        if not isinstance(blob, str) or not _SHA256_HEX.fullmatch(blob):
+            raise ValueError("nome de blob inválido")
+        for value in (size, chunk_size):
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError("size/chunk_size não são inteiros")
+        if not 0 < size <= self.max_size:
+            raise ValueError(f"tamanho {size} fora de (0, {self.max_size}]")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size inválido")
+        if not isinstance(chunks, list) or len(chunks) != -(-size // chunk_size):
+            raise ValueError("nº de chunks não corresponde a size/chunk_size")
+        if not all(isinstance(chunk, str) and _SHA256_HEX.fullmatch(chunk) for chunk in chunks):
+            raise ValueError("hash de chunk inválido")
+
+    def _on_manifest(self, sender, manifest):
+        if self.accept_sender is not None and not self.accept_sender(sender):
+            METRICS.inc("blob_rejected_total")
+            print(f"[BLOB] Manifesto de {sender} rejeitado: emissor desconhecido.")
+            return
+        try:
+            self._check_manifest(manifest)
+        except ValueError as e:
+            METRICS.inc("blob_rejected_total")
+            print(f"[BLOB] Manifesto de {sender} rejeitado: {e}")
+            return
+        # o emissor vem do tópico: as respostas (need/have) e o on_blob usam-no
+        manifest = dict(manifest, sender=sender)
+        blob = manifest["blob"]
+        if os.path.exists(self._path(blob)):
+            # conteúdo já conhecido: confirma sem receber nenhum chunk
+            METRICS.inc("blob_dedup_total")
+            self._publish(sender, "have", {"blob": blob})
+            self._deliver(manifest)
+            return
+        with self.lock:
+            transfer = self.incoming.get(blob)
+            if transfer is None:
+                transfer = self.incoming[blob] = self._open_transfer(manifest)
+            transfer["manifest"] = manifest
+            transfer["requested"] = set()
+            transfer["last_progress"] = time.monotonic()
+        self._request(blob)
+
+    def _open_transfer(self, manifest):
+        '''
+        Abre (ou retoma) a receção: os índices já escritos são lidos do .state
+        '''
+        part, state = self._path(manifest["blob"]) + ".part", self._path(manifest["blob"]) + ".state"
+        received = set()
+        if os.path.exists(part) and os.path.exists(state):
+            with open(state, "r") as f:
+                for line in f:
+                    if line.strip().isdigit():
+                        received.add(int(line))
+            print(f"[BLOB] A retomar {manifest['blob'][:12]}: {len(received)}/{len(manifest['chunks'])} chunks")
+        else:
+            with open(part, "wb") as f:
+                f.truncate(manifest["size"])
+            open(state, "w").close()
+        return {"received": received, "requested": set(), "last_progress": time.monotonic(), "retries": 0}
+
+    def _request(self, blob):
+        with self.lock:
+            transfer = self.incoming.get(blob)
+            if transfer is None or transfer["requested"]:
+                return
+            n_chunks = len(transfer["manifest"]["chunks"])
+            missing = [i for i in range(n_chunks) if i not in transfer["received"]][:self.window]
+            transfer["requested"] = set(missing)
+            sender = transfer["manifest"]["sender"]
+        if missing:
+            self._publish(sender, "need", {"blob": blob, "missing": missing})
+        else:
+            self._finish(blob)
+
+    def _on_chunk(self, topic, raw):
+        digest, index = _CHUNK_HEADER.unpack_from(raw)
+        data = memoryview(raw)[_CHUNK_HEADER.size:]
+        blob = digest.hex()
+        with self.lock:
+            transfer = self.incoming.get(blob)
+            if transfer is None or index in transfer["received"]:
+                return
+            manifest = transfer["manifest"]
+        if index >= len(manifest["chunks"]) or hashlib.sha256(data).hexdigest() != manifest["chunks"][index]:
+            METRICS.inc("blob_chunks_corrupt_total")
+            return
+
+        path = self._path(blob)
+        with open(path + ".part", "r+b") as f:
+            f.seek(index * manifest["chunk_size"])
+            f.write(data)
+        with open(path + ".state", "a") as f:
+            f.write(f"{index}\n")
+        METRICS.inc("blob_chunks_received_total")
+
+        with self.lock:
+            transfer["received"].add(index)
+            transfer["requested"].discard(index)
+            transfer["last_progress"] = time.monotonic()
+            transfer["retries"] = 0
+            complete = len(transfer["received"]) == len(manifest["chunks"])
+            window_done = not transfer["requested"]
+        if complete:
+            self._finish(blob)
+        elif window_done:
+            self._request(blob)
+
+    def _finish(self, blob):
+        path = self._path(blob)
+        with self.lock:
+            transfer = self.incoming.get(blob)
+            if transfer is None or transfer.get("finishing"):
+                # outro thread (chunk ou retoma) já está a fechar esta receção
+                return
+            transfer["finishing"] = True
+            manifest = transfer["manifest"]
+        if file_sha256(path + ".part") != blob:
+            # algum chunk ficou mal escrito (ex: reinício a meio): volta a verificá-los um a um
+            with open(path + ".part", "rb") as f:
+                good = set()
+                for index, chunk_hash in enumerate(manifest["chunks"]):
+                    f.seek(index * manifest["chunk_size"])
+                    if hashlib.sha256(f.read(manifest["chunk_size"])).hexdigest() == chunk_hash:
+                        good.add(index)
+            atomic_write(path + ".state", "".join(f"{i}\n" for i in sorted(good)))
+            with self.lock:
+                transfer["received"] = good
+                transfer["requested"] = set()
+                transfer["finishing"] = False
+            self._request(blob)
+            return
+
+        os.replace(path + ".part", path)
+        os.remove(path + ".state")
+        with self.lock:
+            self.incoming.pop(blob, None)
+        print(f"[BLOB] Recebido {blob[:12]} ({manifest['size']} bytes) de {manifest['sender']}")
+        self._publish(manifest["sender"], "have", {"blob": blob})
+        self._deliver(manifest)
+
+    def _deliver(self, manifest):
+        if self.on_blob is None:
+            return
+        try:
+            self.on_blob(manifest["sender"], manifest["blob"], self._path(manifest["blob"]), manifest.get("meta", {}))
+        except Exception as e:
+            print(f"[BLOB] Erro no on_blob de {manifest['blob'][:12]}: {e}")
+
+    # --- retoma --- #
+
+    def _retry_loop(self):
+        while True:
+            time.sleep(min(1.0, self.retry_after / 2))
+            try:
+                self._retry_pass()
+            except Exception as e:
+                # ex: FileNotFoundError de um _finish concorrente; a thread tem de sobreviver
+                print(f"[BLOB] Erro na retoma das transferências: {type(e).__name__}: {e}")
+
+    def _retry_pass(self):
+        now = time.monotonic()
+        stalled, announce = [], []
+        with self.lock:
+            for blob, transfer in list(self.incoming.items()):
+                if now - transfer["last_progress"] < self.retry_after:
+                    continue
+                transfer["retries"] += 1
+                if transfer["retries"] > self.max_retries:
+                    # os ficheiros .part/.state ficam: um novo manifesto retoma a receção
+                    print(f"[BLOB] Receção de {blob[:12]} abandonada (sem progresso).")
+                    del self.incoming[blob]
+                    continue
+                transfer["requested"] = set()
+                transfer["last_progress"] = now
+                stalled.append(blob)
+            for key, pending in list(self.pending_sends.items()):
+                if now - pending[0] < 2 * self.retry_after:
+                    continue
+                pending[1] += 1
+                if pending[1] > self.max_retries:
+                    print(f"[BLOB] {key[0]} não confirmou {key[1][:12]}; envio abandonado.")
+                    del self.pending_sends[key]
+                    continue
+                pending[0] = now
+                announce.append((key[0], pending[2]))
+        for blob in stalled:
+            METRICS.inc("blob_retries_total")
+            self._request(blob)
+        for target_id, manifest in announce:
+            self._publish(target_id, "manifest", manifest)
@@ -0,0 +1,122 @@
+import threading
+
+try:
+    from client.file_utils import atomic_write
+except ImportError:
+    from file_utils import atomic_write
+
+
+class BridgeReconciler:
+    """
+        Mantém o bridges.conf alinhado com o conjunto de peers desejado.
+
+        Os eventos de descoberta são agrupados numa janela (debounce): no fim da
+        janela o ficheiro é gerado de raiz a partir do conjunto desejado, escrito
+        de forma atómica, e o broker é recarregado no máximo uma vez.
+
+        Attributes:
+            broker_id (str): Identificador do broker local (IP com '_').
+            prefix (str): Prefixo local das mensagens enviadas pela bridge.
+            conf_path (str): Caminho do bridges.conf.
+            window (float): Janela de agrupamento dos eventos, em segundos.
+            on_change (callable): Chamado depois de o ficheiro mudar (reload do broker).
+            write (callable): write(path, content), por defeito atomic_write.
+    """
+    def __init__(
+        self,
+        broker_id,
+        prefix,
+        conf_path="./mosquitto/conf.d/bridges.conf",
+        window=2.0,
+        on_change=None,
+        write=atomic_write,
+    ):
+        self.broker_id = broker_id
+        self.prefix = prefix
+        self.conf_path = conf_path
+        self.window = window
+        self.on_change = on_change
+        self.write = write
+        self.desired_peers = {}
+        self.lock = threading.Lock()
+        self.reconcile_lock = threading.Lock()
+        self.timer = None
+
+    def add_peer(self, peer_ip, peer_port):
+        """
+        Pede uma bridge para o peer (aplicada no fim da janela).
+        """
+        with self.lock:
+            if self.desired_peers.get(peer_ip) == peer_port:
+                return
+            self.desired_peers[peer_ip] = peer_port
+            self._schedule()
+
+    def remove_peer(self, peer_ip):
+        """
+        Retira a bridge do peer (aplicada no fim da janela).
+        """
+        with self.lock:
+            if self.desired_peers.pop(peer_ip, None) is None:
+                return
+            self._schedule()
+
+    def set_peers(self, peers):
+        """
+        Substitui o conjunto desejado por `peers` ({ip: porta}).
+        """
+        with self.lock:
+            if peers == self.desired_peers:
+                return
+            self.desired_peers = dict(peers)
+            self._schedule()
+
+    def _schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(self.window, self.reconcile)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def render(self, peers):
+        """
+        Gera o conteúdo do bridges.conf para o conjunto de peers.
+        """
+        blocks = []
+        for peer_ip in sorted(peers):
+            remote_peer_id = peer_ip.replace(".", "_")
+            blocks.append(
+                f"connection bridge_to_peer__{remote_peer_id}\n"
+                f"address {peer_ip}:{peers[peer_ip]}\n"
+                f"topic {self.broker_id}/# out 1 {self.prefix}\n"
+                f"topic {remote_peer_id}/# in 1\n"
+                f"topic {remote_peer_id}/# out 1\n"
+            )
+        return "\n".join(blocks)
+
+    def reconcile(self):
+        """
+        Escreve o bridges.conf se o conjunto desejado mudou e recarrega o broker uma vez.
+        Returns:
+            True se o ficheiro foi alterado
+        """
+        # serializa reconciliações: um reload lento não se sobrepõe ao seguinte
+        with self.reconcile_lock:
+            with self.lock:
+                self.timer = None
+                num_bridges = len(self.desired_peers)
+                content = self.render(self.desired_peers)
+
+            try:
+                with open(self.conf_path, "r") as f:
+                    current = f.read()
+            except FileNotFoundError:
+                current = None
+
+            if current == content:
+                return False
+
+            self.write(self.conf_path, content)
+            print(f"[BRIDGES] bridges.conf atualizado ({num_bridges} bridges).")
+            if self.on_change is not None:
+                self.on_change()
+            return True
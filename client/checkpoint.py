@@ -0,0 +1,140 @@
+import glob, json, os, tempfile, threading, time
+
+try:
+    from client.file_utils import atomic_write
+    from client.metrics import METRICS
+except ImportError:
+    from file_utils import atomic_write
+    from metrics import METRICS
+
+
+def _json_default(obj):
+    # tipos numpy (ex: hiperparâmetros devolvidos pelo sklearn)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não serializável em JSON")
+
+
+def _joblib():
+    # importado só quando os checkpoints estão ativos (arranque mais rápido)
+    try:
+        import joblib
+    except ImportError:
+        raise ValueError("Checkpoints indisponíveis: instale o pacote 'joblib'.")
+    return joblib
+
+
+def atomic_dump(path, obj):
+    """
+    joblib.dump atómico: temporário na mesma diretoria, fsync e os.replace.
+    """
+    joblib = _joblib()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            joblib.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Checkpointer:
+    """
+        Checkpoints do estado de um serviço, à prova de crash.
+
+        O estado simples (listas, rondas, hiperparâmetros) vai para state.json; os
+        objetos pesados (modelos, contribuições) vão para <nome>-<geração>.joblib.
+        Os .joblib são escritos primeiro e o state.json (que diz qual a geração
+        de cada objeto) é substituído por último, de forma atómica: um crash a meio
+        deixa sempre o checkpoint anterior completo. As gerações antigas são
+        apagadas depois.
+
+        Com start() o estado é guardado a cada `interval` segundos, mas só se
+        alguém chamou touch() desde o último checkpoint.
+
+        Attributes:
+            directory (str): Diretório do checkpoint deste serviço.
+            generation (int): Nº do último checkpoint escrito.
+    """
+    def __init__(self, directory, interval=30.0):
+        self.joblib = _joblib()
+        self.directory = directory
+        self.interval = interval
+        self.generation = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _state_path(self):
+        return os.path.join(self.directory, "state.json")
+
+    def touch(self):
+        '''
+        Marca o estado como alterado (guardado no próximo checkpoint periódico)
+        '''
+        self.dirty = True
+
+    def save(self, state, objects=None):
+        '''
+        Args:
+            state: Dicionário serializável em JSON
+            objects: Dicionário nome -> objeto (guardado com joblib)
+        '''
+        with self.lock, METRICS.timer("checkpoint_seconds"):
+            generation = self.generation + 1
+            files = {}
+            for name, obj in (objects or {}).items():
+                files[name] = f"{name}-{generation}.joblib"
+                atomic_dump(os.path.join(self.directory, files[name]), obj)
+            document = {"generation": generation, "saved_at": time.time(), "state": state, "objects": files}
+            atomic_write(self._state_path(), json.dumps(document, default=_json_default))
+            self.generation = generation
+            for path in glob.glob(os.path.join(self.directory, "*.joblib")):
+                if os.path.basename(path) not in files.values():
+                    os.remove(path)
+        METRICS.inc("checkpoints_total")
+
+    def load(self):
+        '''
+        Returns:
+            (state, objects) do último checkpoint completo, ou (None, {}) se não existir
+        '''
+        try:
+            with open(self._state_path(), "r") as f:
+                document = json.load(f)
+            objects = {
+                name: self.joblib.load(os.path.join(self.directory, filename))
+                for name, filename in document["objects"].items()
+            }
+        except FileNotFoundError:
+            return None, {}
+        except Exception as e:
+            print(f"[CHECKPOINT] Checkpoint em {self.directory} ilegível, ignorado: {e}")
+            return None, {}
+        self.generation = document["generation"]
+        return document["state"], objects
+
+    def start(self, snapshot):
+        '''
+        Checkpoints periódicos: snapshot() -> (state, objects), chamado só quando
+        o estado mudou desde o último checkpoint
+        '''
+        threading.Thread(target=self._loop, args=(snapshot,), daemon=True).start()
+
+    def _loop(self, snapshot):
+        while True:
+            time.sleep(self.interval)
+            if not self.dirty:
+                continue
+            # limpo antes do snapshot: um touch() durante o snapshot/save fica para o próximo
+            self.dirty = False
+            try:
+                self.save(*snapshot())
+            except Exception as e:
+                self.dirty = True
+                print(f"[CHECKPOINT] Erro ao guardar o checkpoint: {e}")
@@ -0,0 +1,28 @@
+import os, tempfile
+
+
+def atomic_write(path, data):
+    """
+    Escreve um ficheiro de forma atómica: escreve num temporário na mesma
+    diretoria, faz fsync e substitui o destino com os.replace.
+    Quem lê o ficheiro vê sempre a versão antiga ou a nova, nunca uma parcial.
+
+    Args:
+        path (str): Caminho do ficheiro de destino
+        data (str | bytes): Conteúdo a escrever
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    mode = "wb" if isinstance(data, (bytes, bytearray, memoryview)) else "w"
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,134 @@
+import io
+import numpy as np
+
+# formato .npz das florestas trocadas em modo ensemble: só arrays numéricos,
+# lidos com allow_pickle=False (um blob recebido de um peer nunca executa código)
+FORMAT_VERSION = 1
+
+
+def dump_forest(model):
+    '''
+    Serializa uma floresta treinada: nós e valores de cada árvore, classes e,
+    se o modelo tiver scaler, a sua média/escala.
+    Args:
+        model: Pipeline([("scaler", StandardScaler | "passthrough"), ("classifier", RandomForestClassifier)]),
+            objeto de pesquisa treinado (usa best_estimator_) ou a floresta
+    Returns:
+        bytes (.npz)
+    '''
+    model = getattr(model, "best_estimator_", model)
+    forest, scaler = model, None
+    if hasattr(model, "named_steps"):
+        forest = model.named_steps["classifier"]
+        scaler = model.named_steps.get("scaler")
+    if forest.n_outputs_ != 1:
+        raise ValueError("Só são suportadas florestas com uma única saída.")
+    classes = np.asarray(forest.classes_)
+    if classes.dtype == object:
+        raise ValueError("Classes do tipo object não são serializáveis sem pickle.")
+
+    states = [tree.tree_.__getstate__() for tree in forest.estimators_]
+    arrays = {
+        "header": np.array([FORMAT_VERSION, forest.n_features_in_], dtype=np.int64),
+        "classes": classes,
+        "node_counts": np.array([state["node_count"] for state in states], dtype=np.int64),
+        "max_depths": np.array([state["max_depth"] for state in states], dtype=np.int64),
+        "nodes": np.concatenate([state["nodes"] for state in states]),
+        "values": np.concatenate([state["values"] for state in states]),
+    }
+    for name in ("mean", "scale"):
+        value = getattr(scaler, f"{name}_", None)
+        if value is not None:
+            arrays[f"scaler_{name}"] = np.asarray(value, dtype=np.float64)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _check_tree(nodes, values, n_features, n_classes):
+    '''
+    Estrutura válida antes de entregar os arrays ao sklearn: features dentro do
+    intervalo e filhos sempre depois do pai (a travessia termina)
+    '''
+    node_count = len(nodes)
+    if node_count == 0 or values.shape != (node_count, 1, n_classes):
+        raise ValueError("Árvore com nós/valores inconsistentes.")
+    split = np.flatnonzero(nodes["left_child"] != -1)
+    for child in ("left_child", "right_child"):
+        children = nodes[child][split]
+        if (children <= split).any() or (children >= node_count).any():
+            raise ValueError("Árvore com ligações inválidas entre nós.")
+    features = nodes["feature"][split]
+    if (features < 0).any() or (features >= n_features).any():
+        raise ValueError("Árvore com índices de features inválidos.")
+
+
+def load_forest(data):
+    '''
+    Inverso de dump_forest (np.load com allow_pickle=False).
+    Returns:
+        Pipeline([("scaler", StandardScaler | "passthrough"), ("classifier", RandomForestClassifier)])
+    Raises:
+        ValueError: Blob inválido ou de outra versão do sklearn (estrutura dos nós diferente)
+    '''
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.tree._tree import Tree
+
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        version, n_features = (int(value) for value in arrays["header"])
+        classes = arrays["classes"]
+        node_counts, max_depths = arrays["node_counts"], arrays["max_depths"]
+        nodes, values = arrays["nodes"], arrays["values"]
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Floresta inválida: {type(e).__name__}: {e}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Formato de floresta {version} não suportado.")
+    if node_counts.sum() != len(nodes) or len(nodes) != len(values) or len(max_depths) != len(node_counts):
+        raise ValueError("Floresta com nº de nós inconsistente.")
+
+    n_classes = len(classes)
+    estimators = []
+    offset = 0
+    for node_count, max_depth in zip(node_counts, max_depths):
+        tree_nodes, tree_values = nodes[offset:offset + node_count], values[offset:offset + node_count]
+        offset += node_count
+        try:
+            _check_tree(tree_nodes, tree_values, n_features, n_classes)
+        except (IndexError, KeyError, TypeError) as e:
+            # nodes sem a estrutura (dtype com campos) esperada
+            raise ValueError(f"Floresta inválida: {type(e).__name__}: {e}")
+        tree = DecisionTreeClassifier()
+        tree.tree_ = Tree(n_features, np.array([n_classes], dtype=np.intp), 1)
+        # ValueError se a estrutura dos nós for de outra versão do sklearn
+        tree.tree_.__setstate__({
+            "max_depth": int(max_depth),
+            "node_count": int(node_count),
+            "nodes": np.ascontiguousarray(tree_nodes),
+            "values": np.ascontiguousarray(tree_values),
+        })
+        tree.n_features_in_, tree.n_outputs_, tree.max_features_ = n_features, 1, n_features
+        tree.classes_, tree.n_classes_ = classes, n_classes
+        estimators.append(tree)
+
+    forest = RandomForestClassifier(n_estimators=len(estimators))
+    forest.estimator_ = DecisionTreeClassifier()
+    forest.estimators_ = estimators
+    forest.n_features_in_, forest.n_outputs_ = n_features, 1
+    forest.classes_, forest.n_classes_ = classes, n_classes
+
+    scaler = "passthrough"
+    if "scaler_mean" in arrays or "scaler_scale" in arrays:
+        scaler = StandardScaler(with_mean="scaler_mean" in arrays, with_std="scaler_scale" in arrays)
+        scaler.mean_ = arrays.get("scaler_mean")
+        scaler.scale_ = arrays.get("scaler_scale")
+        scaler.var_ = None if scaler.scale_ is None else scaler.scale_ ** 2
+        scaler.n_features_in_ = n_features
+    return Pipeline([("scaler", scaler), ("classifier", forest)])
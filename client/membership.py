@@ -0,0 +1,209 @@
+import threading, time
+
+ALIVE = "alive"
+SUSPECT = "suspect"
+DEAD = "dead"
+
+
+class Member:
+    """
+        Entrada da tabela de membership.
+
+        Attributes:
+            port (int): Porta MQTT do peer.
+            incarnation (int): Incarnação anunciada pelo peer (só ele a incrementa).
+            state (str): 'alive', 'suspect' ou 'dead'.
+            last_seen (float): Último heartbeat recebido (relógio monotónico).
+            state_since (float): Momento em que entrou no estado atual.
+    """
+    __slots__ = ("port", "incarnation", "state", "last_seen", "state_since")
+
+    def __init__(self, port, incarnation, now):
+        self.port = port
+        self.incarnation = incarnation
+        self.state = ALIVE
+        self.last_seen = now
+        self.state_since = now
+
+
+class Membership:
+    """
+        Membership por heartbeats em broadcast (todos-para-todos) sobre o socket UDP,
+        com os estados e incarnações do SWIM mas sem probes indiretos.
+
+        Mensagens (texto, compatíveis com o "hello"/"hi" original):
+            hello <porta>                  -> entrada de um peer; responde-se com "hi"
+            hi <porta>                     -> resposta unicast a um "hello"
+            hb <porta> <incarnação>        -> heartbeat periódico em broadcast
+            suspect <ip> <incarnação>      -> suspeita de falha de <ip>
+            dead <ip> <incarnação>         -> confirmação de falha de <ip>
+
+        Um peer que recebe uma suspeita sobre si próprio refuta-a incrementando a
+        incarnação no heartbeat seguinte. Incarnações maiores ganham sempre; com a
+        mesma incarnação, dead > suspect > alive.
+
+        Só a saída de 'dead' muda o conjunto de membros (e as bridges). Como não há
+        probes indiretos, um "dead" vindo de outro peer pode ser só perda no link
+        dele: se o peer foi ouvido diretamente há menos de suspect_timeout, o rumor
+        conta apenas como suspeita e o peer tem tempo para o refutar.
+
+        Attributes:
+            self_ip (str): IP do próprio peer.
+            mqtt_port (int): Porta MQTT anunciada.
+            send (callable): send(msg, addr) envia um datagrama; addr=None -> broadcast.
+            on_change (callable): Chamado com {ip: porta} quando o conjunto de membros muda.
+    """
+    def __init__(
+        self,
+        self_ip,
+        mqtt_port,
+        send,
+        heartbeat_interval=2.0,
+        suspect_timeout=6.0,
+        dead_timeout=6.0,
+        purge_after=60.0,
+        on_change=None,
+        clock=time.monotonic,
+    ):
+        self.self_ip = self_ip
+        self.mqtt_port = mqtt_port
+        self.send = send
+        self.heartbeat_interval = heartbeat_interval
+        self.suspect_timeout = suspect_timeout
+        self.dead_timeout = dead_timeout
+        self.purge_after = purge_after
+        self.on_change = on_change
+        self.clock = clock
+        # incarnação inicial baseada no relógio: um peer reiniciado anuncia sempre
+        # uma incarnação maior do que a que ficou registada como 'dead'
+        self.incarnation = int(time.time())
+        self.members = {}
+        # RLock: on_change pode consultar a tabela sem deadlock
+        self.lock = threading.RLock()
+
+    # --- estado --- #
+
+    def peers(self):
+        """
+        Peers considerados membros (alive ou suspect): {ip: porta}.
+        """
+        with self.lock:
+            return self._peers()
+
+    def _peers(self):
+        return {ip: m.port for ip, m in self.members.items() if m.state != DEAD}
+
+    def _notify(self, before):
+        after = self._peers()
+        if after != before and self.on_change is not None:
+            self.on_change(after)
+
+    # --- mensagens --- #
+
+    def hello(self):
+        self.send(f"hello {self.mqtt_port}", None)
+
+    def heartbeat(self):
+        self.send(f"hb {self.mqtt_port} {self.incarnation}", None)
+
+    def handle(self, msg, addr):
+        """
+        Processa um datagrama recebido de addr=(ip, porta).
+        """
+        parts = msg.split()
+        if not parts or addr[0] == self.self_ip:
+            return
+        kind = parts[0]
+        try:
+            if kind == "hello" or kind == "hi":
+                self._on_alive(addr, int(parts[1]), None)
+                if kind == "hello":
+                    self.send(f"hi {self.mqtt_port}", addr)
+            elif kind == "hb":
+                self._on_alive(addr, int(parts[1]), int(parts[2]))
+            elif kind == "suspect" or kind == "dead":
+                self._on_failure(kind, parts[1], int(parts[2]))
+        except (IndexError, ValueError):
+            print(f"[MEMBERSHIP] Mensagem inválida de {addr[0]}: {msg}")
+
+    def _on_alive(self, addr, port, incarnation):
+        ip = addr[0]
+        now = self.clock()
+        with self.lock:
+            before = self._peers()
+            member = self.members.get(ip)
+            if member is None:
+                self.members[ip] = Member(port, incarnation or 0, now)
+                print(f"[MEMBERSHIP] Novo peer: {ip}:{port}")
+            else:
+                # "hello"/"hi" não trazem incarnação: valem como a atual, exceto para
+                # reanimar um peer dado como morto (só com incarnação maior)
+                if incarnation is None:
+                    incarnation = member.incarnation if member.state != DEAD else member.incarnation + 1
+                if incarnation == member.incarnation and member.state == DEAD:
+                    # o peer não soube que foi dado como morto: avisa-o para refutar
+                    self.send(f"dead {ip} {member.incarnation}", addr)
+                    return
+                if incarnation < member.incarnation:
+                    return
+                member.last_seen = now
+                member.port = port
+                if incarnation > member.incarnation or member.state != ALIVE:
+                    if member.state != ALIVE:
+                        print(f"[MEMBERSHIP] {ip} voltou a alive (incarnação {incarnation}).")
+                    member.incarnation = incarnation
+                    member.state = ALIVE
+                    member.state_since = now
+            self._notify(before)
+
+    def _on_failure(self, kind, ip, incarnation):
+        now = self.clock()
+        if ip == self.self_ip:
+            # refuta a suspeita com uma incarnação nova
+            if incarnation >= self.incarnation:
+                self.incarnation = incarnation + 1
+                self.heartbeat()
+            return
+
+        with self.lock:
+            before = self._peers()
+            member = self.members.get(ip)
+            if member is None or incarnation < member.incarnation:
+                return
+            new_state = DEAD if kind == "dead" else SUSPECT
+            if new_state == DEAD and now - member.last_seen < self.suspect_timeout:
+                new_state = SUSPECT
+            if member.state == DEAD or (member.state == SUSPECT and new_state == SUSPECT and incarnation == member.incarnation):
+                return
+            member.incarnation = incarnation
+            member.state = new_state
+            member.state_since = now
+            print(f"[MEMBERSHIP] {ip} -> {new_state} (incarnação {incarnation})")
+            self._notify(before)
+
+    # --- deteção de falhas --- #
+
+    def tick(self):
+        """
+        Envia o heartbeat e avança os temporizadores de suspeita/falha.
+        Chamado a cada heartbeat_interval.
+        """
+        self.heartbeat()
+        now = self.clock()
+        outgoing = []
+        with self.lock:
+            before = self._peers()
+            for ip, member in list(self.members.items()):
+                if member.state == ALIVE and now - member.last_seen >= self.suspect_timeout:
+                    member.state, member.state_since = SUSPECT, now
+                    outgoing.append(f"suspect {ip} {member.incarnation}")
+                elif member.state == SUSPECT and now - member.state_since >= self.dead_timeout:
+                    member.state, member.state_since = DEAD, now
+                    outgoing.append(f"dead {ip} {member.incarnation}")
+                elif member.state == DEAD and now - member.state_since >= self.purge_after:
+                    del self.members[ip]
+            self._notify(before)
+
+        for msg in outgoing:
+            print(f"[MEMBERSHIP] {msg}")
+            self.send(msg, None)
@@ -0,0 +1,196 @@
+import json, queue, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from client.file_utils import atomic_write
+except ImportError:
+    from file_utils import atomic_write
+
+PREFIX = "p2p_"
+
+# "full" -> payload completo, "summary" -> só o tópico, "off" -> nada
+PAYLOAD_LOG_LEVEL = "summary"
+
+
+class Metrics:
+    """
+        Registo de métricas do processo (contadores, gauges e sumários).
+
+        Os sumários guardam count/sum/max, exportados no formato Prometheus como
+        <nome>_count, <nome>_sum e <nome>_max.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.summaries = {}
+        self.gauge_callbacks = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get(self._key(name, labels), 0)
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def gauge_callback(self, name, callback, **labels):
+        """
+        Gauge lida no momento da exportação (ex: profundidade de uma fila).
+        """
+        with self.lock:
+            self.gauge_callbacks[self._key(name, labels)] = callback
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self.lock:
+            gauges = dict(self.gauges)
+            callbacks = dict(self.gauge_callbacks)
+            counters = dict(self.counters)
+            summaries = {key: list(value) for key, value in self.summaries.items()}
+        for key, callback in callbacks.items():
+            gauges[key] = callback()
+        return counters, gauges, summaries
+
+    def to_dict(self):
+        counters, gauges, summaries = self.snapshot()
+
+        def rows(items, fields):
+            return [dict(name=name, labels=dict(labels), **fields(value)) for (name, labels), value in items.items()]
+
+        return {
+            "timestamp": time.time(),
+            "counters": rows(counters, lambda v: {"value": v}),
+            "gauges": rows(gauges, lambda v: {"value": v}),
+            "summaries": rows(summaries, lambda v: {"count": v[0], "sum": v[1], "max": v[2]}),
+        }
+
+    def to_prometheus(self):
+        counters, gauges, summaries = self.snapshot()
+        lines = []
+
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def fmt(name, labels, value):
+            label_str = ",".join(f'{k}="{escape(v)}"' for k, v in labels)
+            return f"{PREFIX}{name}{{{label_str}}} {value}" if label_str else f"{PREFIX}{name} {value}"
+
+        for (name, labels), value in sorted(counters.items()):
+            lines.append(fmt(name, labels, value))
+        for (name, labels), value in sorted(gauges.items()):
+            lines.append(fmt(name, labels, value))
+        for (name, labels), (count, total, maximum) in sorted(summaries.items()):
+            lines.append(fmt(f"{name}_count", labels, count))
+            lines.append(fmt(f"{name}_sum", labels, total))
+            lines.append(fmt(f"{name}_max", labels, maximum))
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class InstrumentedQueue(queue.Queue):
+    """
+        queue.Queue que mede a profundidade e a latência entre put e get.
+        Os consumidores continuam a receber exatamente o item depositado.
+    """
+    def __init__(self, name, metrics=METRICS, maxsize=0):
+        super().__init__(maxsize)
+        self.name = name
+        self.metrics = metrics
+        metrics.gauge_callback("queue_depth", self.qsize, queue=name)
+
+    def _put(self, item):
+        super()._put((time.perf_counter(), item))
+
+    def _get(self):
+        enqueued_at, item = super()._get()
+        self.metrics.observe("queue_wait_seconds", time.perf_counter() - enqueued_at, queue=self.name)
+        return item
+
+
+def log_payload(tag, topic, data, action="RECEIVED on"):
+    """
+    Imprime uma mensagem (recebida ou publicada) segundo o PAYLOAD_LOG_LEVEL.
+    """
+    if PAYLOAD_LOG_LEVEL == "full":
+        print(f"[{tag}] {action} {topic}: {data}")
+    elif PAYLOAD_LOG_LEVEL == "summary":
+        print(f"[{tag}] {action} {topic}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = METRICS.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def setup_observability(observability_config, service):
+    """
+    Aplica o nível de log dos payloads e arranca os exportadores configurados
+    (endpoint Prometheus e/ou ficheiro JSON periódico).
+
+    Args:
+        observability_config (dict): Secção `observability` do config.yaml
+        service (str): 'peer', 'aggregation' ou 'pipeline'
+    """
+    global PAYLOAD_LOG_LEVEL
+    PAYLOAD_LOG_LEVEL = observability_config.get("log_payloads", "summary")
+
+    port = (observability_config.get("metrics_ports") or {}).get(service)
+    if port:
+        server = ThreadingHTTPServer(("", port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[METRICS] Endpoint Prometheus em :{port}/metrics")
+
+    metrics_file = observability_config.get("metrics_file")
+    if metrics_file:
+        path = metrics_file.format(service=service)
+        interval = observability_config.get("metrics_interval", 10)
+
+        def dump_loop():
+            while True:
+                time.sleep(interval)
+                atomic_write(path, json.dumps(METRICS.to_dict()))
+
+        threading.Thread(target=dump_loop, daemon=True).start()
@@ -1,6 +1,15 @@
-import json, queue, uuid
+import json, queue, threading, time, uuid
 from paho.mqtt import client as mqtt_client
 
+try:
+    from client.payload_codecs import PayloadCodec, decode_payload
+    from client.metrics import METRICS, InstrumentedQueue
+    from client.topic_router import TopicRouter
+except ImportError:
+    from payload_codecs import PayloadCodec, decode_payload
+    from metrics import METRICS, InstrumentedQueue
+    from topic_router import TopicRouter
+
 class Communication_Layer:
     """
         Camada de comunicação MQTT full mesh para publicar e subscrever mensagens.
@@ -9,10 +18,15 @@ class Communication_Layer:
         e subscreve `#` para receber mensagens de outros brokers, ignorando
         mensagens enviadas pelo próprio client_id.
 
+        As mensagens de tópicos registados com route() vão para o handler dessa
+        rota (fila e worker próprios); as restantes ficam em msg_queue.
+
         Attributes:
             client_id (str): Identificador único do cliente MQTT.
             base_topic (str): Prefixo base para tópicos MQTT.
             qos (int): Qualidade do serviço MQTT (0, 1 ou 2).
+            codec (PayloadCodec): Serialização dos payloads publicados.
+            router (TopicRouter): Rotas por filtro de tópico.
             client (paho.mqtt.client.Client): Instância do cliente MQTT.
     """
     def __init__(
@@ -23,7 +37,10 @@ class Communication_Layer:
         user="admin",
         pwd="public",
         base_topic="",
-        qos=0
+        qos=0,
+        codec="json",
+        compression=None,
+        compress_threshold=1024,
     ):
         """
         broker: host do broker
@@ -31,12 +48,19 @@ class Communication_Layer:
         client_id: identificador MQTT
         base_topic: prefixo base para publicação
         qos: qualidade do serviço MQTT
+        codec: formato dos payloads publicados ('json', 'msgpack' ou 'cbor')
+        compression: compressão acima de compress_threshold bytes ('zlib', 'lz4' ou None)
         """
         self.client_id = client_id
         self.topic_broker_id = broker.replace(".", "_")
         self.base_topic = base_topic
         self.qos = qos
-        self.msg_queue = queue.Queue()
+        self.codec = PayloadCodec(codec, compression, compress_threshold)
+        self.msg_queue = InstrumentedQueue(name=client_id)
+        self.router = TopicRouter(client_id)
+        # mid -> instante do publish, para medir o tempo até ao PUBACK (QoS1)
+        self.pending_acks = {}
+        self.ack_lock = threading.RLock()
         self.client = self._connect_mqtt(broker, port, user, pwd)
         self.client.loop_start()
         self.client.on_message = self.on_message
@@ -57,6 +81,7 @@ class Communication_Layer:
             client.username_pw_set(user, pwd)
         client.on_connect = on_connect
         client.on_disconnect = on_disconnect
+        client.on_publish = self.on_publish
         client.connect(broker, port)
         return client
 
@@ -66,23 +91,90 @@ class Communication_Layer:
 
     def publish(self, payload, topic):
         full_topic = f"{self.base_topic}{topic}"
-        result = self.client.publish(full_topic, json.dumps(payload), qos=self.qos)
+        self._publish_raw(self.codec.encode(payload), full_topic)
+
+    def publish_bytes(self, data, topic):
+        '''
+        Publica bytes tal como estão (sem codec), ex: chunks de blobs.
+        '''
+        self._publish_raw(data, f"{self.base_topic}{topic}")
+
+    def publish_many(self, payload, topics):
+        '''
+        Fan-out do mesmo payload para vários tópicos: serializa uma única vez.
+        '''
+        raw = self.codec.encode(payload)
+        for topic in topics:
+            self._publish_raw(raw, f"{self.base_topic}{topic}")
+
+    def _publish_raw(self, raw, full_topic):
+        start = time.perf_counter()
+        with self.ack_lock:
+            result = self.client.publish(full_topic, raw, qos=self.qos)
+            if result[0] == 0 and self.qos > 0:
+                self.pending_acks[result.mid] = start
+        METRICS.observe("publish_seconds", time.perf_counter() - start)
         if result[0] != 0:
+            METRICS.inc("publish_failures_total", topic=full_topic)
             print(f"[{self.client_id}] Failed to publish to {full_topic}")
+            return
+        METRICS.inc("messages_out_total", topic=full_topic)
+        METRICS.inc("bytes_out_total", len(raw), topic=full_topic)
+
+    def on_publish(self, client, userdata, mid):
+        '''
+        Callback do PUBACK (QoS1): regista o tempo desde o publish.
+        '''
+        with self.ack_lock:
+            start = self.pending_acks.pop(mid, None)
+        if start is not None:
+            METRICS.observe("publish_ack_seconds", time.perf_counter() - start)
 
     def on_message(self, client, userdata, msg):
         '''
         Callback para processar mensagens recebidas.
         Acrescenta mensagens à fila interna, ignorando mensagens do próprio client_id.
         '''
+        routes = self.router.match(msg.topic)
         if msg.topic.startswith(f"{self.topic_broker_id}/"): # impede que ouça as suas
+            # exceto nas rotas registadas com own=True (mensagens endereçadas a este nó)
+            routes = [route for route in routes if route.own]
+            if not routes:
+                return
+        METRICS.inc("messages_in_total", topic=msg.topic)
+        METRICS.inc("bytes_in_total", len(msg.payload), topic=msg.topic)
+        raw_routes = [route for route in routes if route.raw]
+        if raw_routes:
+            self.router.dispatch(msg.topic, msg.payload, raw_routes)
+            routes = [route for route in routes if not route.raw]
+            if not routes:
+                return
+        start = time.perf_counter()
+        try:
+            data = decode_payload(msg.payload)
+        except ValueError as e:
+            print(f"[{self.client_id}] Payload inválido em {msg.topic}: {e}")
             return
-        data = json.loads(msg.payload.decode())
+        METRICS.observe("decode_seconds", time.perf_counter() - start)
         # print(f"[{self.topic_broker_id}] RECEIVED on {msg.topic}: {data}")
-        self.msg_queue.put((msg.topic, data)) 
+        if routes:
+            self.router.dispatch(msg.topic, data, routes)
+        else:
+            self.msg_queue.put((msg.topic, data))
 
     def subscribe(self, topic):
         '''
         Subscreve um tópico MQTT.
         '''
         self.client.subscribe(topic, qos=self.qos)
+
+    def route(self, topic, handler, maxsize=256, control=False, raw=False, own=False):
+        '''
+        Regista um handler(topic, data) para um filtro MQTT e subscreve-o.
+        control=True -> o handler corre logo na thread de rede (usar só para
+        handlers rápidos); caso contrário tem fila limitada a maxsize e worker próprios.
+        raw=True -> data são os bytes recebidos, sem descodificar.
+        own=True -> aceita tópicos com o prefixo do próprio nó.
+        '''
+        self.router.add(topic, handler, maxsize=maxsize, control=control, raw=raw, own=own)
+        self.subscribe(topic)
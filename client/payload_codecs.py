@@ -0,0 +1,208 @@
+import json, zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Payloads com header: MAGIC | codec | compressão | corpo
+# Um JSON nunca começa com 0x01, por isso payloads sem header são JSON simples
+# (compatível com nós antigos e com o `system/peers` publicado pelo Peer).
+MAGIC = 0x01
+HEADER_SIZE = 3
+
+NDARRAY_EXT = 1
+NDARRAY_TAG = 40100
+
+
+def _json_default(obj):
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não serializável em JSON")
+
+
+def _ndarray_parts(array):
+    array = np.ascontiguousarray(array)
+    return [array.dtype.str, list(array.shape), array.tobytes()]
+
+
+def _ndarray_from_parts(parts):
+    dtype, shape, buffer = parts
+    return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+
+
+def _msgpack_default(obj):
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            return msgpack.ExtType(NDARRAY_EXT, msgpack.packb(_ndarray_parts(obj)))
+        if isinstance(obj, np.generic):
+            return obj.item()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não serializável em msgpack")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == NDARRAY_EXT:
+        return _ndarray_from_parts(msgpack.unpackb(data))
+    return msgpack.ExtType(code, data)
+
+
+def _cbor_default(encoder, obj):
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            encoder.encode(cbor2.CBORTag(NDARRAY_TAG, _ndarray_parts(obj)))
+            return
+        if isinstance(obj, np.generic):
+            encoder.encode(obj.item())
+            return
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não serializável em CBOR")
+
+
+def _cbor_tag_hook(*args):
+    # cbor2 < 6 chama tag_hook(decoder, tag); cbor2 >= 6 chama tag_hook(tag, immutable)
+    tag = args[1] if isinstance(args[1], cbor2.CBORTag) else args[0]
+    if tag.tag == NDARRAY_TAG:
+        return _ndarray_from_parts(tag.value)
+    return tag
+
+
+def _require(module, name):
+    if module is None:
+        raise ValueError(f"Codec '{name}' indisponível: instale o pacote '{name}'.")
+
+
+def _json_encode(payload):
+    return json.dumps(payload, default=_json_default).encode()
+
+
+def _json_decode(body):
+    return json.loads(body.decode())
+
+
+def _msgpack_encode(payload):
+    _require(msgpack, "msgpack")
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+
+def _msgpack_decode(body):
+    _require(msgpack, "msgpack")
+    return msgpack.unpackb(body, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+
+
+def _cbor_encode(payload):
+    _require(cbor2, "cbor2")
+    return cbor2.dumps(payload, default=_cbor_default)
+
+
+def _cbor_decode(body):
+    _require(cbor2, "cbor2")
+    return cbor2.loads(body, tag_hook=_cbor_tag_hook)
+
+
+def _lz4_compress(body):
+    _require(lz4_frame, "lz4")
+    return lz4_frame.compress(body)
+
+
+def _lz4_decompress(body):
+    _require(lz4_frame, "lz4")
+    return lz4_frame.decompress(body)
+
+
+# nome -> (id no header, encode, decode)
+CODECS = {
+    "json": (0, _json_encode, _json_decode),
+    "msgpack": (1, _msgpack_encode, _msgpack_decode),
+    "cbor": (2, _cbor_encode, _cbor_decode),
+}
+
+# nome -> (id no header, compress, decompress)
+COMPRESSIONS = {
+    "none": (0, None, None),
+    "zlib": (1, zlib.compress, zlib.decompress),
+    "lz4": (2, _lz4_compress, _lz4_decompress),
+}
+
+_CODECS_BY_ID = {codec_id: decode for codec_id, _, decode in CODECS.values()}
+_COMPRESSIONS_BY_ID = {comp_id: decompress for comp_id, _, decompress in COMPRESSIONS.values()}
+
+
+class PayloadCodec:
+    """
+        Serializa payloads para o fio com o codec e a compressão escolhidos.
+
+        Attributes:
+            codec (str): Formato do corpo ('json', 'msgpack' ou 'cbor').
+            compression (str): Compressão aplicada ('zlib', 'lz4' ou None).
+            compress_threshold (int): Tamanho mínimo (bytes) do corpo para comprimir.
+    """
+    def __init__(self, codec="json", compression=None, compress_threshold=1024):
+        if codec not in CODECS:
+            raise ValueError(f"Codec '{codec}' não suportado.")
+        compression = compression or "none"
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compressão '{compression}' não suportada.")
+        self.codec = codec
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self._codec_id, self._encode, _ = CODECS[codec]
+        self._comp_id, self._compress, _ = COMPRESSIONS[compression]
+
+    def encode(self, payload):
+        '''
+        Converte o payload em bytes prontos a publicar.
+        '''
+        body = self._encode(payload)
+        comp_id = 0
+        if self._compress is not None and len(body) >= self.compress_threshold:
+            body = self._compress(body)
+            comp_id = self._comp_id
+
+        if self._codec_id == 0 and comp_id == 0:
+            return body  # JSON simples, sem header
+        return bytes((MAGIC, self._codec_id, comp_id)) + body
+
+
+def decode_payload(raw):
+    '''
+    Descodifica um payload recebido, com ou sem header.
+    Qualquer payload inválido (corrompido, truncado, codec em falta) dá ValueError.
+    '''
+    raw = bytes(raw)
+    if not raw or raw[0] != MAGIC:
+        return json.loads(raw.decode())
+
+    if len(raw) < HEADER_SIZE:
+        raise ValueError("Payload com header incompleto.")
+    codec_id, comp_id = raw[1], raw[2]
+    if codec_id not in _CODECS_BY_ID or comp_id not in _COMPRESSIONS_BY_ID:
+        raise ValueError(f"Header desconhecido: codec={codec_id} compressão={comp_id}")
+
+    body = raw[HEADER_SIZE:]
+    decompress = _COMPRESSIONS_BY_ID[comp_id]
+    try:
+        if decompress is not None:
+            body = decompress(body)
+        return _CODECS_BY_ID[codec_id](body)
+    except ValueError:
+        raise
+    except Exception as e:
+        # zlib.error, erros do lz4/msgpack/cbor2 que não derivam de ValueError
+        raise ValueError(f"Payload corrompido (codec={codec_id} compressão={comp_id}): {type(e).__name__}: {e}")
@@ -1,6 +1,9 @@
 import socket, threading, time, os, json
 from yaml import Loader, load
 from mqtt_layer import Communication_Layer
+from bridge_reconciler import BridgeReconciler
+from membership import Membership
+from metrics import setup_observability
 
 
 class Peer:
@@ -16,16 +19,40 @@ class Peer:
         self.peer_ip = self.config["peer_ip"]
         self.broker_id = self.peer_ip.replace(".", "_")
         self.prefix = f"br_{self.broker_id.split('_')[-1]}/"
-        self.known_peers = []
+        setup_observability(self.config.get("observability", {}), "peer")
+        self.known_peers = {}
+        self.published_peers = None
+
+        bridges_config = self.config.get("bridges", {})
+        self.bridges = BridgeReconciler(
+            broker_id=self.broker_id,
+            prefix=self.prefix,
+            window=bridges_config.get("debounce_window", 2.0),
+            on_change=self._reload_mqtt_configs,
+        )
         # --- inicialização de cliente MQTT e socket --- #
         self._setup_mqtt_client()
         self._setup_socket()
+
+        membership_config = self.config.get("membership", {})
+        self.membership = Membership(
+            self_ip=self.peer_ip,
+            mqtt_port=self.mosquitto_port,
+            send=self._send_datagram,
+            heartbeat_interval=membership_config.get("heartbeat_interval", 2.0),
+            suspect_timeout=membership_config.get("suspect_timeout", 6.0),
+            dead_timeout=membership_config.get("dead_timeout", 6.0),
+            on_change=self._on_membership_change,
+        )
         self._start_listener()
+        self._start_heartbeat()
         self._notify_peers()
 
     def _setup_mqtt_client(self):
         """
-        Cria o cliente MQTT e faz o subscribe ao tópico
+        Cria o cliente MQTT usado para publicar system/peers.
+        Não subscreve nada: o peer não consome mensagens e um subscribe a `#`
+        descodificava e enfileirava todo o tráfego (chunks de blobs, deltas) sem nunca o ler.
         """
         try:
             self.mqtt_com = Communication_Layer(
@@ -35,18 +62,19 @@ class Peer:
                 base_topic="",
                 qos=1,
             )
-            self.mqtt_com.subscribe(topic="#")
         except Exception as e:
             print(f"Erro ao conectar ao broker MQTT: {e}")
 
     def _reload_mqtt_configs(self):
         """
-        Reinicia o Mosquitto e reconecta o cliente MQTT.
-        Reload das configurações das bridges.
+        Reload das configurações das bridges: reinicia o broker e reconecta o cliente MQTT.
+        (O Mosquitto 2.x não recarrega as definições de bridges com SIGHUP.)
         """
         self.mqtt_com.disconnect()
         os.system("docker restart mqtt_broker")
         self._setup_mqtt_client()
+        # o restart perde as mensagens retidas (ex: system/peers)
+        self._broadcast_known_peers_internally(force=True)
 
     def _setup_socket(self):
         """
@@ -64,88 +92,71 @@ class Peer:
         listener = threading.Thread(target=self._listen_for_peers, daemon=True)
         listener.start()
 
+    def _start_heartbeat(self):
+        """
+        Iniciar a thread de heartbeats e deteção de falhas
+        """
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.membership.heartbeat_interval)
+            self.membership.tick()
+
+    def _send_datagram(self, msg, addr=None):
+        """
+        Envia uma mensagem de membership; addr=None -> broadcast.
+        """
+        if addr is None:
+            addr = (self.broadcast_mask, self.broadcast_port)
+        self.sock_broadcast.sendto(msg.encode(), addr)
+
     def _notify_peers(self):
         """
         Troca de informçoes entre peers, envia a porta do broker
         """
-        self.sock_broadcast.sendto(
-            f"hello {self.mosquitto_port}".encode(),
-            (self.broadcast_mask, self.broadcast_port),
-        )
+        self.membership.hello()
+
+    def _on_membership_change(self, peers):
+        """
+        Chamado pela Membership quando entram ou saem peers.
+        Atualiza as bridges e a lista publicada em system/peers.
+        """
+        self.known_peers = peers
+        print(f"Peers encontrados: {sorted(peers)}")
+        self.bridges.set_peers(peers)
+        self._broadcast_known_peers_internally()
 
     def add_mosquitto_bridge(self, remote_peer_ip, remote_peer_port):
         """
-        Adiciona uma bridge Mosquitto para um peer recém-descoberto.
-        Usa o peer IP como broker_id para o tópico remoto.
+        Pede uma bridge Mosquitto para um peer recém-descoberto.
+        O BridgeReconciler agrupa os pedidos e reescreve o bridges.conf uma vez por janela.
 
         Args:
             remote_peer_ip (str): IP do peer remoto
             remote_peer_port (int): Porta MQTT do peer remoto
         """
-        remote_peer_id = remote_peer_ip.replace(".", "_")
-
-        with open(
-            "./mosquitto/conf.d/bridges.conf", "r"
-        ) as f:  # read the bridges.conf file
-            existing_conns = [line.strip() for line in f]
-
-        current_address = f"address {remote_peer_ip}:{remote_peer_port}"
-
-        if any(
-            current_address in line for line in existing_conns
-        ):  # check if the address has a bridge conn already
-            pass
-        else:
-            bridge_config = f"""
-    connection bridge_to_peer__{remote_peer_id}
-    address {remote_peer_ip}:{remote_peer_port}
-    topic {self.broker_id}/# out 1 {self.prefix}
-    topic {remote_peer_id}/# in 1
-    topic {remote_peer_id}/# out 1
-                """
-
-            with open("./mosquitto/conf.d/bridges.conf", "a") as f:
-                f.write(f"\n{bridge_config}")
-
-            self._reload_mqtt_configs()
+        self.bridges.add_peer(remote_peer_ip, remote_peer_port)
 
     def _listen_for_peers(self):
         """
         Thread que escuta mensagens de broadcast para descoberta de peers.
-        - Recebe "hello" ou "hi" com porta MQTT
-        - Responde para informar seu próprio broker
+        As mensagens (hello/hi/hb/suspect/dead) são tratadas pela Membership.
         """
         while True:
             data, addr = self.sock_broadcast.recvfrom(1024)
-            msg = data.decode()
-
-            if addr[0] == self.peer_ip:
-                continue
-
-            if msg.startswith("hello") or msg.startswith("hi"):
-                _, peer_mqtt_port = msg.split()
-                peer_mqtt_port = int(peer_mqtt_port)
-                peer = (addr[0], peer_mqtt_port)
-
-                if peer not in self.known_peers:
-                    self.known_peers.append(peer)
-                    print(f"Peers encontrados: {self.known_peers}")
-                    for p in self.known_peers:
-                        self.add_mosquitto_bridge(p[0], p[1])
-                        if p != peer:
-                            self.sock_broadcast.sendto(f"hi {peer[1]}".encode(), p)
-                    self._broadcast_known_peers_internally()
-
-                if msg.startswith("hello"):
-                    self.sock_broadcast.sendto(
-                        f"hi {self.mosquitto_port}".encode(), addr
-                    )
+            self.membership.handle(data.decode(errors="replace"), addr)
 
-    def _broadcast_known_peers_internally(self):
+    def _broadcast_known_peers_internally(self, force=False):
         """
         Envia a lista de IPs para os outros módulos (Pipeline/Agg) usarem.
+        Só republica quando a lista muda (ou com force=True).
         """
-        ip_list = sorted([p[0] for p in self.known_peers])
+        ip_list = sorted(self.known_peers)
+        if ip_list == self.published_peers and not force:
+            return
+        self.published_peers = ip_list
         known_peers_payload = json.dumps(ip_list)
         self.mqtt_com.client.publish(payload = known_peers_payload, topic = "system/peers", retain=True)
         print(f"Lista de peers atualizada: {ip_list}")
@@ -0,0 +1,195 @@
+import bisect, hashlib, random
+
+ROUTING_TYPES = ("index", "consistent_hash", "ring", "tree", "gossip")
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], "big")
+
+
+def can_target_self(spec):
+    '''
+    True se a topologia pode devolver o próprio nó como destino (só consistent_hash:
+    o nó pode ser dono da chave). Quem recebe tem de aceitar <id>/... com own=True.
+    '''
+    return isinstance(spec, dict) and spec.get("type") == "consistent_hash"
+
+
+class RoutingTable:
+    """
+        Tabela de encaminhamento de um nó, reconstruída só quando a membership muda.
+
+        A configuração (routing_topology no config.yaml) é uma lista de índices
+        (comportamento original: índices na lista ordenada dos outros peers) ou um
+        dicionário com `type`:
+            consistent_hash: {replicas: 1, vnodes: 64, key: null}
+                destinos = os `replicas` donos de `key` num anel de hashing
+                consistente (key null -> o IP do próprio nó). Quando um nó entra ou
+                sai só mudam as chaves que lhe pertenciam.
+            ring: {k: 1}
+                os k sucessores do nó no anel dos membros ordenados.
+            tree: {fanout: 2, direction: "up"}
+                árvore fanout-ária sobre os membros ordenados; "up" -> pai,
+                "down" -> filhos.
+            gossip: {k: 3, seed: 0}
+                grafo circulante k-regular: cada nó envia para k nós e recebe de k.
+
+        targets() devolve a tupla pré-calculada (O(1) no caminho de publicação);
+        uma tupla vazia significa "publicar localmente". Só consistent_hash pode
+        incluir o próprio nó (ver can_target_self).
+
+        Attributes:
+            self_ip (str): IP deste nó.
+            kind (str): Tipo de topologia.
+            members (list): Membros ordenados (inclui o próprio nó).
+    """
+    def __init__(self, spec, self_ip, name="ROUTING"):
+        if isinstance(spec, list):
+            spec = {"type": "index", "indices": spec}
+        self.spec = spec
+        self.kind = spec.get("type", "index")
+        if self.kind not in ROUTING_TYPES:
+            raise ValueError(f"Topologia de routing '{self.kind}' não suportada.")
+        self.self_ip = self_ip
+        self.name = name
+        self.members = [self_ip]
+        self.current = ()
+        self.rebuild([])
+
+    def targets(self):
+        return self.current
+
+    def rebuild(self, peer_list):
+        '''
+        Recalcula os destinos a partir da lista de peers (system/peers).
+        Returns:
+            True se os destinos mudaram
+        '''
+        members = sorted(set(peer_list) | {self.self_ip})
+        if members == self.members and self.current:
+            return False
+        self.members = members
+        targets = tuple(getattr(self, f"_build_{self.kind}")(peer_list))
+        changed = targets != self.current
+        self.current = targets
+        if changed:
+            print(f"[{self.name}] {self.kind}: destinos {list(targets) or ['local']}")
+        return changed
+
+    def _build_index(self, peer_list):
+        # comportamento original: índices na lista ordenada dos outros peers
+        others = sorted(peer_list)
+        targets = []
+        for idx in self.spec.get("indices", [0]):
+            if idx < len(others):
+                targets.append(others[idx])
+            else:
+                print(f"[{self.name}] Indice {idx} pedido, mas só conheço {len(others)} peers.")
+        return targets
+
+    def _build_consistent_hash(self, peer_list):
+        vnodes = self.spec.get("vnodes", 64)
+        ring = sorted((_hash(f"{member}#{v}"), member) for member in self.members for v in range(vnodes))
+        hashes = [h for h, _ in ring]
+        replicas = min(self.spec.get("replicas", 1), len(self.members))
+        key = self.spec.get("key") or self.self_ip
+        start = bisect.bisect(hashes, _hash(key))
+        owners = []
+        for i in range(len(ring)):
+            member = ring[(start + i) % len(ring)][1]
+            if member not in owners:
+                owners.append(member)
+                if len(owners) == replicas:
+                    break
+        return owners
+
+    def _build_ring(self, peer_list):
+        n = len(self.members)
+        me = self.members.index(self.self_ip)
+        k = min(self.spec.get("k", 1), n - 1)
+        return [self.members[(me + i) % n] for i in range(1, k + 1)]
+
+    def _build_tree(self, peer_list):
+        fanout = self.spec.get("fanout", 2)
+        me = self.members.index(self.self_ip)
+        if self.spec.get("direction", "up") == "up":
+            return [self.members[(me - 1) // fanout]] if me > 0 else []
+        return self.members[me * fanout + 1:me * fanout + 1 + fanout]
+
+    def _build_gossip(self, peer_list):
+        n = len(self.members)
+        k = min(self.spec.get("k", 3), n - 1)
+        # deslocamentos comuns a todos os nós (mesma seed e mesma membership)
+        rng = random.Random(f"{self.spec.get('seed', 0)}:{','.join(self.members)}")
+        offsets = rng.sample(range(1, n), k)
+        me = self.members.index(self.self_ip)
+        return [self.members[(me + offset) % n] for offset in offsets]
+
+
+class Hierarchy:
+    """
+        Agregação hierárquica (modo federated): grupos por nível sobre os membros ordenados.
+
+        No nível 0 os workers (todos os membros exceto o root) são divididos em
+        grupos de tiers[0] nós; o primeiro de cada grupo é o líder (agregador de
+        edge). Os líderes de um nível formam os grupos do nível seguinte e os
+        líderes do último nível enviam para o root (central_server).
+
+        upstream(t) é o destino da saída deste nó no nível t: o líder do seu grupo
+        (o próprio nó se for o líder) ou, em t == len(tiers), o root.
+
+        Attributes:
+            tiers (list): Tamanho dos grupos em cada nível (de baixo para cima).
+            root_ip (str): IP do central_server.
+            self_ip (str): IP deste nó.
+    """
+    def __init__(self, tiers, root_ip, self_ip):
+        self.tiers = list(tiers)
+        self.root_ip = root_ip
+        self.self_ip = self_ip
+        self.members = None
+        self.rebuild([])
+
+    def rebuild(self, peer_list):
+        '''
+        Returns:
+            True se a hierarquia mudou
+        '''
+        members = sorted(set(peer_list) | {self.self_ip, self.root_ip})
+        if members == self.members:
+            return False
+        self.members = members
+        self.leader = {}  # (nó, nível) -> líder do grupo
+        self.groups = {}  # (líder, nível) -> membros do grupo
+        level = [member for member in members if member != self.root_ip]
+        for tier, size in enumerate(self.tiers):
+            leaders = []
+            for start in range(0, len(level), size):
+                group = level[start:start + size]
+                self.groups[(group[0], tier)] = group
+                for member in group:
+                    self.leader[(member, tier)] = group[0]
+                leaders.append(group[0])
+            level = leaders
+        self.top_leaders = level
+        print(f"[HIERARCHY] {len(members)} membros, líderes de topo: {self.top_leaders}")
+        return True
+
+    def upstream(self, tier):
+        if self.self_ip == self.root_ip or tier >= len(self.tiers):
+            return self.root_ip
+        return self.leader.get((self.self_ip, tier), self.self_ip)
+
+    def led_tiers(self):
+        '''
+        Níveis em que este nó é líder de grupo
+        '''
+        return [tier for tier in range(len(self.tiers)) if (self.self_ip, tier) in self.groups]
+
+    def group(self, tier):
+        '''
+        Membros do grupo liderado por este nó no nível `tier` (root: líderes de topo)
+        '''
+        if self.self_ip == self.root_ip:
+            return list(self.top_leaders)
+        return self.groups.get((self.self_ip, tier), [])
@@ -0,0 +1,161 @@
+import queue, threading
+from collections import OrderedDict
+
+try:
+    from client.metrics import METRICS, InstrumentedQueue
+except ImportError:
+    from metrics import METRICS, InstrumentedQueue
+
+
+class TopicTrie:
+    """
+        Trie de filtros MQTT (níveis separados por '/', com '+' e '#').
+
+        Cada nó guarda os valores dos filtros que terminam nele; o match de um
+        tópico percorre no máximo os ramos literal, '+' e '#' de cada nível.
+    """
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, topic_filter, value):
+        node = self.root
+        for level in topic_filter.split("/"):
+            node = node.setdefault(level, {})
+        node.setdefault(None, []).append(value)
+
+    def match(self, topic):
+        levels = topic.split("/")
+        found = []
+        # tópicos de sistema ($SYS/...) não são apanhados por wildcards no 1º nível
+        wildcards = not topic.startswith("$")
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if wildcards or depth > 0:
+                # '#' também apanha o nível pai ("a/#" -> "a")
+                found.extend(node.get("#", {}).get(None, ()))
+            if depth == len(levels):
+                found.extend(node.get(None, ()))
+                continue
+            child = node.get(levels[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            if wildcards or depth > 0:
+                child = node.get("+")
+                if child is not None:
+                    stack.append((child, depth + 1))
+        return found
+
+
+class Route:
+    """
+        Handler associado a um filtro MQTT.
+
+        Rotas de controlo correm o handler diretamente na thread de rede (devem
+        ser rápidos, ex: system/peers); as restantes têm fila limitada e worker
+        próprios, por isso um handler lento não atrasa os outros tópicos.
+        Com a fila cheia descarta-se a mensagem mais antiga (contada em
+        router_dropped_total e registada no log); maxsize=0 -> fila sem limite.
+
+        Attributes:
+            topic_filter (str): Filtro MQTT.
+            handler (callable): handler(topic, data).
+            control (bool): True -> despacho imediato, sem fila.
+            raw (bool): True -> o handler recebe os bytes do payload, sem descodificar.
+            own (bool): True -> aceita tópicos com o prefixo do próprio nó
+                (mensagens endereçadas a este nó, ex: <id>/blob/...).
+            queue (InstrumentedQueue): Fila da rota (None em rotas de controlo).
+    """
+    def __init__(self, name, topic_filter, handler, maxsize=256, control=False, raw=False, own=False):
+        self.topic_filter = topic_filter
+        self.handler = handler
+        self.control = control
+        self.raw = raw
+        self.own = own
+        self.dropped = 0
+        self.queue = None
+        if not control:
+            self.queue = InstrumentedQueue(name=f"{name}:{topic_filter}", maxsize=maxsize)
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def deliver(self, topic, data):
+        if self.control:
+            self._call(topic, data)
+            return
+        while True:
+            try:
+                self.queue.put_nowait((topic, data))
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                except queue.Empty:
+                    continue
+                self.dropped += 1
+                METRICS.inc("router_dropped_total", route=self.topic_filter)
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    print(f"[ROUTER] Fila de {self.topic_filter} cheia: {self.dropped} mensagens antigas descartadas.")
+
+    def _call(self, topic, data):
+        try:
+            self.handler(topic, data)
+        except Exception as e:
+            print(f"[ROUTER] Erro no handler de {self.topic_filter} ({topic}): {e}")
+
+    def _worker(self):
+        while True:
+            topic, data = self.queue.get()
+            self._call(topic, data)
+            self.queue.task_done()
+
+
+class TopicRouter:
+    """
+        Despacha cada mensagem recebida para as rotas cujo filtro a apanha.
+
+        O resultado do match é guardado por tópico numa cache LRU limitada a
+        cache_size entradas (tópicos únicos, ex: chunks de blobs, não a fazem
+        crescer sem limite) e invalidado quando se regista uma rota.
+    """
+    def __init__(self, name="", cache_size=1024):
+        self.name = name
+        self.trie = TopicTrie()
+        self.routes = []
+        self.match_cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def add(self, topic_filter, handler, maxsize=256, control=False, raw=False, own=False):
+        route = Route(self.name, topic_filter, handler, maxsize=maxsize, control=control, raw=raw, own=own)
+        with self.lock:
+            self.routes.append(route)
+            self.trie.insert(topic_filter, route)
+            self.match_cache.clear()
+        return route
+
+    def match(self, topic):
+        """
+        Rotas cujo filtro apanha o tópico (resultado em cache).
+        """
+        with self.lock:
+            routes = self.match_cache.get(topic)
+            if routes is None:
+                routes = self.match_cache[topic] = self.trie.match(topic)
+                if len(self.match_cache) > self.cache_size:
+                    self.match_cache.popitem(last=False)
+            else:
+                self.match_cache.move_to_end(topic)
+        return routes
+
+    def dispatch(self, topic, data, routes=None):
+        """
+        Entrega (topic, data) às rotas correspondentes.
+        Returns:
+            True se pelo menos uma rota apanhou o tópico
+        """
+        if routes is None:
+            routes = self.match(topic)
+        for route in routes:
+            route.deliver(topic, data)
+        return bool(routes)
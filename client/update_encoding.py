@@ -0,0 +1,246 @@
+import threading, uuid
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from client.metrics import METRICS
+except ImportError:
+    from metrics import METRICS
+
+_QUANTIZE_DTYPES = {8: np.int8, 16: np.int16}
+
+
+def flatten(state, prefix=""):
+    '''
+    {"weights": {"w": ...}, "num_samples": 10} -> {"weights/w": ..., "num_samples": 10}
+    '''
+    flat = {}
+    for key, value in state.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, f"{path}/"))
+        else:
+            flat[path] = value
+    return flat
+
+
+def unflatten(flat):
+    state = {}
+    for path, value in flat.items():
+        node = state
+        *parents, key = path.split("/")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return state
+
+
+def _is_tensor(value):
+    return isinstance(value, np.ndarray) and value.dtype.kind == "f"
+
+
+def _same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.shape(a) == np.shape(b) and np.array_equal(a, b)
+    return type(a) == type(b) and a == b
+
+
+def _dequantize(delta):
+    if "d" in delta:
+        return np.asarray(delta["d"], dtype=np.float64)
+    return np.asarray(delta["q"], dtype=np.float64) * delta["scale"]
+
+
+def apply_delta(previous, entry):
+    '''
+    Aplica uma entrada `add` ao array anterior (mesma operação no encoder e no decoder)
+    '''
+    result = np.array(previous, dtype=np.float64)
+    if "val" in entry and "idx" not in entry:
+        result[...] = np.asarray(entry["val"], dtype=np.float64).reshape(result.shape)
+    elif "val" in entry:
+        result.flat[np.asarray(entry["idx"], dtype=np.int64)] = entry["val"]
+    elif "idx" in entry:
+        result.flat[np.asarray(entry["idx"], dtype=np.int64)] += _dequantize(entry)
+    else:
+        result += _dequantize(entry).reshape(result.shape)
+    return result
+
+
+class DeltaEncoder:
+    """
+        Codifica o estado publicado (trained_params / agg_params) como diferença
+        face à última versão confirmada por todos os recetores.
+
+        Cada update leva a versão `v` e a versão base `base` (None -> estado
+        completo); as entradas são:
+            set: valores novos ou alterados (substituem o valor anterior)
+            del: chaves removidas
+            add: arrays float alterados face à base: só os elementos alterados
+                 ({idx, val}) ou, com quantize, o delta quantizado em int8/int16
+                 ({q, scale}, com idx quando poucos elementos mudaram)
+        O encoder guarda, por versão, a reconstrução que o recetor vai obter. Com
+        error_feedback o delta seguinte é calculado face a essa reconstrução, por
+        isso o erro de quantização é reenviado em vez de se acumular.
+
+        Os recetores confirmam as versões (ack); um recetor que não tem a base
+        pede o estado completo (reset) e ack() devolve True: o emissor deve
+        reenviar já o último estado (o próximo update para esse recetor é
+        completo). Enquanto um recetor não confirmar nada o update é completo.
+
+        Attributes:
+            quantize (int): None | 8 | 16 bits para os arrays numéricos.
+            epoch (str): Identifica esta instância (as versões recomeçam num reinício).
+    """
+    def __init__(self, quantize=None, error_feedback=True, history=8, tolerance=0.0):
+        if quantize is not None and quantize not in _QUANTIZE_DTYPES:
+            raise ValueError(f"Quantização de {quantize} bits não suportada (8 | 16).")
+        self.quantize = quantize
+        self.error_feedback = error_feedback
+        self.history = history
+        self.tolerance = tolerance
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.versions = OrderedDict()  # versão -> (estado real, reconstrução no recetor)
+        self.acked = {}                # recetor -> última versão confirmada
+        self.lock = threading.Lock()
+
+    def encode(self, state, receivers):
+        '''
+        Args:
+            state: Estado completo a publicar
+            receivers: Ids dos nós que vão receber o update
+        Returns:
+            update (dict) a pôr no payload
+        '''
+        flat = flatten(state)
+        with self.lock:
+            base = self._base(receivers)
+            true_base, recon_base = self.versions[base] if base is not None else ({}, {})
+            reference = recon_base if self.error_feedback else true_base
+            recon = dict(recon_base)
+            update = {"epoch": self.epoch, "base": base, "set": {}, "del": [], "add": {}}
+
+            for key in recon_base:
+                if key not in flat:
+                    update["del"].append(key)
+                    del recon[key]
+            for key, value in flat.items():
+                previous = recon_base.get(key)
+                if _is_tensor(value) and previous is not None and np.shape(previous) == value.shape:
+                    entry = self._tensor_delta(value, previous, reference.get(key, previous))
+                    if entry is not None:
+                        update["add"][key] = entry
+                        recon[key] = apply_delta(previous, entry)
+                elif key not in recon_base or not _same(value, previous):
+                    update["set"][key] = value
+                    recon[key] = value
+
+            self.version += 1
+            update["v"] = self.version
+            self.versions[self.version] = (flat, recon)
+            while len(self.versions) > self.history:
+                self.versions.popitem(last=False)
+
+        METRICS.inc("update_encoded_total", kind="full" if base is None else "delta")
+        METRICS.inc("update_entries_total", len(update["set"]) + len(update["add"]))
+        return update
+
+    def _base(self, receivers):
+        '''
+        Versão mais recente que todos os recetores confirmaram (None -> estado completo)
+        '''
+        acked = [self.acked.get(receiver) for receiver in receivers]
+        if not acked or None in acked:
+            return None
+        base = min(acked)
+        return base if base in self.versions else None
+
+    def _tensor_delta(self, value, previous, reference):
+        '''
+        Returns:
+            entrada `add` com os elementos alterados (None se nada mudou)
+        '''
+        value = value.ravel()
+        if self.quantize:
+            delta = value - np.asarray(reference, dtype=np.float64).ravel()
+            changed = np.flatnonzero(np.abs(delta) > self.tolerance)
+        else:
+            changed = np.flatnonzero(value != np.asarray(previous, dtype=np.float64).ravel())
+        if not changed.size:
+            return None
+        # esparso só compensa se mudou menos de metade dos elementos
+        sparse = 2 * changed.size < value.size
+        entry = {"idx": changed.astype(np.int32)} if sparse else {}
+        if self.quantize:
+            entry.update(self._quantize(delta[changed] if sparse else delta))
+        else:
+            entry["val"] = value[changed] if sparse else value
+        return entry
+
+    def _quantize(self, delta):
+        dtype = _QUANTIZE_DTYPES[self.quantize]
+        limit = np.iinfo(dtype).max
+        scale = float(np.abs(delta).max()) / limit
+        if scale == 0.0 or not np.isfinite(scale):
+            return {"d": delta}
+        return {"q": np.clip(np.rint(delta / scale), -limit, limit).astype(dtype), "scale": scale}
+
+    def ack(self, receiver, ack):
+        '''
+        Confirmação de um recetor: {"epoch", "v"} ou {"epoch", "full": True}
+        Returns:
+            True se o recetor pediu o estado completo (o emissor deve reenviá-lo)
+        '''
+        if ack.get("epoch") != self.epoch:
+            return False
+        with self.lock:
+            if ack.get("full"):
+                self.acked.pop(receiver, None)
+                METRICS.inc("update_resets_total")
+                return True
+            if ack.get("v", 0) > self.acked.get(receiver, 0):
+                self.acked[receiver] = ack["v"]
+        return False
+
+
+class DeltaDecoder:
+    """
+        Reconstrói o estado completo de cada emissor a partir dos updates do DeltaEncoder.
+
+        Guarda as últimas `history` versões de cada emissor; se a base de um update
+        não existir (ex: mensagem perdida ou reinício) decode devolve None e o
+        recetor deve pedir o estado completo.
+    """
+    def __init__(self, history=8):
+        self.history = history
+        self.senders = {}  # emissor -> (epoch, OrderedDict versão -> estado plano)
+        self.lock = threading.Lock()
+
+    def decode(self, sender, update):
+        '''
+        Returns:
+            (estado completo ou None, ack a enviar ao emissor)
+        '''
+        with self.lock:
+            epoch, versions = self.senders.get(sender, (None, None))
+            if epoch != update["epoch"]:
+                versions = OrderedDict()
+                self.senders[sender] = (update["epoch"], versions)
+            base = update.get("base")
+            if base is not None and base not in versions:
+                METRICS.inc("update_missing_base_total")
+                return None, {"epoch": update["epoch"], "full": True}
+
+            flat = dict(versions[base]) if base is not None else {}
+            for key in update.get("del", ()):
+                flat.pop(key, None)
+            flat.update(update.get("set", {}))
+            for key, entry in update.get("add", {}).items():
+                flat[key] = apply_delta(flat[key], entry)
+
+            versions[update["v"]] = flat
+            while len(versions) > self.history:
+                versions.popitem(last=False)
+        return unflatten(flat), {"epoch": update["epoch"], "v": update["v"]}
@@ -0,0 +1,68 @@
+import hashlib, json, os, threading
+from collections import OrderedDict
+
+from client.file_utils import atomic_write
+
+
+class CVScoreCache:
+    """
+        Cache LRU dos scores por fold de cada candidato, persistida em disco.
+
+        A chave junta a impressão digital dos dados, a configuração do CV (folds e
+        seed), o estimador e o conjunto completo de hyperparâmetros, por isso um
+        candidato já avaliado numa ronda anterior não volta a ser treinado.
+
+        Attributes:
+            path (str): Ficheiro JSON de persistência (None -> só memória).
+            max_entries (int): Nº máximo de candidatos guardados.
+    """
+    def __init__(self, path=None, max_entries=4096):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def make_key(fingerprint, cv_config, estimator_id, params):
+        raw = json.dumps([fingerprint, cv_config, estimator_id, params], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            scores = self.entries.get(key)
+            if scores is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return scores
+
+    def put(self, key, fold_scores):
+        with self.lock:
+            self.entries[key] = list(fold_scores)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[CV CACHE] Cache ignorada ({e})")
+            return
+        # o ficheiro guarda as entradas da menos para a mais recente
+        for key, scores in stored[-self.max_entries:]:
+            self.entries[key] = scores
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = json.dumps(list(self.entries.items()))
+        atomic_write(self.path, data)
@@ -0,0 +1,151 @@
+import hashlib, json, os, shutil, tempfile
+import numpy as np
+
+
+def _sklearn_frame(name):
+    '''
+    Datasets de exemplo do sklearn ("sklearn:wine", "sklearn:iris", ...)
+    '''
+    from sklearn import datasets
+
+    loader = getattr(datasets, f"load_{name}", None)
+    if loader is None:
+        raise ValueError(f"Dataset sklearn '{name}' não suportado.")
+    return loader(as_frame=True).frame
+
+
+def _iter_chunks(source, chunksize):
+    '''
+    Lê a fonte de dados em blocos de DataFrames com no máximo `chunksize` linhas
+    '''
+    if source.startswith("sklearn:"):
+        yield _sklearn_frame(source.split(":", 1)[1])
+        return
+
+    import pandas as pd
+
+    if source.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Fontes Parquet requerem o pacote pyarrow.")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif source.endswith((".csv", ".csv.gz")):
+        yield from pd.read_csv(source, chunksize=chunksize)
+    else:
+        raise ValueError(f"Formato da fonte de dados '{source}' não suportado (csv/parquet).")
+
+
+def _cache_key(data_config):
+    '''
+    Identifica a conversão: fonte (caminho, tamanho, mtime), alvo, dtype e seed
+    '''
+    source = data_config.get("source", "sklearn:wine")
+    stamp = None
+    if not source.startswith("sklearn:"):
+        stat = os.stat(source)
+        stamp = [os.path.abspath(source), stat.st_size, stat.st_mtime_ns]
+    raw = json.dumps([
+        source,
+        stamp,
+        data_config.get("target"),
+        data_config.get("dtype", "float32"),
+        data_config.get("random_state", 42),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _check_numeric(chunk, columns, source):
+    '''
+    As features são convertidas para um dtype numérico: falha logo com as colunas que não o são
+    '''
+    from pandas.api.types import is_numeric_dtype
+
+    invalid = [str(col) for col in columns if not is_numeric_dtype(chunk[col])]
+    if invalid:
+        raise ValueError(
+            f"Fonte de dados '{source}': colunas de features não numéricas {invalid}; "
+            "codifique-as ou remova-as (ou indique-as como `target`)."
+        )
+
+
+def _convert(data_config, out_dir):
+    '''
+    Converte a fonte em X.npy / y.npy (memmap) em duas passagens por blocos:
+        1. conta as linhas e recolhe as colunas e as classes do alvo;
+        2. escreve cada bloco nas linhas de destino de uma permutação fixa.
+    As linhas ficam já baralhadas, por isso os splits treino/teste são fatias.
+    '''
+    source = data_config.get("source", "sklearn:wine")
+    chunksize = data_config.get("chunksize", 100000)
+    target = data_config.get("target")
+    dtype = np.dtype(data_config.get("dtype", "float32"))
+
+    n_rows, columns, classes = 0, None, set()
+    for chunk in _iter_chunks(source, chunksize):
+        if columns is None:
+            target = target or chunk.columns[-1]
+            columns = [col for col in chunk.columns if col != target]
+        _check_numeric(chunk, columns, source)
+        n_rows += len(chunk)
+        classes.update(chunk[target].unique().tolist())
+    if not n_rows:
+        raise ValueError(f"Fonte de dados '{source}' vazia.")
+    classes = sorted(classes)
+    class_index = {label: i for i, label in enumerate(classes)}
+
+    permutation = np.random.default_rng(data_config.get("random_state", 42)).permutation(n_rows)
+    X = np.lib.format.open_memmap(os.path.join(out_dir, "X.npy"), mode="w+", dtype=dtype, shape=(n_rows, len(columns)))
+    y = np.lib.format.open_memmap(os.path.join(out_dir, "y.npy"), mode="w+", dtype=np.int32, shape=(n_rows,))
+    offset = 0
+    for chunk in _iter_chunks(source, chunksize):
+        rows = permutation[offset:offset + len(chunk)]
+        X[rows] = chunk[columns].to_numpy(dtype=dtype)
+        y[rows] = chunk[target].map(class_index).to_numpy(dtype=np.int32)
+        offset += len(chunk)
+    X.flush()
+    y.flush()
+    del X, y
+
+    meta = {"source": source, "target": str(target), "columns": [str(c) for c in columns], "classes": classes, "n_rows": n_rows}
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, default=str)
+
+
+def load_dataset(data_config):
+    '''
+    Carrega o dataset configurado como memmaps só de leitura.
+    Na primeira execução converte a fonte para a cache (cache_dir/<chave>/);
+    as seguintes abrem diretamente os .npy.
+    Args:
+        data_config: Secção `data` do config.yaml
+    Returns:
+        X: np.memmap (n_linhas, n_features)
+        y: np.memmap (n_linhas,) com o índice da classe
+        meta: Dicionário com colunas, classes, nº de linhas e a chave da cache
+    '''
+    key = _cache_key(data_config)
+    cache_dir = data_config.get("cache_dir", "cache/data")
+    dataset_dir = os.path.join(cache_dir, key)
+
+    if not os.path.exists(os.path.join(dataset_dir, "meta.json")):
+        print(f"[DATA] A converter {data_config.get('source', 'sklearn:wine')} para {dataset_dir}")
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp_")
+        try:
+            _convert(data_config, tmp_dir)
+            os.replace(tmp_dir, dataset_dir)
+        except OSError:
+            # outro processo terminou a mesma conversão primeiro
+            if not os.path.exists(os.path.join(dataset_dir, "meta.json")):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    with open(os.path.join(dataset_dir, "meta.json"), "r") as f:
+        meta = json.load(f)
+    meta["key"] = key
+    X = np.load(os.path.join(dataset_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(dataset_dir, "y.npy"), mmap_mode="r")
+    return X, y, meta
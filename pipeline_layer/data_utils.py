@@ -1,26 +1,28 @@
-from sklearn.model_selection import train_test_split
-from sklearn.datasets import load_breast_cancer, load_iris, load_wine, load_digits
+from data_sources import load_dataset
 
-def load_data():
-    df = load_wine(as_frame=True).frame
-    return df
+def load_data(data_config=None):
+    '''
+    Carrega o dataset configurado na secção `data` do config.yaml
+    (por omissão o wine do sklearn) como memmaps só de leitura
+    Returns:
+        X, y, meta: ver data_sources.load_dataset
+    '''
+    return load_dataset(data_config or {})
 
-def data_split(df, test_size=0.2, random_state=42):
+def data_split(X, y, test_size=0.2):
     '''
-    Divide o DataFrame em conjuntos de treino e teste
+    Divide os dados em conjuntos de treino e teste sem copiar
+    As linhas já estão baralhadas na cache (random_state da secção `data`),
+    por isso o split são duas fatias (views) dos memmaps
     Args:
-        df: DataFrame contendo os dados
+        X, y: Dados devolvidos por load_data
         test_size: Proporção dos dados a serem usados para teste
-        random_state: Semente para reprodução dos resultados
     Returns:
         X_train, X_test, y_train, y_test: Dados divididos em treino e teste
     '''
-    X = df.iloc[:, :-1]  # Assuming all columns except the last are features
-    y = df.iloc[:, -1]  # Assuming the target variable is the last column
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=test_size, random_state=random_state
-    )
-    return X_train, X_test, y_train, y_test
+    n_test = max(1, int(round(len(y) * test_size)))
+    n_train = len(y) - n_test
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:]
 
 def build_param_grid(param_grid):
     ''' 
@@ -34,21 +36,4 @@ def build_param_grid(param_grid):
     formatted_grid = {}
     for key, value in param_grid.items():
         formatted_grid[f"{step_name}{key}"] = value
-    return formatted_grid
-
-def resolve_targets_by_index(known_peers, indices_list):
-    """
-    Recebe a lista crua de peers descobertos e a lista de indices para routing.
-    Retorna os IPs dos alvos.
-    """
-    sorted_peers = sorted(known_peers)
-    
-    targets = []
-    for idx in indices_list:
-        if idx < len(sorted_peers):
-            target_ip = sorted_peers[idx]
-            targets.append(target_ip)
-        else:
-            print(f"[ROUTING] Indice {idx} pedido, mas só conheço {len(sorted_peers)} peers.")
-    print("Targets resolved:", targets) 
-    return targets
\ No newline at end of file
+    return formatted_grid
\ No newline at end of file
@@ -1,20 +1,30 @@
-from data_utils import build_param_grid, data_split, load_data, resolve_targets_by_index
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import GridSearchCV
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
+# o sklearn só é importado quando é preciso (primeiro treino / primeiro modelo
+# recebido): o serviço liga-se à malha e anuncia-se sem esperar por ele
+from data_utils import build_param_grid, data_split, load_data
+from cv_cache import CVScoreCache
+from train_mailbox import LatestMailbox, SearchCancelled
+from sharding import shard, shard_members
+from training_pool import TrainingPool
 from yaml import Loader, load
-import json, threading, time, uuid
+import json, os, threading, time, uuid
 
 import warnings
 warnings.filterwarnings("ignore")
 
 from client.mqtt_layer import Communication_Layer
+from client.metrics import METRICS, log_payload, setup_observability
+from client.blob_transfer import BlobTransfer
+from client.checkpoint import Checkpointer
+from client.forest_codec import dump_forest, load_forest
+from client.routing import Hierarchy, RoutingTable, can_target_self
+from client.update_encoding import DeltaDecoder, DeltaEncoder
 
 
 class Model_Manager:
 
     def __init__(self):
+        self.started_at = time.perf_counter()
+        self.startup_seconds = {}
 
         with open("client/config.yaml", "r") as file:
             self.config = load(file, Loader=Loader)
@@ -28,23 +38,180 @@ class Model_Manager:
         self.mode = self.config["mode"]
         self.server_ip = self.config["central_server"]
         self.server_id = self.server_ip.replace(".", "_")
+        self.codec_config = self.config.get("codec", {})
+        self.queue_size = self.config.get("router", {}).get("queue_size", 256)
+        setup_observability(self.config.get("observability", {}), "pipeline")
 
         self.current_peer_list = []
-        self.pipeline_dest_indices = self.config["routing_topology"]["pipeline_topology"]
+        self.round = 0
+        self.routes = RoutingTable(
+            self.config["routing_topology"]["pipeline_topology"], self.peer_ip, name="PIPELINE ROUTING"
+        )
+        # modo ensemble: os modelos treinados seguem para o agregador em vez de só os hiperparâmetros
+        self.ensemble_mode = self.config.get("aggregation", {}).get("method") == "ensemble"
+        self.blob_config = self.config.get("blob_transfer", {})
+        self.blobs = None
+        # agregação hierárquica: os parâmetros seguem para o líder do grupo deste nó
+        hierarchy_config = self.config["routing_topology"].get("hierarchy") or {}
+        self.hierarchy = None
+        if self.mode == "federated" and hierarchy_config.get("enabled", False) and not self.ensemble_mode:
+            self.hierarchy = Hierarchy(hierarchy_config.get("tiers", [4]), self.server_ip, self.peer_ip)
 
-        self.df = load_data()
-        self.X_train, self.X_test, self.y_train, self.y_test = data_split(self.df)
+        # updates em delta: parâmetros treinados (encoder) e agregados recebidos (decoder)
+        update_config = self.config.get("update_encoding", {})
+        self.update_encoder = self.update_decoder = None
+        if update_config.get("enabled", False):
+            self.update_encoder = DeltaEncoder(
+                quantize=update_config.get("quantize"),
+                error_feedback=update_config.get("error_feedback", True),
+                history=update_config.get("history", 8),
+            )
+            self.update_decoder = DeltaDecoder(history=update_config.get("history", 8))
 
+        # pedidos de treino: só o agregado mais recente é mantido
+        self.train_mailbox = LatestMailbox()
+        self.best_model = None
+        self.best_params = None
+        self.last_trained = None  # (ronda, base_versions) dos últimos parâmetros publicados
+        # arranque a quente: republica os parâmetros restaurados (ver _republish_restored)
+        self.republish_pending = False
+        self.republish_lock = threading.Lock()
+        # agregação assíncrona: cada agregador tem o seu contador de versões
+        # id do agregador -> última versão recebida dele
+        self.seen_versions = {}
+        # cópia de seen_versions quando começou o treino em curso (base_version por destino)
+        self.base_versions = {}
+
+        # arranque: primeiro liga-se à malha (recebe peers e agregados enquanto
+        # carrega os dados), depois dados e pool, e anuncia-se pronto antes do 1º treino
+        self.data_ready = threading.Event()
         self._setup_mqtt_client()
-        self._start_pipe_worker()
+        self._startup_phase("mqtt")
+        self._publish_status("starting")
+
+        self.data_config = self.config.get("data", {})
+        X, y, self.data_meta = load_data(self.data_config)
+        self.test_size = self.data_config.get("test_size", 0.2)
+        self.X_full_train, self.X_test, self.y_full_train, self.y_test = data_split(X, y, self.test_size)
+        # o conteúdo da cache é determinado pela chave: evita ler o dataset inteiro
+        self.data_key = f"{self.data_meta['key']}:{self.test_size}"
+        self.sharding_config = self.data_config.get("sharding") or {}
+        self.shard_members = None
+        self._reshard()
+        self.data_ready.set()
+        self._startup_phase("data")
 
         with open("param_config.yaml", "r") as file:
             self.config_param = load(file, Loader=Loader)
 
         self.param_grid = build_param_grid(self.config_param["param_grid"])
-        threading.Thread(target=self.run_pipeline).start()
-        self.best_model = None
-        self.best_params = None
+        self.search_config = self.config_param.get("search", {})
+        cache_config = self.search_config.get("cache", {})
+        pool_config = self.config_param.get("training_pool", {})
+        self.training_pool = None
+        if pool_config.get("enabled", False):
+            self.training_pool = TrainingPool(
+                reserved_cores=pool_config.get("reserved_cores", 1),
+                nice=pool_config.get("nice", 5),
+                thermal_limit_c=pool_config.get("thermal_limit_c", 80),
+                cancel_grace=pool_config.get("cancel_grace", 5),
+            )
+        self.cv_cache = None
+        # com training_pool a cache de CV vive no processo de treino
+        if cache_config.get("enabled", False) and self.training_pool is None:
+            self.cv_cache = CVScoreCache(
+                path=cache_config.get("path"),
+                max_entries=cache_config.get("max_entries", 4096),
+            )
+
+        checkpoint_config = self.config.get("checkpoint", {})
+        self.checkpointer = None
+        warm = False
+        if checkpoint_config.get("enabled", False):
+            self.checkpointer = Checkpointer(
+                os.path.join(checkpoint_config.get("dir", "checkpoints"), "pipeline"),
+                interval=checkpoint_config.get("interval", 30),
+            )
+            warm = checkpoint_config.get("warm_start", True) and self._restore_checkpoint()
+            self.checkpointer.start(self._checkpoint_snapshot)
+            if warm:
+                self._republish_restored()
+        if not warm and not self.train_mailbox.pending():
+            # arranque a frio: pesquisa inicial sobre a grelha do param_config.yaml
+            # (a não ser que já tenha chegado um agregado durante o arranque)
+            self.train_mailbox.put((self.param_grid, {}))
+        self._startup_phase("ready")
+        self._publish_status("ready")
+        self._start_train_worker()
+
+    def _startup_phase(self, phase):
+        """
+        Regista o tempo desde o início do arranque até ao fim de uma fase.
+        """
+        elapsed = time.perf_counter() - self.started_at
+        self.startup_seconds[phase] = round(elapsed, 4)
+        METRICS.set_gauge("startup_seconds", elapsed, phase=phase)
+        print(f"[PIPELINE] Arranque: {phase} em {elapsed:.3f}s")
+
+    def _publish_status(self, state):
+        """
+        Anuncia o estado do serviço em <id>/status (starting | ready).
+        """
+        self.mqtt_com.publish(
+            {"id": self.peer_ip, "service": "pipeline", "state": state, "startup_seconds": self.startup_seconds},
+            topic=f"{self.broker_id}/status",
+        )
+
+    def _checkpoint_snapshot(self):
+        state = {
+            "data_key": self.data_key,
+            "round": self.round,
+            "base_versions": self.base_versions,
+            "best_params": self.best_params,
+        }
+        return state, {"best_model": self.best_model}
+
+    def _restore_checkpoint(self):
+        """
+        Arranque a quente: repõe o modelo treinado e a ronda do último checkpoint.
+        Só volta a treinar quando chegar um agregado novo.
+        Returns:
+            True se o checkpoint foi restaurado
+        """
+        state, objects = self.checkpointer.load()
+        if state is None or objects.get("best_model") is None:
+            return False
+        if state.get("data_key") != self.data_key:
+            print("[PIPELINE] Checkpoint de outro dataset/split ignorado.")
+            return False
+        # as rotas já estão ativas durante o arranque: a ronda/versões de um agregado ou
+        # a floresta global que chegaram entretanto são mais recentes do que o checkpoint
+        if self.best_model is None:
+            self.best_model = objects["best_model"]
+        self.best_params = state["best_params"]
+        self.round = max(self.round, state["round"])
+        self.base_versions = state.get("base_versions") or {}
+        for agg_id, version in self.base_versions.items():
+            self.seen_versions[agg_id] = max(self.seen_versions.get(agg_id, version), version)
+        self.last_trained = (state["round"], self.base_versions)
+        self.republish_pending = True
+        print(f"[PIPELINE] Arranque a quente: checkpoint {self.checkpointer.generation} restaurado "
+              f"(ronda {self.round}); à espera de um agregado novo para treinar.")
+        return True
+
+    def _republish_restored(self):
+        """
+        Arranque a quente: volta a publicar os parâmetros restaurados. Com o cluster
+        todo reiniciado o agregador espera por contribuições e este pipeline por um
+        agregado; sem isto ninguém voltava a publicar.
+        """
+        with self.republish_lock:
+            if not self.republish_pending:
+                return
+            # sem peers conhecidos os destinos ainda não são os finais: repete na 1ª lista de peers
+            self.republish_pending = not self.current_peer_list
+        print("[PIPELINE] Arranque a quente: a republicar os parâmetros restaurados.")
+        self.publish_trained_params(self._trained_targets(), *self.last_trained)
 
     def _setup_mqtt_client(self):
         """
@@ -56,16 +223,36 @@ class Model_Manager:
             client_id=f"pipeline_{self.broker_id}_{str(uuid.uuid4())[:4]}",
             base_topic="",
             qos=1,
+            codec=self.codec_config.get("format", "json"),
+            compression=self.codec_config.get("compression"),
+            compress_threshold=self.codec_config.get("compress_threshold", 1024),
         )
         if self.mode == "federated":
             target_topic = f"{self.server_id}/train"
         else:
             target_topic = "+/train"
 
-        self.mqtt_com.subscribe(topic=target_topic)
-        #self.mqtt_com.subscribe(topic="+/train")
-
-        self.mqtt_com.subscribe("system/peers")
+        self.mqtt_com.route("system/peers", self.on_peers, control=True)
+        # own: no central_server o agregado é publicado no próprio prefixo
+        self.mqtt_com.route(target_topic, self.on_aggregate, maxsize=self.queue_size, own=self.mode == "federated")
+        if self.mode != "federated" and can_target_self(self.config["routing_topology"]["aggregation_topology"]):
+            # o agregador deste nó pode escolher este pipeline: <id>/train não passa no +/train
+            self.mqtt_com.route(f"{self.broker_id}/train", self.on_aggregate, maxsize=self.queue_size, own=True)
+        if self.update_encoder is not None:
+            # worker próprio: um pedido de estado completo reenvia os últimos parâmetros
+            self.mqtt_com.route(f"{self.broker_id}/pipe/ack", self.on_update_ack, maxsize=self.queue_size, own=True)
+        if self.ensemble_mode:
+            self.blobs = BlobTransfer(
+                self.mqtt_com,
+                f"{self.broker_id}/pipe",
+                store_dir=self.blob_config.get("store_dir", "blobs"),
+                chunk_size=self.blob_config.get("chunk_size", 65536),
+                window=self.blob_config.get("window", 16),
+                retry_after=self.blob_config.get("retry_after", 5),
+                on_blob=self.on_model_blob,
+                accept_sender=self._known_sender,
+                max_size=self.blob_config.get("max_size", 64 << 20),
+            )
 
     def build_pipeline(self, scaler, model):
         """
@@ -74,37 +261,80 @@ class Model_Manager:
         Returns:
             pipeline: A sklearn Pipeline object
         """
-        pipeline = Pipeline([("scaler", scaler), ("classifier", model)])
+        from sklearn.pipeline import Pipeline
+        from search_strategies import preprocessing_memory
+
+        # memory: o scaler de cada fold é ajustado uma vez para todos os candidatos
+        pipeline = Pipeline(
+            [("scaler", scaler), ("classifier", model)], memory=preprocessing_memory(self.search_config)
+        )
         return pipeline
 
-    def param_tuning(self, pipeline, param_grid, X_train, y_train):
+    def param_tuning(self, pipeline, param_grid, X_train, y_train, should_stop=None):
         """
-        Executa o GridSearchCV numa pipeline
+        Executa a pesquisa de hyperparâmetros configurada (search.strategy) numa pipeline
         Treina  e faz hyperparameter tuning no modelo tedno em conta a param_grid
         Args:
             pipeline: A sklearn Pipeline object
             param_grid: Dicionário com os hyperparâmetros (param_config.yaml)
             X_train: Features de treino
             y_train: Labels de treino
-            X_test: Features de teste
-            y_test: Labels de teste
+            should_stop: Callable; True -> interrompe a pesquisa (SearchCancelled)
+        Com training_pool a pesquisa corre no processo de treino, que reabre os
+        dados de treino a partir da cache memmap (X_train/y_train não são enviados).
         Returns:
             best_params: Melhores parâmetros encontrados
             grid_search: O melhor modelo encontrado, já treinado
         """
-        grid_search_model = GridSearchCV(
-            estimator=pipeline,
-            param_grid=param_grid,
-            cv=5,  # 5-fold cross-validation
-            scoring="accuracy",
-            n_jobs=-1,
-            verbose=1,
-        )
         print("GRID", self.param_grid)
-        grid_search_model.fit(X_train, y_train)
-        best_params = grid_search_model.best_params_
+        strategy = self.search_config.get("strategy", "grid")
+        fits_before = METRICS.counter("search_fits_total")
+        start = time.perf_counter()
+        try:
+            if self.training_pool is not None:
+                best_params, best_model, fits = self.training_pool.run(
+                    self._training_job(pipeline, param_grid), should_stop=should_stop
+                )
+                METRICS.inc("search_fits_total", fits)
+                return best_params, best_model
 
-        return best_params, grid_search_model
+            from search_strategies import (
+                build_search, run_candidate_search, trim_preprocessing_cache, use_candidate_search,
+            )
+
+            if use_candidate_search(pipeline, param_grid, self.search_config, self.cv_cache):
+                return run_candidate_search(
+                    pipeline, param_grid, X_train, y_train, self.search_config,
+                    cache=self.cv_cache, fingerprint=self.data_fingerprint, should_stop=should_stop,
+                )
+
+            grid_search_model = build_search(pipeline, param_grid, self.search_config)
+            grid_search_model.fit(X_train, y_train)
+            trim_preprocessing_cache(pipeline, self.search_config)
+            METRICS.inc("search_fits_total", len(grid_search_model.cv_results_["params"]) * grid_search_model.n_splits_)
+            best_params = grid_search_model.best_params_
+
+            return best_params, grid_search_model
+        finally:
+            elapsed = time.perf_counter() - start
+            fits = METRICS.counter("search_fits_total") - fits_before
+            METRICS.observe("search_seconds", elapsed, strategy=strategy)
+            if elapsed > 0:
+                METRICS.set_gauge("search_fits_per_second", fits / elapsed, strategy=strategy)
+
+    def _training_job(self, pipeline, param_grid):
+        return {
+            "pipeline": pipeline,
+            "param_grid": param_grid,
+            "search_config": self.search_config,
+            "data": {
+                "data_config": self.data_config,
+                "test_size": self.test_size,
+                "members": self.shard_members,
+                "self_ip": self.peer_ip,
+                "fingerprint": self.data_fingerprint,
+            },
+        }
 
     def evaluate(self, model, X_train, X_test, y_train, y_test):
         """
@@ -116,27 +346,116 @@ class Model_Manager:
         test_accuracy = model.score(X_test, y_test)
         return train_accuracy, test_accuracy
 
-    def run_pipeline(self):
-        pipeline = self.build_pipeline(
-            scaler=StandardScaler(), model=RandomForestClassifier()
+    def run_pipeline(self, should_stop=None):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+
+        # random_state fixo: scores reprodutíveis, condição para usar a cache de CV
+        model = RandomForestClassifier(random_state=self.search_config.get("model_random_state"))
+        pipeline = self.build_pipeline(scaler=StandardScaler(), model=model)
+        best_params, best_model = self.param_tuning(
+            pipeline, self.param_grid, self.X_train, self.y_train, should_stop
         )
-        self.best_params, self.best_model = self.param_tuning(
-            pipeline, self.param_grid, self.X_train, self.y_train
+        if should_stop is not None and should_stop():
+            # chegou um agregado mais recente: não publica um resultado obsoleto
+            raise SearchCancelled()
+        self.best_params, self.best_model = best_params, best_model
+        if self.checkpointer is not None:
+            self.checkpointer.touch()
+        if "first_result" not in self.startup_seconds:
+            self._startup_phase("first_result")
+        targets = self._trained_targets()
+        self.last_trained = (self.round, self.base_versions)
+        self.publish_trained_params(targets, *self.last_trained)
+        train_acc, test_acc = self.evaluate(
+            self.best_model, self.X_train, self.X_test, self.y_train, self.y_test
         )
+        if self.ensemble_mode:
+            self.send_model(test_acc, targets)
+
+    def _trained_targets(self):
+        """
+        Agregadores que recebem os parâmetros treinados: o líder do grupo (hierárquico)
+        ou os alvos da topologia do pipeline.
+        """
+        if self.hierarchy is not None:
+            return (self.hierarchy.upstream(0),)
+        return self.routes.targets()
+
+    def publish_trained_params(self, targets, round_id, base_versions):
+        """
+        Publica best_params para os agregadores `targets` (vazio -> no próprio prefixo).
+        base_versions: id do agregador -> versão de onde partiu o treino (só modo assíncrono);
+        cada agregador recebe a sua, porque as versões não são comparáveis entre agregadores.
+        """
         trained_params_payload = {
             "id": self.peer_ip,
-            "trained_params": self.best_params,
+            "round": round_id,
+            "base_version": None,
         }
-        targets = resolve_targets_by_index(self.current_peer_list, self.pipeline_dest_indices)
+        if self.update_encoder is not None:
+            trained_params_payload["trained_update"] = self.update_encoder.encode(
+                self.best_params, receivers=targets or (self.peer_ip,)
+            )
+        else:
+            trained_params_payload["trained_params"] = self.best_params
         if not targets:
+            trained_params_payload["base_version"] = base_versions.get(self.broker_id)
             self.mqtt_com.publish(trained_params_payload, topic=f"{self.broker_id}/agg")
-        else:
+        elif base_versions:
             for ip in targets:
                 target_id = ip.replace(".", "_")
-                self.mqtt_com.publish(trained_params_payload, topic=f"{target_id}/agg")
-        train_acc, test_acc = self.evaluate(
-            self.best_model, self.X_train, self.X_test, self.y_train, self.y_test
-        )
+                self.mqtt_com.publish(
+                    dict(trained_params_payload, base_version=base_versions.get(target_id)), topic=f"{target_id}/agg"
+                )
+        else:
+            self.mqtt_com.publish_many(
+                trained_params_payload, [f"{ip.replace('.', '_')}/agg" for ip in targets]
+            )
+
+    def send_model(self, score, targets):
+        """
+        Modo ensemble: envia o modelo treinado (arrays .npz, via BlobTransfer) aos agregadores.
+        O score (accuracy no split de teste local) pesa a contribuição do nó na floresta global.
+        """
+        model = getattr(self.best_model, "best_estimator_", self.best_model)
+        target_ids = [f"{ip.replace('.', '_')}/agg" for ip in targets] or [f"{self.broker_id}/agg"]
+        meta = {"kind": "model", "id": self.peer_ip, "round": self.round, "score": score}
+        self.blobs.send_many(target_ids, data=dump_forest(model), meta=meta)
+
+    def _known_sender(self, sender):
+        """
+        accept_sender do BlobTransfer: só se aceitam blobs de membros conhecidos
+        (lista de peers ou este nó); sender é o sufixo do tópico, ex: 10_0_0_1/agg.
+        """
+        members = {ip.replace(".", "_") for ip in self.current_peer_list} | {self.broker_id}
+        return sender.split("/", 1)[0] in members
+
+    def on_model_blob(self, sender, blob, path, meta):
+        """
+        Modo ensemble: recebeu a floresta global do agregador.
+        Passa a ser o best_model deste nó sem qualquer retreino.
+        """
+        if meta.get("kind") != "global_model":
+            return
+
+        self.data_ready.wait()
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            # os limiares da floresta global estão no espaço original das features:
+            # load_forest devolve-a num Pipeline com scaler "passthrough"
+            model = load_forest(data)
+        except ValueError as e:
+            print(f"[PIPELINE] Floresta global de {sender} rejeitada: {e}")
+            return
+        forest = model.named_steps["classifier"]
+        train_acc, test_acc = self.evaluate(model, self.X_train, self.X_test, self.y_train, self.y_test)
+        self.best_model = model
+        if self.checkpointer is not None:
+            self.checkpointer.touch()
+        METRICS.set_gauge("global_model_accuracy", test_acc)
+        print(f"[PIPELINE] Floresta global de {meta.get('nodes')}: {forest.n_estimators} árvores, accuracy teste {test_acc:.4f}")
 
     def create_adaptive_grid(self, origin_params, spread=0.2):
         """
@@ -169,29 +488,90 @@ class Model_Manager:
                 new_grid[param] = [int(value)]
         return new_grid
 
-    def pipe_worker_on_message(self):
+    def _reshard(self):
+        """
+        Recalcula o shard de treino deste nó a partir de current_peer_list.
+        Sem sharding (mode null) treina com o conjunto de treino completo.
+        """
+        mode = self.sharding_config.get("mode")
+        if not mode:
+            self.X_train, self.y_train = self.X_full_train, self.y_full_train
+            self.data_fingerprint = self.data_key
+            return
+        members = shard_members(self.current_peer_list, self.peer_ip)
+        if members == self.shard_members:
+            return
+        seed = self.sharding_config.get("seed", 0)
+        self.X_train, self.y_train, shard_id = shard(
+            self.X_full_train, self.y_full_train, members, self.peer_ip, mode, seed
+        )
+        self.shard_members = members
+        self.data_fingerprint = f"{self.data_key}:{mode}:{seed}:{','.join(members)}:{shard_id}"
+        print(f"[SHARDING] Shard {shard_id} ({mode}): {len(self.y_train)} de {len(self.y_full_train)} linhas")
+
+    def on_peers(self, topic, data):
+        """
+        Rota de controlo (system/peers): atualiza a lista de peers.
+        """
+        log_payload(self.broker_id, topic, data)
+        self.current_peer_list = data
+        self.routes.rebuild(data)
+        if self.hierarchy is not None:
+            self.hierarchy.rebuild(data)
+        print(f"[PIPELINE] Lista de peers atualizada: {self.current_peer_list}")
+        if self.republish_pending and data:
+            self._republish_restored()
+
+    def on_aggregate(self, topic, data):
+        """
+        Worker da rota de treino: converte o agregado recebido num pedido de treino.
         """
-        Worker para processar mensagens de pipeline recebidas via MQTT.
+        log_payload(self.broker_id, topic, data)
+        if "agg_update" in data:
+            new_params, ack = self.update_decoder.decode(data["id"], data["agg_update"])
+            self.mqtt_com.publish(dict(ack, id=self.peer_ip), topic=f"{data['id']}/agg/ack")
+            if new_params is None:
+                # falta a versão base: o agregador volta a enviar o estado completo
+                return
+            data["agg_params"] = new_params
+        round_id = data.get("round")
+        if round_id is not None:
+            if round_id < self.round:
+                # agregado repetido ou de uma ronda já ultrapassada
+                return
+            self.round = round_id + 1
+        new_params = data['agg_params']
+        if data.get("version") is not None:
+            self.seen_versions[data["id"]] = data["version"]
+        if self.train_mailbox.put((self.create_adaptive_grid(new_params), dict(self.seen_versions))):
+            print("[PIPELINE] Pedido de treino pendente substituído pelo agregado mais recente.")
+
+    def on_update_ack(self, topic, data):
+        """
+        Rota <id>/pipe/ack: versão dos parâmetros treinados confirmada por um agregador.
+        """
+        if self.update_encoder.ack(data["id"], data) and self.last_trained is not None:
+            # o agregador não tem a versão base (ex: reiniciou): sem reenvio ficava à espera
+            print(f"[PIPELINE] {data['id']} pediu o estado completo: reenvio dos últimos parâmetros.")
+            self.publish_trained_params((data["id"],), *self.last_trained)
+
+    def train_worker(self):
+        """
+        Worker de treino: processa sempre o pedido mais recente da mailbox.
+        Um treino em curso é interrompido quando chega um agregado novo.
         """
         while True:
-            topic, data = self.mqtt_com.msg_queue.get()
-
-            if topic == "system/peers":
-                print(f"[{self.broker_id}] RECEIVED on {topic}: {data}")
-                self.current_peer_list = data
-                print(f"[PIPELINE] Lista de peers atualizada: {self.current_peer_list}")
-                self.mqtt_com.msg_queue.task_done()
-                continue
-            else:
-                print(f"[{self.broker_id}] RECEIVED on {topic}: {data}")
-                new_params = data['agg_params']
-                self.param_grid = self.create_adaptive_grid(new_params)
-                self.run_pipeline()
-                self.mqtt_com.msg_queue.task_done()
-
-    def _start_pipe_worker(self):
-        pipe_thread = threading.Thread(target=self.pipe_worker_on_message)
-        pipe_thread.start()
+            self.param_grid, self.base_versions = self.train_mailbox.get()
+            # a lista de peers pode ter mudado desde o último treino
+            self._reshard()
+            try:
+                self.run_pipeline(should_stop=self.train_mailbox.pending)
+            except SearchCancelled:
+                print("[PIPELINE] Treino interrompido: chegou um agregado mais recente.")
+
+    def _start_train_worker(self):
+        train_thread = threading.Thread(target=self.train_worker)
+        train_thread.start()
 
 if __name__ == "__main__": 
     manager = Model_Manager()
@@ -0,0 +1,297 @@
+import numbers, os
+from math import prod
+from sklearn.base import clone
+from sklearn.model_selection import (
+    GridSearchCV,
+    ParameterGrid,
+    ParameterSampler,
+    RandomizedSearchCV,
+    StratifiedKFold,
+)
+from train_mailbox import SearchCancelled
+from client.metrics import METRICS
+
+# estratégias em que cada candidato é avaliado com o CV completo (cacheáveis)
+CACHEABLE_STRATEGIES = ("grid", "random")
+
+
+def grid_size(param_grid):
+    '''
+    Número de combinações de uma grid de hyperparâmetros
+    '''
+    return prod(len(values) for values in param_grid.values())
+
+
+def _common_args(pipeline, search_config):
+    return dict(
+        estimator=pipeline,
+        cv=search_config.get("cv", 5),
+        scoring=search_config.get("scoring", "accuracy"),
+        n_jobs=search_config.get("n_jobs", -1),
+        verbose=1,
+    )
+
+
+def _n_iter(param_grid, search_config):
+    '''
+    Converte o orçamento de fits em nº de candidatos (cada candidato custa `cv` fits)
+    '''
+    budget = search_config.get("fit_budget", 60)
+    n_iter = max(1, budget // search_config.get("cv", 5))
+    return min(n_iter, grid_size(param_grid))
+
+
+def build_grid_search(pipeline, param_grid, search_config):
+    '''
+    Pesquisa exaustiva (comportamento original)
+    '''
+    return GridSearchCV(param_grid=param_grid, **_common_args(pipeline, search_config))
+
+
+def build_random_search(pipeline, param_grid, search_config):
+    '''
+    Pesquisa aleatória limitada a `fit_budget` fits
+    '''
+    return RandomizedSearchCV(
+        param_distributions=param_grid,
+        n_iter=_n_iter(param_grid, search_config),
+        random_state=search_config.get("random_state"),
+        **_common_args(pipeline, search_config),
+    )
+
+
+def build_halving_grid_search(pipeline, param_grid, search_config):
+    '''
+    Successive halving sobre a grid: todos os candidatos começam com poucas
+    amostras e só os melhores (1/factor) passam à iteração seguinte
+    '''
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV
+
+    return HalvingGridSearchCV(
+        param_grid=param_grid,
+        factor=search_config.get("factor", 3),
+        random_state=search_config.get("random_state"),
+        **_common_args(pipeline, search_config),
+    )
+
+
+def build_halving_random_search(pipeline, param_grid, search_config):
+    '''
+    Successive halving sobre candidatos amostrados da grid
+    '''
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingRandomSearchCV
+
+    return HalvingRandomSearchCV(
+        param_distributions=param_grid,
+        factor=search_config.get("factor", 3),
+        random_state=search_config.get("random_state"),
+        **_common_args(pipeline, search_config),
+    )
+
+
+def build_bayes_search(pipeline, param_grid, search_config):
+    '''
+    Otimização sequencial baseada em modelo (scikit-optimize).
+    Listas numéricas viram intervalos [min, max]; o resto é categórico.
+    '''
+    try:
+        from skopt import BayesSearchCV
+        from skopt.space import Categorical, Integer, Real
+    except ImportError:
+        raise ValueError("Estratégia 'bayes' requer o pacote scikit-optimize.")
+
+    search_spaces = {}
+    for param, values in param_grid.items():
+        numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+        if numeric and len(set(values)) > 1:
+            if all(isinstance(v, int) for v in values):
+                search_spaces[param] = Integer(min(values), max(values))
+            else:
+                search_spaces[param] = Real(min(values), max(values))
+        else:
+            search_spaces[param] = Categorical(list(values))
+
+    return BayesSearchCV(
+        search_spaces=search_spaces,
+        n_iter=max(1, search_config.get("fit_budget", 60) // search_config.get("cv", 5)),
+        random_state=search_config.get("random_state"),
+        **_common_args(pipeline, search_config),
+    )
+
+
+SEARCH_STRATEGIES = {
+    "grid": build_grid_search,
+    "random": build_random_search,
+    "halving_grid": build_halving_grid_search,
+    "halving_random": build_halving_random_search,
+    "bayes": build_bayes_search,
+}
+
+
+def build_search(pipeline, param_grid, search_config):
+    '''
+    Constroi o objeto de pesquisa de hyperparâmetros configurado
+    Args:
+        pipeline: A sklearn Pipeline object
+        param_grid: Dicionário com os hyperparâmetros
+        search_config: Secção `search` do param_config.yaml
+    Returns:
+        search: Estimador sklearn com fit() e best_params_
+    '''
+    strategy = search_config.get("strategy", "grid")
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Estratégia de pesquisa '{strategy}' não suportada.")
+    return SEARCH_STRATEGIES[strategy](pipeline, param_grid, search_config)
+
+
+def preprocessing_memory(search_config):
+    '''
+    Cache dos passos de pré-processamento da Pipeline (memory): cada passo antes
+    do classificador é ajustado uma vez por fold e reutilizado por todos os
+    candidatos e pelas rondas seguintes (search.preprocessing_cache)
+    Returns:
+        joblib.Memory ou None se a cache estiver desligada
+    '''
+    cache_config = search_config.get("preprocessing_cache") or {}
+    if not cache_config.get("enabled", False):
+        return None
+    from joblib import Memory
+
+    return Memory(location=cache_config.get("location", "cache/preprocessing"), verbose=0)
+
+
+def trim_preprocessing_cache(pipeline, search_config):
+    '''
+    Limita a cache de pré-processamento a bytes_limit (apaga os resultados usados há mais tempo)
+    '''
+    memory = getattr(pipeline, "memory", None)
+    bytes_limit = (search_config.get("preprocessing_cache") or {}).get("bytes_limit")
+    if memory is None or bytes_limit is None:
+        return
+    memory.reduce_size(bytes_limit=bytes_limit)
+
+
+def _cv_splitter(search_config):
+    '''
+    Folds determinísticos: com split_seed os dados são baralhados com essa seed
+    '''
+    split_seed = search_config.get("split_seed")
+    splitter = StratifiedKFold(
+        n_splits=search_config.get("cv", 5),
+        shuffle=split_seed is not None,
+        random_state=split_seed,
+    )
+    cv_config = {
+        "splitter": "StratifiedKFold",
+        "n_splits": splitter.get_n_splits(),
+        "split_seed": split_seed,
+        "scoring": search_config.get("scoring", "accuracy"),
+    }
+    return splitter, cv_config
+
+
+def _candidates(param_grid, search_config):
+    strategy = search_config.get("strategy", "grid")
+    if strategy == "random":
+        return list(ParameterSampler(
+            param_grid,
+            n_iter=_n_iter(param_grid, search_config),
+            random_state=search_config.get("random_state"),
+        ))
+    return list(ParameterGrid(param_grid))
+
+
+def has_fixed_random_state(pipeline, param_grid):
+    '''
+    True se todos os random_state do estimador são inteiros fixos (também nos
+    valores da grid): sem isso o score de um candidato muda de execução para
+    execução e não pode ser reutilizado da cache
+    '''
+    for name, value in pipeline.get_params(deep=True).items():
+        if name != "random_state" and not name.endswith("__random_state"):
+            continue
+        values = param_grid.get(name, [value])
+        if not all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in values):
+            return False
+    return True
+
+
+def use_candidate_search(pipeline, param_grid, search_config, cache):
+    '''
+    A pesquisa em lotes (run_candidate_search) só é usada para grid/random com a
+    cache de CV ligada e um estimador determinístico; caso contrário corre o
+    GridSearchCV/RandomizedSearchCV original (build_search) com cv=search.cv
+    '''
+    if search_config.get("strategy", "grid") not in CACHEABLE_STRATEGIES or cache is None:
+        return False
+    if not has_fixed_random_state(pipeline, param_grid):
+        print("[SEARCH] Cache de CV ignorada: estimador sem random_state fixo.")
+        return False
+    return True
+
+
+def run_candidate_search(pipeline, param_grid, X, y, search_config, cache=None, fingerprint=None, should_stop=None):
+    '''
+    Pesquisa (grid ou random) avaliada em lotes de candidatos.
+    Com cache só treina os candidatos que ainda não foram avaliados; entre lotes
+    verifica should_stop() para poder ser interrompida por um pedido mais recente
+    (os lotes já avaliados ficam na cache).
+    Args:
+        pipeline: A sklearn Pipeline object
+        param_grid: Dicionário com os hyperparâmetros
+        X, y: Dados de treino
+        search_config: Secção `search` do param_config.yaml
+        cache: CVScoreCache (opcional)
+        fingerprint: Impressão digital de (X, y), obrigatória com cache
+        should_stop: Callable sem argumentos; True -> interrompe a pesquisa
+    Returns:
+        best_params: Melhores parâmetros encontrados
+        best_model: Pipeline com os melhores parâmetros, treinada em (X, y)
+    '''
+    splitter, cv_config = _cv_splitter(search_config)
+    estimator_id = repr(clone(pipeline))
+    candidates = _candidates(param_grid, search_config)
+
+    if cache is not None:
+        keys = [cache.make_key(fingerprint, cv_config, estimator_id, params) for params in candidates]
+        fold_scores = [cache.get(key) for key in keys]
+    else:
+        keys = None
+        fold_scores = [None] * len(candidates)
+    missing = [i for i, scores in enumerate(fold_scores) if scores is None]
+    print(f"[SEARCH] {len(candidates) - len(missing)}/{len(candidates)} candidatos em cache")
+
+    batch_size = search_config.get("batch_size") or os.cpu_count() or 1
+    n_splits = cv_config["n_splits"]
+    for start in range(0, len(missing), batch_size):
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+        batch = missing[start:start + batch_size]
+        search = GridSearchCV(
+            estimator=pipeline,
+            param_grid=[{param: [value] for param, value in candidates[i].items()} for i in batch],
+            cv=splitter,
+            scoring=cv_config["scoring"],
+            n_jobs=search_config.get("n_jobs", -1),
+            refit=False,
+            verbose=1,
+        )
+        search.fit(X, y)
+        METRICS.inc("search_fits_total", len(batch) * n_splits)
+        for j, i in enumerate(batch):
+            fold_scores[i] = [float(search.cv_results_[f"split{k}_test_score"][j]) for k in range(n_splits)]
+            if cache is not None:
+                cache.put(keys[i], fold_scores[i])
+        if cache is not None:
+            cache.save()
+
+    if should_stop is not None and should_stop():
+        raise SearchCancelled()
+    mean_scores = [sum(scores) / len(scores) for scores in fold_scores]
+    best = max(range(len(candidates)), key=mean_scores.__getitem__)
+    best_params = candidates[best]
+    best_model = clone(pipeline).set_params(**best_params).fit(X, y)
+    trim_preprocessing_cache(pipeline, search_config)
+    return best_params, best_model
@@ -0,0 +1,88 @@
+import hashlib
+import numpy as np
+
+SHARDING_MODES = ("hash", "range", "stratified")
+
+_BLOCK = 1 << 20
+
+
+def shard_members(peer_list, self_ip):
+    '''
+    Membros do cluster por ordem determinística (todos os nós obtêm a mesma lista)
+    '''
+    return sorted(set(peer_list) | {self_ip})
+
+
+def _mix(values):
+    '''
+    splitmix64 vetorizado (uint64, overflow intencional)
+    '''
+    with np.errstate(over="ignore"):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _member_seed(member, seed):
+    return np.uint64(int.from_bytes(hashlib.sha1(f"{member}:{seed}".encode()).digest()[:8], "little"))
+
+
+def _hash_shard(n_rows, members, me, seed):
+    '''
+    Rendezvous hashing por linha: a linha fica no membro com o maior hash(linha, membro).
+    Quando um membro entra ou sai só se movem as linhas desse membro.
+    '''
+    seeds = [_member_seed(member, seed) for member in members]
+    own = seeds[me]
+    selected = []
+    for start in range(0, n_rows, _BLOCK):
+        rows = np.arange(start, min(start + _BLOCK, n_rows), dtype=np.uint64)
+        own_score = _mix(rows ^ own)
+        best_other = np.zeros(len(rows), dtype=np.uint64)
+        for k, member_seed in enumerate(seeds):
+            if k != me:
+                np.maximum(best_other, _mix(rows ^ member_seed), out=best_other)
+        selected.append(rows[own_score > best_other].astype(np.int64))
+    return np.concatenate(selected)
+
+
+def _stratified_shard(y, n_members, me):
+    '''
+    Dentro de cada classe, uma linha em cada n_members (mesma distribuição de labels em todos os shards)
+    '''
+    selected = [np.flatnonzero(y == label)[me::n_members] for label in np.unique(y)]
+    return np.sort(np.concatenate(selected))
+
+
+def shard(X, y, peer_list, self_ip, mode, seed=0):
+    '''
+    Parte os dados de treino pelos membros do cluster e devolve a parte deste nó
+    Args:
+        X, y: Dados de treino (arrays ou memmaps)
+        peer_list: Lista de IPs recebida em system/peers
+        self_ip: IP deste nó
+        mode: 'hash', 'range' ou 'stratified'
+        seed: Seed do modo 'hash'
+    Returns:
+        X_shard, y_shard: Parte deste nó (views no modo 'range')
+        shard_id: String "<posição>/<nº de membros>"
+    '''
+    if mode not in SHARDING_MODES:
+        raise ValueError(f"Modo de sharding '{mode}' não suportado.")
+    members = shard_members(peer_list, self_ip)
+    me, n_members = members.index(self_ip), len(members)
+    shard_id = f"{me}/{n_members}"
+    if n_members == 1:
+        return X, y, shard_id
+
+    if mode == "range":
+        # as linhas já vêm baralhadas da cache: blocos contíguos são amostras aleatórias
+        start, stop = len(y) * me // n_members, len(y) * (me + 1) // n_members
+        return X[start:stop], y[start:stop], shard_id
+
+    if mode == "hash":
+        indices = _hash_shard(len(y), members, me, seed)
+    else:
+        indices = _stratified_shard(np.asarray(y), n_members, me)
+    return X[indices], y[indices], shard_id
@@ -0,0 +1,58 @@
+import threading
+
+
+class SearchCancelled(Exception):
+    """
+    Lançada quando um treino é interrompido porque chegou um pedido mais recente.
+    """
+
+
+class LatestMailbox:
+    """
+        Caixa de correio com um único lugar ("latest wins").
+
+        put() substitui o pedido pendente, por isso o worker de treino só vê o
+        agregado mais recente e o backlog nunca passa de um pedido.
+
+        Attributes:
+            replaced (int): Nº de pedidos descartados por terem sido substituídos.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.has_item = False
+        self.replaced = 0
+
+    def put(self, item):
+        """
+        Deposita um pedido, substituindo o pendente.
+        Returns:
+            True se havia um pedido pendente que foi descartado
+        """
+        with self.cond:
+            replaced = self.has_item
+            if replaced:
+                self.replaced += 1
+            self.item = item
+            self.has_item = True
+            self.cond.notify()
+            return replaced
+
+    def get(self):
+        """
+        Bloqueia até haver um pedido e retira-o.
+        """
+        with self.cond:
+            while not self.has_item:
+                self.cond.wait()
+            item = self.item
+            self.item = None
+            self.has_item = False
+            return item
+
+    def pending(self):
+        """
+        True se há um pedido à espera (usado para interromper o treino em curso).
+        """
+        with self.cond:
+            return self.has_item
@@ -0,0 +1,256 @@
+import itertools, multiprocessing, os, pickle, queue, threading, time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from train_mailbox import SearchCancelled
+from client.metrics import METRICS
+
+# flag "currently throttled" (bit 2) do firmware do Raspberry Pi
+_PI_THROTTLED = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+_THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def training_cores(reserved_cores=1):
+    '''
+    Cores para o treino: todos menos os `reserved_cores` mais baixos, que ficam
+    livres para o paho / broker (mínimo de um core para o treino)
+    '''
+    cores = available_cores()
+    return cores[min(reserved_cores, len(cores) - 1):]
+
+
+def is_throttled(thermal_limit_c=80):
+    '''
+    True se o SoC está (ou está prestes a ficar) limitado por temperatura
+    '''
+    try:
+        with open(_PI_THROTTLED) as f:
+            if int(f.read().strip(), 16) & 0x4:
+                return True
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(_THERMAL_ZONE) as f:
+            return int(f.read().strip()) >= thermal_limit_c * 1000
+    except (OSError, ValueError):
+        return False
+
+
+def adaptive_n_jobs(cores, thermal_limit_c=80):
+    '''
+    n_jobs da pesquisa: um por core de treino, metade com throttling térmico
+    '''
+    n_jobs = len(cores)
+    if is_throttled(thermal_limit_c):
+        n_jobs = max(1, n_jobs // 2)
+    return n_jobs
+
+
+def _training_data(spec, data_cache):
+    '''
+    Reabre os dados de treino no worker a partir da cache memmap (sem os copiar
+    pelo pipe); o último conjunto fica em memória enquanto a fingerprint não mudar
+    '''
+    if data_cache.get("fingerprint") != spec["fingerprint"]:
+        from data_utils import data_split, load_data
+        from sharding import shard
+
+        X, y, _ = load_data(spec["data_config"])
+        X_train, _, y_train, _ = data_split(X, y, spec["test_size"])
+        sharding = spec["data_config"].get("sharding") or {}
+        if sharding.get("mode") and spec["members"]:
+            X_train, y_train, _ = shard(
+                X_train, y_train, spec["members"], spec["self_ip"], sharding["mode"], sharding.get("seed", 0)
+            )
+        data_cache.update(fingerprint=spec["fingerprint"], X=X_train, y=y_train)
+    return data_cache["X"], data_cache["y"]
+
+
+def _run_job(job, cancel_event, state):
+    from cv_cache import CVScoreCache
+    from search_strategies import build_search, run_candidate_search, trim_preprocessing_cache, use_candidate_search
+
+    X_train, y_train = _training_data(job["data"], state.setdefault("data", {}))
+    search_config = job["search_config"]
+    cache_config = search_config.get("cache", {})
+    if cache_config.get("enabled", False) and "cv_cache" not in state:
+        state["cv_cache"] = CVScoreCache(
+            path=cache_config.get("path"),
+            max_entries=cache_config.get("max_entries", 4096),
+        )
+
+    fits_before = METRICS.counter("search_fits_total")
+    if use_candidate_search(job["pipeline"], job["param_grid"], search_config, state.get("cv_cache")):
+        best_params, best_model = run_candidate_search(
+            job["pipeline"], job["param_grid"], X_train, y_train, search_config,
+            cache=state.get("cv_cache"), fingerprint=job["data"]["fingerprint"], should_stop=cancel_event.is_set,
+        )
+    else:
+        best_model = build_search(job["pipeline"], job["param_grid"], search_config)
+        best_model.fit(X_train, y_train)
+        trim_preprocessing_cache(job["pipeline"], search_config)
+        METRICS.inc("search_fits_total", len(best_model.cv_results_["params"]) * best_model.n_splits_)
+        best_params = best_model.best_params_
+    return best_params, best_model, METRICS.counter("search_fits_total") - fits_before
+
+
+def _worker_main(job_queue, result_queue, cancel_event, cores, niceness):
+    if hasattr(os, "sched_setaffinity"):
+        # herdado pelos processos do joblib (n_jobs) lançados a partir daqui
+        os.sched_setaffinity(0, cores)
+    if niceness:
+        os.nice(niceness)
+    state = {}
+    while True:
+        job = job_queue.get()
+        if job is None:
+            return
+        job_id, payload = job
+        try:
+            result = (job_id, True, _run_job(payload, cancel_event, state))
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except Exception:
+                e = RuntimeError(repr(e))
+            result = (job_id, False, e)
+        result_queue.put(result)
+
+
+class TrainingPool:
+    """
+        Processo de treino persistente, separado do processo do paho.
+
+        O worker corre só nos cores de treino (os `reserved_cores` mais baixos ficam
+        para as mensagens) e com prioridade reduzida (`nice`). O n_jobs de cada
+        pesquisa é recalculado na submissão: um por core de treino, metade quando
+        o SoC está limitado por temperatura. O resultado volta num
+        concurrent.futures.Future.
+
+        Cancelamento: cancel() pede ao worker que pare entre lotes de candidatos
+        (grid/random com a cache de CV); se não parar em `cancel_grace` segundos o
+        processo é terminado e relançado.
+
+        Attributes:
+            cores (list): Cores onde o worker pode correr.
+    """
+    def __init__(self, reserved_cores=1, nice=5, thermal_limit_c=80, cancel_grace=5.0):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.cores = training_cores(reserved_cores)
+        self.nice = nice
+        self.thermal_limit_c = thermal_limit_c
+        self.cancel_grace = cancel_grace
+        self.job_ids = itertools.count()
+        self.lock = threading.Lock()
+        print(f"[TRAINING POOL] Cores de treino: {self.cores}")
+        self._spawn()
+
+    def _spawn(self):
+        self.job_queue = self.ctx.Queue()
+        self.result_queue = self.ctx.Queue()
+        self.cancel_event = self.ctx.Event()
+        # um dicionário de futures por processo: o coletor de um processo morto
+        # nunca toca nos futures do seguinte
+        self.futures = {}
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(self.job_queue, self.result_queue, self.cancel_event, self.cores, self.nice),
+            daemon=True,
+        )
+        self.process.start()
+        threading.Thread(
+            target=self._collect, args=(self.process, self.result_queue, self.futures), daemon=True
+        ).start()
+
+    def _collect(self, process, result_queue, futures):
+        while True:
+            try:
+                job_id, ok, result = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                with self.lock:
+                    pending = list(futures.values())
+                    futures.clear()
+                for future in pending:
+                    if not future.done():
+                        future.set_exception(SearchCancelled())
+                return
+            with self.lock:
+                future = futures.pop(job_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def n_jobs(self):
+        n_jobs = adaptive_n_jobs(self.cores, self.thermal_limit_c)
+        METRICS.set_gauge("training_n_jobs", n_jobs)
+        return n_jobs
+
+    def submit(self, job):
+        '''
+        Envia uma pesquisa para o worker.
+        Args:
+            job: {"pipeline", "param_grid", "search_config", "data": {data_config,
+                  test_size, members, self_ip, fingerprint}}
+        Returns:
+            Future com (best_params, best_model, nº de fits)
+        '''
+        job = dict(job, search_config=dict(job["search_config"], n_jobs=self.n_jobs()))
+        future = Future()
+        with self.lock:
+            job_id = next(self.job_ids)
+            self.futures[job_id] = future
+            self.cancel_event.clear()
+            self.job_queue.put((job_id, job))
+        return future
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def restart(self):
+        '''
+        Termina o worker (ex: pesquisa que não responde ao cancelamento) e lança outro.
+        '''
+        with self.lock:
+            process, futures = self.process, self.futures
+        process.terminate()
+        process.join()
+        for future in list(futures.values()):
+            if not future.done():
+                future.set_exception(SearchCancelled())
+        futures.clear()
+        METRICS.inc("training_pool_restarts_total")
+        self._spawn()
+
+    def run(self, job, should_stop=None, poll=0.5):
+        '''
+        submit() + espera pelo resultado, verificando should_stop() a cada `poll` segundos.
+        Raises:
+            SearchCancelled: se should_stop() ficou True durante a pesquisa
+        '''
+        future = self.submit(job)
+        cancelled_at = None
+        while True:
+            try:
+                return future.result(timeout=poll)
+            except FutureTimeout:
+                pass
+            if cancelled_at is None and should_stop is not None and should_stop():
+                self.cancel()
+                cancelled_at = time.monotonic()
+            if cancelled_at is not None and time.monotonic() - cancelled_at > self.cancel_grace:
+                self.restart()
+                raise SearchCancelled()
+
+    def close(self):
+        self.job_queue.put(None)
+        self.process.join(timeout=self.cancel_grace)
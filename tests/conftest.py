@@ -0,0 +1,10 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# layout dos containers: cada serviço importa os seus módulos sem prefixo e o
+# client/ como pacote (os scripts ad-hoc desta pasta não são testes)
+for path in (os.path.join(ROOT, "pipeline_layer"), os.path.join(ROOT, "aggregation_layer"), ROOT):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from aggregation_algs.async_agg import AsyncBuffer, STALENESS_FUNCTIONS
+
+
+def test_versions_advance_per_flush():
+    buffer = AsyncBuffer("avg", buffer_size=2, alpha=1.0, staleness={"function": "constant"})
+    assert buffer.add("a", {"x": 1.0}, None) is None
+    params, version = buffer.add("b", {"x": 3.0}, None)
+    assert version == 1 and params == {"x": 2.0}
+
+
+def test_avg_mixes_into_global():
+    buffer = AsyncBuffer("avg", alpha=0.5, staleness={"function": "constant"})
+    buffer.add("a", {"x": 10.0}, None)
+    params, _ = buffer.add("b", {"x": 20.0}, 1)
+    assert params == {"x": 15.0}
+
+
+def test_avg_votes_non_numeric_params():
+    buffer = AsyncBuffer("avg", buffer_size=3, alpha=1.0, staleness={"function": "constant"})
+    buffer.add("a", {"max_depth": 10, "criterion": "gini", "bootstrap": True}, None)
+    buffer.add("b", {"max_depth": 20, "criterion": "entropy", "bootstrap": False}, None)
+    params, _ = buffer.add("c", {"max_depth": 30, "criterion": "gini", "bootstrap": True}, None)
+    assert params == {"max_depth": 20.0, "criterion": "gini", "bootstrap": True}
+
+    # o valor global vota com (1 - alpha): um único voto contrário com alpha baixo não o muda
+    buffer = AsyncBuffer("avg", alpha=0.3, staleness={"function": "constant"})
+    buffer.add("a", {"criterion": "gini"}, None)
+    params, _ = buffer.add("b", {"criterion": "entropy"}, 1)
+    assert params == {"criterion": "gini"}
+
+
+def test_staleness_discounts_old_contributions():
+    buffer = AsyncBuffer("avg", alpha=1.0, staleness={"function": "polynomial", "a": 1.0})
+    buffer.add("a", {"x": 0.0}, None)
+    buffer.add("a", {"x": 0.0}, 1)
+    # treinou a partir da versão 0: staleness 2 -> peso 1/3
+    params, _ = buffer.add("b", {"x": 3.0}, None)
+    assert params["x"] == pytest.approx(1.0)
+
+
+def test_hinge_is_flat_until_b():
+    hinge = STALENESS_FUNCTIONS["hinge"]
+    assert hinge(4, a=0.5, b=4) == 1.0
+    assert hinge(6, a=0.5, b=4) == pytest.approx(0.5)
+
+
+def test_fedavg_weights_by_samples():
+    buffer = AsyncBuffer("fedavg", buffer_size=2, alpha=1.0, staleness={"function": "constant"})
+    buffer.add("a", {"num_samples": 1, "weights": {"w": np.zeros(3)}}, None)
+    params, _ = buffer.add("b", {"num_samples": 3, "weights": {"w": np.full(3, 4.0)}}, None)
+    np.testing.assert_allclose(params["weights"]["w"], np.full(3, 3.0))
+    assert params["num_samples"] == 4
+
+
+def test_unknown_method_or_staleness():
+    with pytest.raises(ValueError):
+        AsyncBuffer("median")
+    with pytest.raises(ValueError):
+        AsyncBuffer("avg", staleness={"function": "exp"})
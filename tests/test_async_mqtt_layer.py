@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("paho.mqtt")
+from client.async_mqtt_layer import AsyncCommunication_Layer
+
+
+class FakeClient:
+    """
+    Cliente paho falso: publish devolve mids sequenciais e os callbacks são
+    chamados pelo teste, a partir de outra thread como faria o paho.
+    """
+    def __init__(self, layer):
+        self.layer = layer
+        self.mid = 0
+        self.published = []
+
+    def connect_async(self, broker, port):
+        pass
+
+    def loop_start(self):
+        self.from_network(self.layer._on_connect, None, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.from_network(self.layer._on_disconnect, None, None, 0)
+
+    def publish(self, topic, raw, qos=0):
+        self.mid += 1
+        self.published.append((self.mid, topic))
+        return SimpleNamespace(rc=0, mid=self.mid)
+
+    @staticmethod
+    def from_network(callback, *args):
+        thread = threading.Thread(target=callback, args=args)
+        thread.start()
+        thread.join()
+
+    def ack(self, mid):
+        self.from_network(self.layer._on_publish, None, None, mid)
+
+
+async def connected_layer(**kwargs):
+    layer = AsyncCommunication_Layer(broker="10.0.0.1", client_id="test", **kwargs)
+    layer.client = FakeClient(layer)
+    await layer.connect()
+    return layer
+
+
+async def wait_published(layer, count):
+    while len(layer.client.published) < count:
+        await asyncio.sleep(0.001)
+
+
+def test_publish_waits_for_ack():
+    async def scenario():
+        layer = await connected_layer()
+        task = asyncio.create_task(layer.publish_many({"x": 1}, ["a/train", "b/train"]))
+        await wait_published(layer, 2)
+        layer.client.ack(1)
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        layer.client.ack(2)
+        await asyncio.wait_for(task, 1)
+        assert not layer.pending
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_fails_pending_publishes():
+    async def scenario():
+        layer = await connected_layer()
+        task = asyncio.create_task(layer.publish({"x": 1}, "a/train", timeout=None))
+        await wait_published(layer, 1)
+        # queda da ligação (rc != 0): o publish sem timeout não pode ficar pendurado
+        layer.client.from_network(layer._on_disconnect, None, None, 7)
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(task, 1)
+        # o ack reenviado após reconectar é ignorado em vez de ficar em early_acks
+        layer.client.ack(1)
+        assert not layer.early_acks and not layer.abandoned
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_acks_expire():
+    async def scenario():
+        layer = await connected_layer(abandon_ttl=0.0)
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await layer.publish({"x": 1}, "a/train", timeout=0.01)
+        # com ttl 0 só fica o último mid abandonado
+        assert list(layer.abandoned) == [3]
+
+        # mid reutilizado pelo paho: a nova publicação é confirmada normalmente
+        layer.client.mid = 2
+        task = asyncio.create_task(layer.publish({"x": 1}, "a/train", timeout=1))
+        await wait_published(layer, 4)
+        layer.client.ack(3)
+        await asyncio.wait_for(task, 1)
+        assert not layer.abandoned and not layer.pending
+
+    asyncio.run(scenario())
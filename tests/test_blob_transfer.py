@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+
+from client.blob_transfer import _CHUNK_HEADER, BlobTransfer
+from client.topic_router import TopicTrie
+
+SENDER, RECEIVER = "10_0_0_1/pipe", "10_0_0_2/agg"
+DATA = os.urandom(10 * 1000 + 123)
+
+
+class FakeBus:
+    """
+    Broker em memória e síncrono: publish entrega logo aos handlers cujo filtro apanha o tópico.
+    drop(topic, payload) -> True descarta a mensagem.
+    """
+    def __init__(self):
+        self.trie = TopicTrie()
+        self.drop = lambda topic, payload: False
+        self.published = []
+
+    def route(self, topic, handler, maxsize=256, control=False, raw=False, own=False):
+        self.trie.insert(topic, (handler, raw))
+
+    def unroute(self, prefix):
+        trie, self.trie = self.trie, TopicTrie()
+        for topic_filter, value in self._filters(trie.root, []):
+            if not topic_filter.startswith(prefix):
+                self.trie.insert(topic_filter, value)
+
+    def _filters(self, node, levels):
+        for key, child in node.items():
+            if key is None:
+                for value in child:
+                    yield "/".join(levels), value
+            else:
+                yield from self._filters(child, levels + [key])
+
+    def publish(self, payload, topic):
+        self._deliver(topic, json.dumps(payload).encode())
+
+    def publish_bytes(self, data, topic):
+        self._deliver(topic, bytes(data))
+
+    def _deliver(self, topic, raw):
+        self.published.append(topic)
+        if self.drop(topic, raw):
+            return
+        for handler, is_raw in self.trie.match(topic):
+            handler(topic, raw if is_raw else json.loads(raw))
+
+
+def chunk_index(raw):
+    return _CHUNK_HEADER.unpack_from(raw)[1]
+
+
+def make_pair(tmp_path, bus, accept=None, **kwargs):
+    received = []
+    done = threading.Event()
+
+    def on_blob(sender, blob, path, meta):
+        with open(path, "rb") as f:
+            received.append((sender, blob, f.read(), meta))
+        done.set()
+
+    options = dict(chunk_size=1000, window=4, retry_after=0.2, **kwargs)
+    sender = BlobTransfer(bus, SENDER, store_dir=str(tmp_path / "sender"), **options)
+    receiver = BlobTransfer(
+        bus, RECEIVER, store_dir=str(tmp_path / "receiver"), on_blob=on_blob, accept_sender=accept, **options
+    )
+    return sender, receiver, received, done
+
+
+def test_transfer(tmp_path):
+    bus = FakeBus()
+    sender, _, received, done = make_pair(tmp_path, bus)
+    blob = sender.send(RECEIVER, data=DATA, meta={"kind": "model"})
+    assert done.wait(2)
+    assert received == [(SENDER, blob, DATA, {"kind": "model"})]
+    # o recetor confirmou: nada fica pendente no emissor
+    assert not sender.pending_sends
+
+
+def test_lost_chunks_are_requested_again(tmp_path):
+    bus = FakeBus()
+    lost = set()
+
+    def drop(topic, raw):
+        # perde a primeira cópia dos chunks 1 e 7
+        if topic.endswith("/blob/chunk") and chunk_index(raw) in (1, 7) and chunk_index(raw) not in lost:
+            lost.add(chunk_index(raw))
+            return True
+        return False
+
+    bus.drop = drop
+    sender, _, received, done = make_pair(tmp_path, bus)
+    sender.send(RECEIVER, data=DATA)
+    assert done.wait(5)
+    assert lost == {1, 7}
+    assert received[0][2] == DATA
+
+
+def test_resume_requests_only_missing_chunks(tmp_path):
+    bus = FakeBus()
+    # o recetor "cai" depois dos primeiros 4 chunks
+    bus.drop = lambda topic, raw: topic.endswith("/blob/chunk") and chunk_index(raw) >= 4
+    sender, receiver, _, _ = make_pair(tmp_path, bus, max_retries=0)
+    sender.send(RECEIVER, data=DATA)
+    time.sleep(0.7)  # receção abandonada pelo recetor (max_retries=0)
+    assert not receiver.incoming
+
+    bus.unroute(RECEIVER)
+    bus.drop = lambda topic, raw: False
+    bus.published.clear()
+    received = []
+    restarted = BlobTransfer(
+        bus, RECEIVER, store_dir=str(tmp_path / "receiver"), chunk_size=1000, window=4, retry_after=0.2,
+        on_blob=lambda sender_id, blob, path, meta: received.append(open(path, "rb").read()),
+    )
+    sender.send(RECEIVER, data=DATA)
+    deadline = time.monotonic() + 2
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert received == [DATA]
+    assert sum(topic.endswith("/blob/chunk") for topic in bus.published) == 11 - 4
+    assert not restarted.incoming
+
+
+def test_dedup_sends_no_chunks(tmp_path):
+    bus = FakeBus()
+    sender, receiver, received, done = make_pair(tmp_path, bus)
+    receiver.put(DATA)
+    sender.send(RECEIVER, data=DATA)
+    assert done.wait(2)
+    assert received[0][2] == DATA
+    assert not any(topic.endswith("/blob/chunk") for topic in bus.published)
+
+
+def test_bad_manifests_are_rejected(tmp_path):
+    bus = FakeBus()
+    _, receiver, received, _ = make_pair(tmp_path, bus, accept=lambda sender: sender == SENDER, max_size=20000)
+    good = {"blob": "a" * 64, "size": 2500, "chunk_size": 1000, "chunks": ["b" * 64] * 3, "meta": {}}
+    bad = [
+        (SENDER, dict(good, blob="../../escape")),
+        (SENDER, dict(good, blob="A" * 64)),
+        (SENDER, dict(good, size=10 ** 12, chunks=["b" * 64] * 10 ** 3)),
+        (SENDER, dict(good, chunks=["b" * 64] * 2)),
+        (SENDER, dict(good, chunk_size=0)),
+        (SENDER, dict(good, chunks=["../x"] * 3)),
+        ("10_0_0_9/pipe", good),
+    ]
+    for sender_id, manifest in bad:
+        bus.publish(manifest, f"{RECEIVER}/blob/msg/manifest/{sender_id}")
+    assert not receiver.incoming and not received
+    assert not any("/blob/msg/need/" in topic for topic in bus.published)
+    assert os.listdir(tmp_path / "receiver") == []
+    assert sorted(os.listdir(tmp_path)) == ["receiver", "sender"]
+
+    # o mesmo manifesto, coerente e do emissor conhecido, abre a receção
+    bus.publish(good, f"{RECEIVER}/blob/msg/manifest/{SENDER}")
+    assert "a" * 64 in receiver.incoming
+
+
+def test_need_with_bad_indices_is_ignored(tmp_path):
+    bus = FakeBus()
+    sender, _, _, _ = make_pair(tmp_path, bus)
+    bus.drop = lambda topic, raw: "/manifest/" in topic
+    blob = sender.send(RECEIVER, data=DATA)
+    bus.published.clear()
+    bus.publish({"blob": blob, "missing": [-1, 99]}, f"{SENDER}/blob/msg/need/{RECEIVER}")
+    assert not any(topic.endswith("/blob/chunk") for topic in bus.published)
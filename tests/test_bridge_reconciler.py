@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from client.bridge_reconciler import BridgeReconciler
+from client.file_utils import atomic_write
+
+
+class FakeWriter:
+    def __init__(self, fail=False):
+        self.writes = []
+        self.fail = fail
+
+    def __call__(self, path, content):
+        if self.fail:
+            raise OSError("disco cheio")
+        self.writes.append(content)
+        atomic_write(path, content)
+
+
+def make(tmp_path, window=0.05, writer=None):
+    reloads = []
+    reconciler = BridgeReconciler(
+        "10_0_0_1",
+        "br_1/",
+        conf_path=str(tmp_path / "bridges.conf"),
+        window=window,
+        on_change=lambda: reloads.append(time.monotonic()),
+        write=writer or FakeWriter(),
+    )
+    return reconciler, reloads
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_render():
+    reconciler = BridgeReconciler("10_0_0_1", "br_1/")
+    assert reconciler.render({"10.0.0.2": 1883}) == (
+        "connection bridge_to_peer__10_0_0_2\n"
+        "address 10.0.0.2:1883\n"
+        "topic 10_0_0_1/# out 1 br_1/\n"
+        "topic 10_0_0_2/# in 1\n"
+        "topic 10_0_0_2/# out 1\n"
+    )
+
+
+def test_discoveries_in_one_window_reload_once(tmp_path):
+    writer = FakeWriter()
+    reconciler, reloads = make(tmp_path, writer=writer)
+    for i in range(2, 7):
+        reconciler.add_peer(f"10.0.0.{i}", 1883)
+    reconciler.remove_peer("10.0.0.6")
+    assert wait_for(lambda: reloads)
+    time.sleep(0.15)
+    assert len(reloads) == 1 and len(writer.writes) == 1
+    assert writer.writes[0].count("connection ") == 4
+    assert (tmp_path / "bridges.conf").read_text() == writer.writes[0]
+
+
+def test_unchanged_set_does_not_reload(tmp_path):
+    writer = FakeWriter()
+    reconciler, reloads = make(tmp_path, writer=writer)
+    reconciler.set_peers({"10.0.0.2": 1883})
+    assert wait_for(lambda: reloads)
+    # mesmo conjunto: nem sequer agenda
+    reconciler.set_peers({"10.0.0.2": 1883})
+    reconciler.add_peer("10.0.0.2", 1883)
+    assert reconciler.timer is None
+    # ficheiro já igual ao desejado (ex: reinício do peer): sem escrita nem reload
+    restarted, restarted_reloads = make(tmp_path, writer=writer)
+    restarted.desired_peers = {"10.0.0.2": 1883}
+    assert not restarted.reconcile()
+    assert len(writer.writes) == 1 and not restarted_reloads
+
+
+def test_failed_write_keeps_file_and_skips_reload(tmp_path):
+    (tmp_path / "bridges.conf").write_text("anterior")
+    reconciler, reloads = make(tmp_path, writer=FakeWriter(fail=True))
+    reconciler.desired_peers = {"10.0.0.2": 1883}
+    with pytest.raises(OSError):
+        reconciler.reconcile()
+    assert (tmp_path / "bridges.conf").read_text() == "anterior"
+    assert not reloads
+    # a janela seguinte volta a ser agendada
+    reconciler.add_peer("10.0.0.3", 1883)
+    assert reconciler.timer is not None
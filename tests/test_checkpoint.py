@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+pytest.importorskip("joblib")
+from client.checkpoint import Checkpointer
+
+
+def test_save_and_load(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path), interval=0.01)
+    checkpointer.save({"round": 3}, {"model": [1, 2, 3]})
+    checkpointer.save({"round": 4}, {"model": [4]})
+    restored = Checkpointer(str(tmp_path))
+    state, objects = restored.load()
+    assert state == {"round": 4} and objects == {"model": [4]}
+    assert restored.generation == 2
+    # só a geração atual fica no disco
+    assert sorted(p.name for p in tmp_path.glob("*.joblib")) == ["model-2.joblib"]
+
+
+def test_missing_checkpoint(tmp_path):
+    assert Checkpointer(str(tmp_path)).load() == (None, {})
+
+
+def test_touch_during_snapshot_is_kept(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path), interval=0.01)
+    saved = threading.Event()
+    calls = []
+
+    def snapshot():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            # alteração concorrente enquanto o primeiro checkpoint é tirado
+            checkpointer.touch()
+        else:
+            saved.set()
+        return {"calls": len(calls)}, {}
+
+    checkpointer.touch()
+    checkpointer.start(snapshot)
+    assert saved.wait(2), "o touch() feito durante o snapshot perdeu-se"
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.datasets import make_classification
+from sklearn.tree import DecisionTreeClassifier
+
+from client.metrics import METRICS
+from cv_cache import CVScoreCache
+from search_strategies import has_fixed_random_state, run_candidate_search, use_candidate_search
+
+CV = {"splitter": "StratifiedKFold", "n_splits": 3, "split_seed": 1, "scoring": "accuracy"}
+SEARCH = {"strategy": "grid", "cv": 3, "split_seed": 1, "n_jobs": 1}
+GRID = {"max_depth": [1, 2, 3]}
+
+
+def test_key_covers_data_cv_estimator_and_params():
+    key = CVScoreCache.make_key("fp", CV, "tree", {"max_depth": 1})
+    assert key == CVScoreCache.make_key("fp", dict(CV), "tree", {"max_depth": 1})
+    assert key != CVScoreCache.make_key("outros dados", CV, "tree", {"max_depth": 1})
+    assert key != CVScoreCache.make_key("fp", dict(CV, split_seed=2), "tree", {"max_depth": 1})
+    assert key != CVScoreCache.make_key("fp", CV, "forest", {"max_depth": 1})
+    assert key != CVScoreCache.make_key("fp", CV, "tree", {"max_depth": 2})
+
+
+def test_lru_and_persistence(tmp_path):
+    path = str(tmp_path / "cv.json")
+    cache = CVScoreCache(path, max_entries=2)
+    cache.put("a", [0.5])
+    cache.put("b", [0.6])
+    assert cache.get("a") == [0.5]  # "a" passa a ser o mais recente
+    cache.put("c", [0.7])
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.save()
+    assert list(CVScoreCache(path, max_entries=2).entries) == ["a", "c"]
+
+
+def test_second_search_is_served_from_cache():
+    X, y = make_classification(n_samples=90, random_state=0)
+    cache = CVScoreCache()
+    estimator = DecisionTreeClassifier(random_state=0)
+
+    fits = METRICS.counter("search_fits_total")
+    first, _ = run_candidate_search(estimator, GRID, X, y, SEARCH, cache=cache, fingerprint="fp")
+    assert METRICS.counter("search_fits_total") - fits == 3 * 3
+    assert len(cache.entries) == 3
+
+    fits = METRICS.counter("search_fits_total")
+    second, _ = run_candidate_search(estimator, GRID, X, y, SEARCH, cache=cache, fingerprint="fp")
+    assert METRICS.counter("search_fits_total") == fits
+    assert second == first and cache.hits == 3
+
+
+def test_baseline_search_without_cache_or_fixed_seed():
+    seeded = DecisionTreeClassifier(random_state=0)
+    unseeded = DecisionTreeClassifier()
+    assert use_candidate_search(seeded, GRID, SEARCH, CVScoreCache())
+    # cache desligada ou estratégia adaptativa: GridSearchCV/halving originais
+    assert not use_candidate_search(seeded, GRID, SEARCH, None)
+    assert not use_candidate_search(seeded, GRID, dict(SEARCH, strategy="halving_grid"), CVScoreCache())
+    # sem random_state fixo os scores não são reprodutíveis: nada vai para a cache
+    assert not use_candidate_search(unseeded, GRID, SEARCH, CVScoreCache())
+    assert has_fixed_random_state(unseeded, {"random_state": [1, 2]})
+    assert not has_fixed_random_state(seeded, {"random_state": [1, None]})
@@ -0,0 +1,72 @@
+import io
+import pickle
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from aggregation_algs.ensemble import forest_in_raw_space, merge_forests
+from client.forest_codec import dump_forest, load_forest
+
+
+@pytest.fixture(scope="module")
+def trained():
+    X, y = make_classification(n_samples=200, n_features=6, random_state=0)
+    model = Pipeline([("scaler", StandardScaler()), ("classifier", RandomForestClassifier(n_estimators=5, random_state=0))])
+    return model.fit(X, y), X
+
+
+def _tamper(data, name, fn):
+    with np.load(io.BytesIO(data)) as npz:
+        arrays = {key: npz[key] for key in npz.files}
+    arrays[name] = fn(arrays[name].copy())
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def test_round_trip_keeps_predictions(trained):
+    model, X = trained
+    restored = load_forest(dump_forest(model))
+    np.testing.assert_array_equal(restored.predict_proba(X), model.predict_proba(X))
+
+
+def test_merged_forest_round_trip(trained):
+    model, X = trained
+    forest = merge_forests({"a": forest_in_raw_space(load_forest(dump_forest(model)))}, {"a": 1.0})
+    restored = load_forest(dump_forest(forest))
+    assert restored.named_steps["scaler"] == "passthrough"
+    np.testing.assert_array_equal(restored.predict(X), forest.predict(X))
+
+
+def test_rejects_pickle(trained):
+    model, _ = trained
+    with pytest.raises(ValueError):
+        load_forest(pickle.dumps(model))
+
+
+def test_rejects_bad_feature_index(trained):
+    model, _ = trained
+
+    def bad_feature(nodes):
+        nodes["feature"][nodes["left_child"] != -1] = 99
+        return nodes
+
+    with pytest.raises(ValueError, match="features"):
+        load_forest(_tamper(dump_forest(model), "nodes", bad_feature))
+
+
+def test_rejects_cycle(trained):
+    model, _ = trained
+
+    def loop(nodes):
+        nodes["left_child"][0] = 0
+        return nodes
+
+    with pytest.raises(ValueError, match="ligações"):
+        load_forest(_tamper(dump_forest(model), "nodes", loop))
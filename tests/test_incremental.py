@@ -0,0 +1,154 @@
+import random
+
+import numpy as np
+import pytest
+
+from aggregation_algs.algs import ALGS_DICT, check_fedavg_params
+from aggregation_algs.incremental import INCREMENTAL_ALGS_DICT
+
+NODES = [f"10.0.0.{i}" for i in range(1, 7)]
+
+
+def _random_params(method, rng):
+    if method == "avg":
+        return {"n_estimators": rng.randint(10, 500), "max_depth": rng.randint(1, 50)}
+    if method == "majority":
+        # poucos valores possíveis: empates frequentes
+        return {"min_samples_leaf": rng.choice([1, 2]), "criterion": rng.choice(["gini", "entropy"])}
+    return {
+        "num_samples": rng.randint(1, 1000),
+        "weights": {"w": np.array([rng.random() for _ in range(6)]).reshape(2, 3), "b": np.array([rng.random()])},
+    }
+
+
+def _assert_same(method, running, batch):
+    if method == "majority":
+        assert running == batch
+    elif method == "avg":
+        assert running.keys() == batch.keys()
+        for param in batch:
+            assert running[param] == pytest.approx(batch[param])
+    else:
+        assert running.get("num_samples") == batch.get("num_samples")
+        for name, value in batch.get("weights", {}).items():
+            np.testing.assert_allclose(running["weights"][name], value)
+
+
+@pytest.mark.parametrize("method", sorted(INCREMENTAL_ALGS_DICT))
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_batch_over_random_sequences(method, seed):
+    rng = random.Random(seed)
+    engine = INCREMENTAL_ALGS_DICT[method]()
+    expected = {}  # o mesmo dicionário que o Aggregator passa ao ALGS_DICT
+    for _ in range(60):
+        node = rng.choice(NODES)
+        if rng.random() < 0.2:
+            engine.remove(node)
+            expected.pop(node, None)
+        else:
+            params = _random_params(method, rng)
+            engine.update(node, params)
+            expected[node] = params
+        if expected:
+            _assert_same(method, engine.result(), ALGS_DICT[method](expected))
+
+
+def test_majority_tie_follows_node_order_after_resend():
+    engine = INCREMENTAL_ALGS_DICT["majority"]()
+    engine.update("A", {"p": 1})
+    engine.update("B", {"p": 2})
+    engine.update("A", {"p": 1})
+    assert engine.result() == ALGS_DICT["majority"](engine.contributions) == {"p": 1}
+
+
+@pytest.mark.parametrize("method", sorted(INCREMENTAL_ALGS_DICT))
+def test_partials_match_flat_engine(method):
+    rng = random.Random(7)
+    flat, root = INCREMENTAL_ALGS_DICT[method](), INCREMENTAL_ALGS_DICT[method]()
+    groups = [INCREMENTAL_ALGS_DICT[method]() for _ in range(2)]
+    for i, node in enumerate(NODES):
+        params = _random_params(method, rng)
+        flat.update(node, params)
+        groups[i % 2].update(node, params)
+    for i, group in enumerate(groups):
+        root.update_partial(f"leader{i}", group.partial())
+    assert root.num_nodes() == flat.num_nodes() == len(NODES)
+    if method == "majority":
+        # sem ordem de chegada nos parciais só os valores sem empate são comparáveis
+        for param, counter in flat.value_counts.items():
+            assert root.value_counts[param] == counter
+    else:
+        _assert_same(method, root.result(), flat.result())
+
+    root.remove_partial("leader0")
+    assert root.num_nodes() == groups[1].num_nodes()
+
+
+def test_fedavg_accumulates_in_float64():
+    weights = {"w": np.full(4, 0.1, dtype=np.float32)}
+    params_dict = {"a": {"num_samples": 16777217, "weights": weights}, "b": {"num_samples": 1, "weights": weights}}
+    result = ALGS_DICT["fedavg"](params_dict)
+    assert result["num_samples"] == 16777218
+    assert result["weights"]["w"].dtype == np.float64
+
+
+@pytest.mark.parametrize("params", [
+    {"max_depth": 10},
+    {"num_samples": "10", "weights": {}},
+    {"num_samples": 10, "weights": [1.0]},
+    {"num_samples": 10, "weights": {"w": ["a", "b"]}},
+])
+def test_check_fedavg_params_rejects_bad_payloads(params):
+    with pytest.raises(ValueError):
+        check_fedavg_params(params)
+    check_fedavg_params({"num_samples": 10, "weights": {"w": [0.5, 1.0]}})
+
+
+def fedavg(value, num_samples=10, name="w", shape=(3,)):
+    return {"num_samples": num_samples, "weights": {name: np.full(shape, value, dtype=np.float64)}}
+
+
+@pytest.mark.parametrize("bad", [fedavg(1.0, shape=(4,)), fedavg(1.0, name="v")])
+def test_fedavg_rejected_update_leaves_state_intact(bad):
+    engine = INCREMENTAL_ALGS_DICT["fedavg"]()
+    engine.update("a", fedavg(1.0))
+    engine.update("b", fedavg(3.0, num_samples=30))
+    before = engine.result()
+    with pytest.raises(ValueError):
+        engine.update("a", bad)
+    after = engine.result()
+    assert after["num_samples"] == before["num_samples"] == 40
+    np.testing.assert_allclose(after["weights"]["w"], before["weights"]["w"])
+    assert engine.contributions["a"]["weights"].keys() == {"w"}
+    # o nó não fica bloqueado: novas atualizações e a remoção funcionam
+    engine.update("a", fedavg(2.0))
+    engine.remove("a")
+    np.testing.assert_allclose(engine.result()["weights"]["w"], np.full(3, 3.0))
+
+
+def test_fedavg_key_mismatch_matches_batch():
+    params_dict = {"a": fedavg(1.0, name="w"), "b": fedavg(2.0, name="v")}
+    with pytest.raises(ValueError):
+        ALGS_DICT["fedavg"](params_dict)
+    engine = INCREMENTAL_ALGS_DICT["fedavg"]()
+    engine.update("a", params_dict["a"])
+    with pytest.raises(ValueError):
+        engine.update("b", params_dict["b"])
+
+
+def test_fedavg_sole_node_may_change_layout():
+    engine = INCREMENTAL_ALGS_DICT["fedavg"]()
+    engine.update("a", fedavg(1.0))
+    engine.update("a", fedavg(2.0, shape=(5,)))
+    np.testing.assert_allclose(engine.result()["weights"]["w"], np.full(5, 2.0))
+
+
+def test_fedavg_rejected_partial_leaves_state_intact():
+    child = INCREMENTAL_ALGS_DICT["fedavg"]()
+    child.update("x", fedavg(1.0, shape=(4,)))
+    parent = INCREMENTAL_ALGS_DICT["fedavg"]()
+    parent.update("a", fedavg(2.0))
+    with pytest.raises(ValueError):
+        parent.update_partial("g1", child.partial())
+    assert not parent.partials
+    np.testing.assert_allclose(parent.result()["weights"]["w"], np.full(3, 2.0))
@@ -0,0 +1,118 @@
+from client.membership import ALIVE, DEAD, SUSPECT, Membership
+
+PEER = ("10.0.0.2", 5000)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make():
+    clock = FakeClock()
+    sent, changes = [], []
+    membership = Membership(
+        "10.0.0.1",
+        1883,
+        send=lambda msg, addr: sent.append((msg, addr)),
+        heartbeat_interval=2.0,
+        suspect_timeout=6.0,
+        dead_timeout=6.0,
+        purge_after=60.0,
+        on_change=changes.append,
+        clock=clock,
+    )
+    return membership, clock, sent, changes
+
+
+def advance(membership, clock, seconds):
+    for _ in range(int(seconds / membership.heartbeat_interval)):
+        clock.now += membership.heartbeat_interval
+        membership.tick()
+
+
+def test_silent_peer_goes_suspect_then_dead():
+    membership, clock, sent, changes = make()
+    membership.handle("hb 1884 1", PEER)
+    assert changes == [{"10.0.0.2": 1884}]
+
+    # um heartbeat perdido não muda nada
+    advance(membership, clock, 4)
+    assert membership.members["10.0.0.2"].state == ALIVE
+
+    advance(membership, clock, 2)
+    assert membership.members["10.0.0.2"].state == SUSPECT
+    assert ("suspect 10.0.0.2 1", None) in sent
+    # suspect continua a ser membro: sem reconfiguração das bridges
+    assert len(changes) == 1 and membership.peers() == {"10.0.0.2": 1884}
+
+    advance(membership, clock, 6)
+    assert membership.members["10.0.0.2"].state == DEAD
+    assert ("dead 10.0.0.2 1", None) in sent
+    assert changes[-1] == {}
+
+    advance(membership, clock, 60)
+    assert "10.0.0.2" not in membership.members
+
+
+def test_heartbeat_clears_suspicion_without_change():
+    membership, clock, _, changes = make()
+    membership.handle("hb 1884 1", PEER)
+    advance(membership, clock, 6)
+    assert membership.members["10.0.0.2"].state == SUSPECT
+    membership.handle("hb 1884 1", PEER)
+    assert membership.members["10.0.0.2"].state == ALIVE
+    assert len(changes) == 1
+
+
+def test_dead_rumour_about_a_peer_heard_recently_is_only_a_suspicion():
+    membership, clock, _, changes = make()
+    membership.handle("hb 1884 1", PEER)
+    clock.now += 2
+    # outro peer perdeu os heartbeats de 10.0.0.2, mas nós ouvimo-lo há 2 s
+    membership.handle("dead 10.0.0.2 1", ("10.0.0.3", 5000))
+    assert membership.members["10.0.0.2"].state == SUSPECT
+    # o peer refuta com uma incarnação nova
+    membership.handle("hb 1884 2", PEER)
+    assert membership.members["10.0.0.2"].state == ALIVE
+    assert len(changes) == 1
+
+
+def test_dead_rumour_about_a_silent_peer_is_accepted():
+    membership, clock, _, changes = make()
+    membership.handle("hb 1884 1", PEER)
+    clock.now += 6
+    membership.handle("dead 10.0.0.2 1", ("10.0.0.3", 5000))
+    assert membership.members["10.0.0.2"].state == DEAD
+    assert changes[-1] == {}
+
+    # heartbeat atrasado da mesma incarnação: não reanima, avisa o peer para refutar
+    membership.handle("hb 1884 1", PEER)
+    assert membership.members["10.0.0.2"].state == DEAD
+    # reiniciado ou refutado: incarnação maior volta a alive
+    membership.handle("hb 1884 2", PEER)
+    assert membership.members["10.0.0.2"].state == ALIVE
+    assert changes[-1] == {"10.0.0.2": 1884}
+
+
+def test_refutes_suspicion_about_itself():
+    membership, _, sent, _ = make()
+    incarnation = membership.incarnation
+    membership.handle(f"suspect 10.0.0.1 {incarnation}", PEER)
+    assert membership.incarnation == incarnation + 1
+    assert sent[-1] == (f"hb 1883 {incarnation + 1}", None)
+    # suspeita antiga: ignorada
+    membership.handle(f"suspect 10.0.0.1 {incarnation}", PEER)
+    assert membership.incarnation == incarnation + 1
+
+
+def test_stale_incarnation_is_ignored():
+    membership, _, _, _ = make()
+    membership.handle("hb 1884 5", PEER)
+    membership.handle("suspect 10.0.0.2 4", ("10.0.0.3", 5000))
+    assert membership.members["10.0.0.2"].state == ALIVE
+    membership.handle("hb 1885 4", PEER)
+    assert membership.members["10.0.0.2"].port == 1884
@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+from client.payload_codecs import CODECS, COMPRESSIONS, PayloadCodec, decode_payload
+
+PAYLOAD = {"id": "10.0.0.1", "round": 3, "trained_params": {"max_depth": 10, "criterion": "gini"}}
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+@pytest.mark.parametrize("compression", sorted(COMPRESSIONS))
+def test_round_trip(codec, compression):
+    encoder = PayloadCodec(codec, compression, compress_threshold=0)
+    assert decode_payload(encoder.encode(PAYLOAD)) == PAYLOAD
+
+
+@pytest.mark.parametrize("codec", ["msgpack", "cbor"])
+def test_ndarray_round_trip(codec):
+    weights = np.arange(12, dtype=np.float32).reshape(3, 4)
+    decoded = decode_payload(PayloadCodec(codec).encode({"w": weights}))
+    assert decoded["w"].dtype == weights.dtype
+    np.testing.assert_array_equal(decoded["w"], weights)
+
+
+def test_plain_json_has_no_header():
+    raw = PayloadCodec("json").encode(PAYLOAD)
+    assert json.loads(raw) == PAYLOAD
+
+
+def test_below_threshold_is_not_compressed():
+    raw = PayloadCodec("msgpack", "zlib", compress_threshold=1 << 20).encode(PAYLOAD)
+    assert raw[2] == 0
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+@pytest.mark.parametrize("compression", ["zlib", "lz4"])
+def test_corrupt_payload_raises_value_error(codec, compression):
+    raw = PayloadCodec(codec, compression, compress_threshold=0).encode(PAYLOAD)
+    for corrupt in (raw[:-5], raw[:3] + b"\xff" * (len(raw) - 3)):
+        with pytest.raises(ValueError):
+            decode_payload(corrupt)
+
+
+def test_unknown_header_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_payload(bytes((1, 9, 0)) + b"{}")
+    with pytest.raises(ValueError):
+        decode_payload(bytes((1,)))
+
+
+def test_unknown_codec_rejected():
+    with pytest.raises(ValueError):
+        PayloadCodec("xml")
+    with pytest.raises(ValueError):
+        PayloadCodec("json", "bz2")
@@ -0,0 +1,78 @@
+import pytest
+
+from aggregation_algs.incremental import RunningAverage
+from aggregation_algs.rounds import RoundBuffer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make(**kwargs):
+    clock = FakeClock()
+    return RoundBuffer(RunningAverage, clock=clock, **kwargs), clock
+
+
+def test_fraction_quorum_closes_the_round():
+    buffer, _ = make(quorum_fraction=0.5, deadline=30)
+    assert buffer.required(4) == 2
+    assert buffer.add(1, "a", {"x": 1.0}, cluster_size=4) is None
+    # o mesmo nó a reenviar substitui a contribuição, não conta duas vezes
+    assert buffer.add(1, "a", {"x": 3.0}, cluster_size=4) is None
+    assert buffer.add(1, "b", {"x": 5.0}, cluster_size=4) == {"x": 4.0}
+
+
+def test_count_quorum_is_independent_of_cluster_size():
+    buffer, _ = make(quorum_count=1)
+    assert buffer.required(10) == 1
+    assert buffer.add(1, "a", {"x": 1.0}, cluster_size=10) == {"x": 1.0}
+    # quorum_fraction=1.0 é o cluster inteiro
+    buffer, _ = make(quorum_fraction=1.0)
+    assert buffer.required(10) == 10
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"quorum_fraction": 0},
+    {"quorum_fraction": 1.5},
+    {"quorum_fraction": True},
+    {"quorum_count": 0},
+    {"quorum_count": 0.5},
+    {"quorum_count": True},
+])
+def test_invalid_quorum(kwargs):
+    with pytest.raises(ValueError):
+        RoundBuffer(RunningAverage, **kwargs)
+
+
+def test_deadline_closes_round_without_quorum():
+    buffer, clock = make(quorum_fraction=1.0, deadline=30)
+    buffer.add(1, "a", {"x": 2.0}, cluster_size=3)
+    clock.now = 29.9
+    assert buffer.poll(cluster_size=3) == []
+    clock.now = 30.0
+    assert buffer.poll(cluster_size=3) == [(1, {"x": 2.0})]
+    assert not buffer.open_rounds
+
+
+def test_shrinking_cluster_closes_round_on_poll():
+    buffer, _ = make(quorum_fraction=1.0, deadline=30)
+    buffer.add(1, "a", {"x": 1.0}, cluster_size=3)
+    buffer.add(1, "b", {"x": 3.0}, cluster_size=3)
+    assert buffer.poll(cluster_size=3) == []
+    # um nó saiu do cluster: as 2 contribuições já chegam
+    assert buffer.poll(cluster_size=2) == [(1, {"x": 2.0})]
+
+
+def test_late_contributions_for_closed_rounds_are_dropped():
+    buffer, _ = make(quorum_count=1, max_closed=2)
+    assert buffer.add(1, "a", {"x": 1.0}, cluster_size=3) is not None
+    assert buffer.add(1, "b", {"x": 9.0}, cluster_size=3) is None
+    assert 1 not in buffer.open_rounds
+    # rondas fechadas há muito são esquecidas (max_closed)
+    buffer.add(2, "a", {"x": 1.0}, cluster_size=3)
+    buffer.add(3, "a", {"x": 1.0}, cluster_size=3)
+    assert list(buffer.closed_rounds) == [2, 3]
@@ -0,0 +1,77 @@
+import pytest
+
+from client.routing import Hierarchy, RoutingTable, can_target_self
+
+PEERS = [f"10.0.0.{i}" for i in range(1, 9)]
+
+
+def table(spec, self_ip="10.0.0.3", peers=PEERS):
+    routes = RoutingTable(spec, self_ip)
+    routes.rebuild([ip for ip in peers if ip != self_ip])
+    return routes
+
+
+def test_index_keeps_legacy_behaviour():
+    assert table([0, 2]).targets() == ("10.0.0.1", "10.0.0.4")
+
+
+@pytest.mark.parametrize("spec", [
+    {"type": "ring", "k": 3},
+    {"type": "gossip", "k": 3},
+    {"type": "tree", "fanout": 2, "direction": "up"},
+    {"type": "tree", "fanout": 2, "direction": "down"},
+    [0, 1, 2],
+])
+@pytest.mark.parametrize("self_ip", PEERS)
+def test_only_consistent_hash_targets_self(spec, self_ip):
+    assert not can_target_self(spec)
+    assert self_ip not in table(spec, self_ip).targets()
+
+
+def test_consistent_hash_can_target_self():
+    spec = {"type": "consistent_hash", "key": "shared"}
+    assert can_target_self(spec)
+    owners = {table(spec, ip).targets() for ip in PEERS}
+    # chave partilhada: todos os nós (incluindo o dono) escolhem o mesmo agregador
+    assert len(owners) == 1
+    (owner,) = owners.pop()
+    assert owner in table(spec, owner).targets()
+
+
+def test_consistent_hash_join_moves_few_keys():
+    spec = {"type": "consistent_hash", "replicas": 1}
+    before = {ip: table(spec, ip).targets() for ip in PEERS}
+    after = {ip: table(spec, ip, PEERS + ["10.0.0.9"]).targets() for ip in PEERS}
+    assert sum(before[ip] != after[ip] for ip in PEERS) <= 3
+
+
+def test_gossip_is_k_regular():
+    spec = {"type": "gossip", "k": 3}
+    indegree = {ip: 0 for ip in PEERS}
+    for ip in PEERS:
+        targets = table(spec, ip).targets()
+        assert len(set(targets)) == 3
+        for target in targets:
+            indegree[target] += 1
+    assert set(indegree.values()) == {3}
+
+
+def test_rebuild_reports_changes():
+    routes = table({"type": "ring", "k": 1})
+    assert not routes.rebuild([ip for ip in PEERS if ip != "10.0.0.3"])
+    assert routes.rebuild(["10.0.0.1"])
+    assert routes.targets() == ("10.0.0.1",)
+
+
+def test_hierarchy_groups_and_upstream():
+    root = "10.0.0.1"
+    nodes = {ip: Hierarchy([2, 2], root, ip) for ip in PEERS}
+    for hierarchy in nodes.values():
+        hierarchy.rebuild(PEERS)
+    # workers 2..8 em grupos de 2; líderes 2,4,6,8 -> grupos de 2 -> topo 2,6
+    assert nodes["10.0.0.5"].upstream(0) == "10.0.0.4"
+    assert nodes["10.0.0.4"].upstream(1) == "10.0.0.2"
+    assert nodes["10.0.0.4"].upstream(2) == root
+    assert nodes[root].group(0) == ["10.0.0.2", "10.0.0.6"]
+    assert nodes["10.0.0.2"].led_tiers() == [0, 1]
+    assert nodes["10.0.0.8"].group(0) == ["10.0.0.8"]
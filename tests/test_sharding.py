@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from sharding import SHARDING_MODES, shard
+
+MEMBERS = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"]
+
+
+def _shards(X, y, members, mode, seed=0):
+    return {ip: shard(X, y, [m for m in members if m != ip], ip, mode, seed) for ip in members}
+
+
+@pytest.fixture
+def data():
+    y = np.repeat(np.arange(3), [500, 300, 201])
+    X = np.arange(len(y)).reshape(-1, 1)
+    return X, y
+
+
+@pytest.mark.parametrize("mode", SHARDING_MODES)
+def test_shards_partition_the_rows(data, mode):
+    X, y = data
+    rows = np.concatenate([X_shard[:, 0] for X_shard, _, _ in _shards(X, y, MEMBERS, mode).values()])
+    np.testing.assert_array_equal(np.sort(rows), X[:, 0])
+
+
+@pytest.mark.parametrize("mode", SHARDING_MODES)
+def test_shard_is_deterministic_and_aligned(data, mode):
+    X, y = data
+    X_a, y_a, shard_id = shard(X, y, MEMBERS[1:], MEMBERS[0], mode)
+    X_b, y_b, _ = shard(X, y, list(reversed(MEMBERS[1:])), MEMBERS[0], mode)
+    np.testing.assert_array_equal(X_a, X_b)
+    np.testing.assert_array_equal(y_a, y[X_a[:, 0]])
+    assert shard_id == "0/4"
+
+
+def test_hash_only_moves_rows_of_the_member_that_left(data):
+    X, y = data
+    before = _shards(X, y, MEMBERS, "hash")
+    after = _shards(X, y, MEMBERS[:-1], "hash")
+    for ip in MEMBERS[:-1]:
+        assert set(before[ip][0][:, 0]) <= set(after[ip][0][:, 0])
+
+
+def test_stratified_keeps_label_distribution(data):
+    X, y = data
+    expected = np.bincount(y) / len(y)
+    for _, y_shard, _ in _shards(X, y, MEMBERS, "stratified").values():
+        np.testing.assert_allclose(np.bincount(y_shard) / len(y_shard), expected, atol=0.01)
+
+
+def test_single_member_keeps_everything(data):
+    X, y = data
+    X_shard, y_shard, shard_id = shard(X, y, [], MEMBERS[0], "hash")
+    assert X_shard is X and y_shard is y and shard_id == "0/1"
+
+
+def test_unknown_mode(data):
+    with pytest.raises(ValueError):
+        shard(*data, MEMBERS[1:], MEMBERS[0], "round_robin")
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from client.topic_router import TopicRouter, TopicTrie
+
+
+@pytest.mark.parametrize("topic_filter, topic, matches", [
+    ("a/b", "a/b", True),
+    ("a/b", "a/c", False),
+    ("+/agg", "10_0_0_1/agg", True),
+    ("+/agg", "10_0_0_1/agg/ack", False),
+    ("a/#", "a", True),
+    ("a/#", "a/b/c", True),
+    ("#", "a/b", True),
+    ("+/+", "a", False),
+    ("#", "$SYS/broker/load", False),
+    ("+/broker", "$SYS/broker", False),
+    ("$SYS/#", "$SYS/broker/load", True),
+])
+def test_trie_matches_like_mqtt(topic_filter, topic, matches):
+    trie = TopicTrie()
+    trie.insert(topic_filter, "route")
+    assert (trie.match(topic) == ["route"]) == matches
+
+
+def test_every_matching_route_receives_the_message():
+    router = TopicRouter("test")
+    received = []
+    router.add("+/agg", lambda topic, data: received.append(("wildcard", data)), control=True)
+    router.add("a/agg", lambda topic, data: received.append(("literal", data)), control=True)
+    assert router.dispatch("a/agg", 1)
+    assert sorted(received) == [("literal", 1), ("wildcard", 1)]
+    assert not router.dispatch("a/train", 2)
+
+
+def test_match_cache_is_invalidated_by_new_routes():
+    router = TopicRouter("test")
+    assert router.match("a/b") == []
+    route = router.add("a/+", lambda topic, data: None, control=True)
+    assert router.match("a/b") == [route]
+
+
+def test_match_cache_is_bounded_lru():
+    router = TopicRouter("test", cache_size=2)
+    route = router.add("#", lambda topic, data: None, control=True)
+    router.match("a")
+    router.match("b")
+    router.match("a")  # "a" passa a ser o mais recente
+    for i in range(100):
+        assert router.match(f"blob/chunk/{i}") == [route]
+    assert len(router.match_cache) == 2
+    router.match("c")
+    assert list(router.match_cache) == ["blob/chunk/99", "c"]
+
+
+def test_queued_route_drops_the_oldest_message_when_full():
+    router = TopicRouter("test")
+    release, started = threading.Event(), threading.Event()
+    handled = []
+
+    def handler(topic, data):
+        started.set()
+        release.wait(5)
+        handled.append(data)
+
+    route = router.add("t", handler, maxsize=2)
+    router.dispatch("t", 0)
+    assert started.wait(5)  # o worker está preso na mensagem 0
+    for data in range(1, 5):
+        router.dispatch("t", data)
+    release.set()
+    route.queue.join()
+    assert handled == [0, 3, 4]
+    assert route.dropped == 2
+
+
+def test_handler_errors_do_not_stop_the_worker():
+    router = TopicRouter("test")
+    handled = []
+
+    def handler(topic, data):
+        if data == "bad":
+            raise KeyError(data)
+        handled.append(data)
+
+    route = router.add("t", handler)
+    for data in ("bad", "good"):
+        router.dispatch("t", data)
+    route.queue.join()
+    assert handled == ["good"]
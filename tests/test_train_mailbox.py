@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+from train_mailbox import LatestMailbox, SearchCancelled
+
+
+def test_latest_request_wins():
+    mailbox = LatestMailbox()
+    assert not mailbox.put("a")
+    assert mailbox.put("b")
+    assert mailbox.put("c")
+    assert mailbox.pending() and mailbox.replaced == 2
+    assert mailbox.get() == "c"
+    assert not mailbox.pending()
+
+
+def test_get_blocks_until_put():
+    mailbox = LatestMailbox()
+    received = []
+    worker = threading.Thread(target=lambda: received.append(mailbox.get()))
+    worker.start()
+    worker.join(0.05)
+    assert worker.is_alive() and not received
+    mailbox.put(("grid", {}))
+    worker.join(1)
+    assert received == [("grid", {})]
+    # o pedido foi consumido: não há nada pendente nem substituído
+    assert not mailbox.pending() and mailbox.replaced == 0
+
+
+def test_pending_request_cancels_candidate_search():
+    pytest.importorskip("sklearn")
+    from sklearn.datasets import make_classification
+    from sklearn.tree import DecisionTreeClassifier
+    from search_strategies import run_candidate_search
+
+    X, y = make_classification(n_samples=60, random_state=0)
+    mailbox = LatestMailbox()
+    mailbox.put("agregado mais recente")
+    with pytest.raises(SearchCancelled):
+        run_candidate_search(
+            DecisionTreeClassifier(random_state=0), {"max_depth": [1, 2]}, X, y,
+            {"cv": 3, "n_jobs": 1}, should_stop=mailbox.pending,
+        )